@@ -0,0 +1,192 @@
+"""Deterministic stand-ins for the OpenAI client and the memory store, with injected latency."""
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Dict, List, Optional
+import numpy as np
+from openai.types.chat import ChatCompletionChunk
+from providers.llm_provider import LLMProvider
+from providers.vector_db_provider import VectorDBProvider, MemoryDocument
+
+
+def text_vector(text: str, dims: int) -> List[float]:
+    """Unit vector seeded by the text, so equal texts always embed identically."""
+    seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).normal(size=dims).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def stream_chunks(content: str = "", tool_calls: Optional[List[dict]] = None, chunk_chars: int = 4) -> List[ChatCompletionChunk]:
+    """Chat completion chunks as the API streams them: content and tool-call arguments in small deltas."""
+    def chunk(delta: dict, finish_reason: Optional[str] = None) -> ChatCompletionChunk:
+        return ChatCompletionChunk.model_validate({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "fake",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        })
+
+    chunks = [chunk({"role": "assistant"})]
+    for start in range(0, len(content), chunk_chars):
+        chunks.append(chunk({"content": content[start : start + chunk_chars]}))
+    for index, call in enumerate(tool_calls or []):
+        chunks.append(chunk({"tool_calls": [{
+            "index": index,
+            "id": call.get("id", f"call_{index}"),
+            "type": "function",
+            "function": {"name": call["name"], "arguments": ""},
+        }]}))
+        arguments = json.dumps(call.get("arguments", {}))
+        for start in range(0, len(arguments), chunk_chars):
+            chunks.append(chunk({"tool_calls": [{
+                "index": index,
+                "function": {"arguments": arguments[start : start + chunk_chars]},
+            }]}))
+    chunks.append(chunk({}, "tool_calls" if tool_calls else "stop"))
+    return chunks
+
+
+class FakeOpenAIHandler(LLMProvider):
+    """
+    OpenAIHandler stand-in: chat completions answer from a script of responses (cycled),
+    embeddings are hash-seeded unit vectors. Every call sleeps `latency` seconds first,
+    streamed responses additionally `chunk_latency` seconds per chunk.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[List[dict]] = None,
+        dims: int = 1536,
+        latency: float = 0.0,
+        chunk_latency: float = 0.0,
+        embedding_latency: float = 0.0,
+    ):
+        self.responses = responses or [{"content": "ok"}]
+        self.dims = dims
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.embedding_latency = embedding_latency
+        self.chat_calls = 0
+        self.embedding_calls = 0
+        self.client = object()
+
+    def init_client(self) -> None:
+        pass
+
+    async def chat_completion(self, messages: list[dict], **kwargs) -> dict:
+        response = self.responses[self.chat_calls % len(self.responses)]
+        self.chat_calls += 1
+        await asyncio.sleep(self.latency)
+        if kwargs.get("stream"):
+            return self._stream(stream_chunks(response.get("content") or "", response.get("tool_calls")))
+        message = {"role": "assistant", "content": response.get("content")}
+        return {"choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}
+
+    async def _stream(self, chunks: List[ChatCompletionChunk]) -> AsyncIterator[ChatCompletionChunk]:
+        for chunk in chunks:
+            if self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            yield chunk
+
+    async def embed_inputs(self, inputs: list[str], **kwargs) -> dict:
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self.embedding_calls += 1
+        await asyncio.sleep(self.embedding_latency)
+        return {
+            "object": "list",
+            "model": "fake",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": text_vector(text, self.dims)}
+                for i, text in enumerate(inputs)
+            ],
+        }
+
+    async def probe_embedding_dims(self) -> int:
+        return self.dims
+
+
+class FakeVectorDBProvider(VectorDBProvider):
+    """Brute-force in-memory store that sleeps `latency` seconds per call, like a network round trip."""
+
+    def __init__(self, dims: int = 1536, latency: float = 0.0):
+        self.dims = dims
+        self.latency = latency
+        self.docs: Dict[str, MemoryDocument] = {}
+        self._matrix: Optional[np.ndarray] = None
+
+    async def create_index(self, dims: int) -> bool:
+        self.dims = dims
+        return True
+
+    async def index_exists(self) -> bool:
+        return True
+
+    async def add_documents(self, docs: List[MemoryDocument]) -> bool:
+        await asyncio.sleep(self.latency)
+        for doc in docs:
+            self.docs[doc.id] = doc
+        self._matrix = None
+        return True
+
+    async def vector_search(
+        self,
+        query_emb: List[float],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        category: str | None = None,
+        search_text: str | None = None,
+    ) -> List[dict]:
+        await asyncio.sleep(self.latency)
+        if not self.docs:
+            return []
+        if self._matrix is None:
+            self._matrix = np.asarray([doc.embeddings for doc in self.docs.values()], dtype=np.float32)
+        docs = list(self.docs.values())
+        scores = self._matrix @ np.asarray(query_emb, dtype=np.float32)
+        if category is not None:
+            scores[[doc.category != category for doc in docs]] = -np.inf
+        best = [i for i in np.argsort(-scores)[:top_k] if np.isfinite(scores[i])]
+        return [
+            {'id': docs[i].id, 'memory': docs[i].memory, 'category': docs[i].category,
+             'time': docs[i].time.isoformat() if docs[i].time else None, 'score': float(scores[i])}
+            for i in best
+        ]
+
+    async def delete_document(self, doc_ids: List[str]) -> bool:
+        await asyncio.sleep(self.latency)
+        for doc_id in doc_ids:
+            self.docs.pop(doc_id["id"] if isinstance(doc_id, dict) else doc_id, None)
+        self._matrix = None
+        return True
+
+
+class FakeSearchClient:
+    """
+    Azure SearchClient stand-in so AzureSearchMemoryHandler's own payload building and
+    result handling run without a service: uploads succeed and searches return `results`.
+    """
+
+    class _Result:
+        succeeded = True
+
+    def __init__(self, results: Optional[List[dict]] = None, latency: float = 0.0):
+        self.results = results or []
+        self.latency = latency
+
+    async def upload_documents(self, documents: List[dict]):
+        await asyncio.sleep(self.latency)
+        return [self._Result() for _ in documents]
+
+    async def delete_documents(self, documents: List[dict]):
+        await asyncio.sleep(self.latency)
+        return [self._Result() for _ in documents]
+
+    async def search(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._iterate(self.results[: kwargs.get("top") or len(self.results)])
+
+    async def _iterate(self, results: List[dict]):
+        for result in results:
+            yield result
@@ -0,0 +1,336 @@
+"""
+Concurrent load generator: runs simulated Chainlit sessions through the app's agent loop
+(agents.agent_loop.run_agent_turn) against the local OpenAI stand-in and the local
+memory backend, and reports how turn latency degrades with concurrency.
+
+    python benchmarks/load_test.py --sessions 1,10,50 --turns 5 --tokens-per-sec 50
+
+Every session has its own tenant, chat history and client, as in the app. The report
+gives throughput plus p50/p95/p99 of turn latency, time to first token and the time
+per turn spent in each phase: model calls (llm), embedding requests, memory-store
+searches and tool executions. Tool time includes the embedding and search calls the
+tools make; prefetching overlaps with model time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "src"), str(ROOT)]
+
+PHASES = ("llm", "embedding", "search", "tool")
+_turn_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("turn_phases", default=None)
+
+
+def record(phase: str, seconds: float) -> None:
+    phases = _turn_phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile; None without values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def summarise(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    server = subprocess.Popen([
+        sys.executable, str(ROOT / "benchmarks" / "stub_openai_server.py"),
+        "--port", str(args.port),
+        "--first-token-ms", str(args.first_token_ms),
+        "--tokens-per-sec", str(args.tokens_per_sec),
+        "--answer-words", str(args.answer_words),
+        "--tool-rate", str(args.tool_rate),
+        "--embedding-ms", str(args.embedding_ms),
+        "--dims", str(args.dims),
+    ])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{args.port}/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("stub server did not start")
+
+
+def prepare_environment(args: argparse.Namespace) -> None:
+    """
+    Points the app at the stand-in: a private llm_config.yaml (local memory backend)
+    in a scratch working directory, and Azure OpenAI settings aimed at the stub.
+    """
+    with open(ROOT / "llm_config.yaml") as f:
+        config = yaml.safe_load(f)
+    config["provider"] = "azure"
+    config["embedding_dimensions"] = None
+    config.setdefault("embedding_cache", {})["enabled"] = False
+    memory = config.setdefault("memory", {})
+    memory["backend"] = "local"
+    memory.setdefault("local", {})["storage"] = "memory"
+    memory.setdefault("write_behind", {})["enabled"] = args.write_behind
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    with open(os.path.join(workdir, "llm_config.yaml"), "w") as f:
+        yaml.safe_dump(config, f)
+    os.chdir(workdir)
+
+    os.environ.update({
+        "AZURE_OAI_ENDPOINT": f"http://127.0.0.1:{args.port}",
+        "AZURE_OAI_KEY": "stub",
+        "AZURE_OAI_API_VERSION": "2024-07-01-preview",
+        "AZURE_OAI_DEPLOYMENT_NAME": "stub-chat",
+        "AZURE_OAI_EMBEDDING_DEPLOYMENT_NAME": "stub-embedding",
+        "INDEX_NAME": "loadtest",
+        "TOKEN_LIMIT": str(args.token_limit),
+        "TOKEN_BUDGET_MODE": args.budget_mode,
+        "MEMORY_PREFETCH": str(args.prefetch).lower(),
+    })
+    if args.flush_ms is not None:
+        os.environ["STREAM_FLUSH_MS"] = str(args.flush_ms)
+    # The modules call load_dotenv(override=True); a developer's .env must not re-point
+    # them at a real endpoint.
+    import dotenv
+    dotenv.load_dotenv = lambda *a, **k: False
+
+
+def instrument() -> None:
+    """Wraps model, embedding and search calls so their time is booked to the running turn."""
+    from llm_handler.openai_handler import OpenAIHandler
+    from memory_handler.tenant_sharded_memory_handler import TenantShardedMemoryHandler
+
+    chat_completion = OpenAIHandler.chat_completion
+    embed_inputs = OpenAIHandler.embed_inputs
+
+    async def timed_stream(stream, start: float):
+        try:
+            async for part in stream:
+                yield part
+        finally:
+            record("llm", time.perf_counter() - start)
+
+    async def timed_chat_completion(self, messages, **kwargs):
+        start = time.perf_counter()
+        resp = await chat_completion(self, messages, **kwargs)
+        if kwargs.get("stream"):
+            # Streamed responses take their time while being read.
+            return timed_stream(resp, start)
+        record("llm", time.perf_counter() - start)
+        return resp
+
+    async def timed_embed_inputs(self, inputs, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await embed_inputs(self, inputs, **kwargs)
+        finally:
+            record("embedding", time.perf_counter() - start)
+
+    OpenAIHandler.chat_completion = timed_chat_completion
+    OpenAIHandler.embed_inputs = timed_embed_inputs
+
+    for name in ("vector_search", "batch_vector_search", "multi_vector_search"):
+        method = getattr(TenantShardedMemoryHandler, name)
+
+        async def timed_search(self, *a, _method=method, **kw):
+            start = time.perf_counter()
+            try:
+                return await _method(self, *a, **kw)
+            finally:
+                record("search", time.perf_counter() - start)
+
+        setattr(TenantShardedMemoryHandler, name, timed_search)
+
+
+async def timed_runner(name: str, tool_fn, args: dict):
+    from agents.tool_scheduler import invoke_tool
+
+    start = time.perf_counter()
+    try:
+        return await invoke_tool(tool_fn, args)
+    finally:
+        record("tool", time.perf_counter() - start)
+
+
+async def run_session(session_id: str, args: argparse.Namespace, turns: List[dict], delay: float) -> None:
+    from agents.agent_loop import new_chat_history, run_agent_turn
+    from llm_handler.openai_handler import OpenAIHandler
+    from memory_handler.memory_config import load_memory_config
+    from memory_handler.retrieval_cache import RetrievalCache, use_session_cache
+    from memory_handler.tenancy import use_tenant
+    from utilities.llm_config_handler import find_llm_config
+
+    await asyncio.sleep(delay)
+    use_tenant(session_id)
+    retrieval_cache = load_memory_config().retrieval_cache
+    if retrieval_cache.enabled and retrieval_cache.scope == "session":
+        use_session_cache(RetrievalCache(retrieval_cache))
+    history = new_chat_history()
+    client = OpenAIHandler(config_path=find_llm_config())
+    rng = random.Random(session_id)
+
+    for turn in range(args.turns):
+        text = f"{rng.choice(['Remember that', 'Do you recall', 'What did I say about'])} {rng.choice(['my coffee order', 'the Berlin trip', 'my sister', 'the project deadline'])} (turn {turn})?"
+        phases: Dict[str, float] = {}
+        token = _turn_phases.set(phases)
+        first_token: Optional[float] = None
+        frames = 0
+
+        async def on_token(_: str) -> None:
+            nonlocal first_token, frames
+            frames += 1
+            if first_token is None:
+                first_token = time.perf_counter()
+
+        start = time.perf_counter()
+        try:
+            await run_agent_turn(
+                history,
+                client,
+                text,
+                on_token=on_token,
+                runner=timed_runner,
+                prepare=asyncio.to_thread(client.init_client),
+            )
+            turns.append({
+                "session": session_id,
+                "latency": time.perf_counter() - start,
+                "ttft": first_token - start if first_token else None,
+                "frames": frames,
+                # Copied: write-behind jobs queued by this turn keep booking time afterwards.
+                "phases": dict(phases),
+                "error": None,
+            })
+        except Exception as e:
+            turns.append({"session": session_id, "latency": time.perf_counter() - start, "error": repr(e)})
+        finally:
+            _turn_phases.reset(token)
+        await asyncio.sleep(args.think_time)
+
+
+async def run_level(sessions: int, args: argparse.Namespace) -> dict:
+    turns: List[dict] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(f"load-{sessions}-{i}", args, turns, args.ramp * i / sessions)
+        for i in range(sessions)
+    ))
+    wall = time.perf_counter() - start
+    ok = [t for t in turns if t["error"] is None]
+    return {
+        "sessions": sessions,
+        "turns": len(turns),
+        "errors": len(turns) - len(ok),
+        "error_samples": sorted({t["error"] for t in turns if t["error"]})[:5],
+        "wall_seconds": wall,
+        "turns_per_second": len(ok) / wall if wall else None,
+        "turn_latency": summarise([t["latency"] for t in ok]),
+        "time_to_first_token": summarise([t["ttft"] for t in ok if t["ttft"] is not None]),
+        "ui_frames_per_turn": summarise([t["frames"] for t in ok]),
+        "phases": {phase: summarise([t["phases"].get(phase, 0.0) for t in ok]) for phase in PHASES},
+    }
+
+
+def print_level(level: dict) -> None:
+    def ms(value: Optional[float]) -> str:
+        return f"{value * 1e3:8.1f}" if value is not None else "       -"
+
+    print(
+        f"\n{level['sessions']} sessions: {level['turns']} turns, {level['errors']} errors, "
+        f"{level['turns_per_second']:.2f} turns/s over {level['wall_seconds']:.1f}s"
+    )
+    print(f"  {'ms':<20}{'p50':>8}{'p95':>8}{'p99':>8}")
+    rows = [("turn latency", level["turn_latency"]), ("time to first token", level["time_to_first_token"])]
+    rows += [(f"  {phase}", level["phases"][phase]) for phase in PHASES]
+    for label, stats in rows:
+        print(f"  {label:<20}{ms(stats['p50'])}{ms(stats['p95'])}{ms(stats['p99'])}")
+    frames = level["ui_frames_per_turn"]
+    if frames["count"]:
+        print(f"  UI frames per turn {frames['p50']:>9}{frames['p95']:>8}{frames['p99']:>8}")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from agents.tools.add_memory import memory_write_queue
+    from memory_handler.memory_handler_factory import close_memory_handlers, create_memory_handler
+
+    instrument()
+    # Probes the embedding size and opens the store once, as the app does at startup.
+    await create_memory_handler()
+    levels = []
+    for sessions in args.sessions:
+        level = await run_level(sessions, args)
+        print_level(level)
+        levels.append(level)
+    await memory_write_queue.drain()
+    await close_memory_handlers()
+    write_queue = memory_write_queue.metrics()
+    print(f"\nwrite-behind queue: {write_queue}")
+    return {"settings": vars(args), "levels": levels, "write_queue": write_queue}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,10", help="comma-separated concurrency levels, run one after another")
+    parser.add_argument("--turns", type=int, default=5, help="user messages per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between a reply and the next message")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which sessions start")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--tool-rate", type=float, default=0.5)
+    parser.add_argument("--embedding-ms", type=float, default=50.0)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--token-limit", type=int, default=4000)
+    parser.add_argument("--budget-mode", default="host", choices=["tool", "host", "hybrid"])
+    parser.add_argument("--prefetch", action="store_true", help="enable MEMORY_PREFETCH")
+    parser.add_argument("--write-behind", action="store_true", help="consolidate memories in background workers")
+    parser.add_argument("--flush-ms", type=float, help="STREAM_FLUSH_MS for the streamed replies; 0 sends every token")
+    parser.add_argument("--output", default="load_test_results.json")
+    args = parser.parse_args()
+    args.sessions = [int(level) for level in args.sessions.split(",")]
+    return args
+
+
+def main() -> int:
+    args = parse_args()
+    output = Path(args.output).resolve()
+    server = start_stub(args)
+    try:
+        prepare_environment(args)
+        from loguru import logger
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+        report = asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nwrote {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+"""
+Offline micro-benchmarks of the agent's hot paths. Model and memory-store calls go to
+the deterministic fakes in benchmarks/fakes.py, so no network or credentials are needed.
+
+    python benchmarks/run_benchmarks.py --output results.json --baseline previous.json
+
+Every case runs at several input sizes; results (per-round timings summarised as
+min/median/mean/p95) are written as JSON and compared against a baseline run if given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "src"), str(ROOT)]
+
+# Placeholder settings: the tool modules build their clients on import, nothing is ever sent.
+for _name, _value in {
+    "AZURE_OAI_KEY": "offline",
+    "AZURE_OAI_ENDPOINT": "https://offline.invalid",
+    "AZURE_OAI_API_VERSION": "2024-07-01-preview",
+    "AZURE_OAI_DEPLOYMENT_NAME": "offline",
+    "AZURE_OAI_EMBEDDING_DEPLOYMENT_NAME": "offline",
+    "OPENAI_API_KEY": "offline",
+    "TOKEN_LIMIT": "4000",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import numpy as np
+from loguru import logger
+from benchmarks.fakes import FakeOpenAIHandler, FakeSearchClient, FakeVectorDBProvider, stream_chunks, text_vector
+from benchmarks.synthetic import make_corpus, make_history, make_search_results, make_summary
+
+DIMS = 1536
+
+
+class Case:
+    """
+    One benchmark at one input size. `setup` runs before every round, untimed, and
+    returns the argument `run` is timed on. `report`, if given, is awaited after the
+    rounds and returns extra (untimed) figures stored with the result.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        run: Callable[[object], Awaitable],
+        setup: Optional[Callable] = None,
+        report: Optional[Callable[[], Awaitable[dict]]] = None,
+    ):
+        self.name = name
+        self.size = size
+        self.run = run
+        self.setup = setup or (lambda: None)
+        self.report = report
+
+
+async def measure(case: Case, rounds: int, warmup: int) -> Dict[str, float]:
+    timings = []
+    for i in range(warmup + rounds):
+        arg = case.setup()
+        if asyncio.iscoroutine(arg):
+            arg = await arg
+        start = time.perf_counter()
+        await case.run(arg)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        "rounds": len(timings),
+        "min": timings[0],
+        "median": median,
+        "mean": statistics.fmean(timings),
+        "p95": timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "ops_per_sec": 1.0 / median if median else float("inf"),
+    }
+
+
+def tokenizer_available() -> Optional[str]:
+    """None if the tiktoken encoding loads, else why not (it is downloaded on first use)."""
+    from utilities.chat_history import get_encoder
+    try:
+        get_encoder()
+        return None
+    except Exception as e:
+        return f"tiktoken encoding unavailable offline ({type(e).__name__}); warm TIKTOKEN_CACHE_DIR first"
+
+
+def token_cases() -> List[Case]:
+    from agents.tools.check_token_count import check_token_count_tool
+    from utilities.chat_history import ChatHistory
+
+    cases = []
+    for size in (100, 1000, 10000):
+        messages = make_history(size)
+        history = ChatHistory(messages)
+
+        async def build(_, messages=messages):
+            ChatHistory(messages)
+
+        async def check(_, history=history):
+            await check_token_count_tool(history)
+
+        cases.append(Case("chat_history_token_ledger", size, build))
+        cases.append(Case("check_token_count_tool", size, check))
+    return cases
+
+
+def jsonize_cases() -> List[Case]:
+    from utilities.llm_helper import jsonize_response
+
+    cases = []
+    for size in (10, 100, 1000):
+        summary = make_summary(size)
+
+        async def run(_, summary=summary):
+            await jsonize_response(summary)
+
+        cases.append(Case("jsonize_response", size, run))
+    return cases
+
+
+def stream_cases() -> List[Case]:
+    from utilities.llm_helper import assemble_stream
+    from utilities.stream_buffer import StreamBuffer
+
+    async def replay(chunks):
+        for chunk in chunks:
+            yield chunk
+
+    async def on_token(token: str) -> None:
+        pass
+
+    async def send_frame(token: str) -> None:
+        # Serialises a frame like the UI websocket does for every streamed token.
+        json.dumps({"id": "message", "token": token, "isSequence": False, "isInput": False})
+
+    cases = []
+    for size in (100, 1000, 10000):
+        # `size` content chunks followed by one tool call streamed in 4-character deltas.
+        chunks = stream_chunks(
+            content="x" * (4 * size),
+            tool_calls=[{"name": "search_memory", "arguments": {"queries": [{"search_text": "coffee " * 20}]}}],
+        )
+
+        async def run(_, chunks=chunks):
+            await assemble_stream(replay(chunks), on_token=on_token)
+
+        async def direct(_, chunks=chunks):
+            await assemble_stream(replay(chunks), on_token=send_frame)
+
+        async def buffered(_, chunks=chunks):
+            # Frames coalesced at the default cadence, as the agent loop sends them to the UI.
+            buffer = StreamBuffer(send_frame)
+            await assemble_stream(replay(chunks), on_token=buffer.write)
+            await buffer.flush()
+
+        cases.append(Case("stream_delta_assembly", size, run))
+        cases.append(Case("stream_direct_delivery", size, direct))
+        cases.append(Case("stream_buffered_delivery", size, buffered))
+    return cases
+
+
+def azure_cases(search_latency: float) -> List[Case]:
+    from memory_handler.azure_search_memory_handler import AzureSearchMemoryHandler
+
+    def handler(results=None) -> AzureSearchMemoryHandler:
+        handler = AzureSearchMemoryHandler()
+        handler.index_name = "benchmark"
+        handler.search_client = FakeSearchClient(results, latency=search_latency)
+        return handler
+
+    cases = []
+    for size in (10, 100, 1000):
+        docs = make_corpus(size, DIMS)
+        upload = handler()
+
+        async def add(_, upload=upload, docs=docs):
+            assert await upload.add_documents(docs)
+
+        cases.append(Case("azure_add_documents", size, add))
+
+    query = text_vector("query", DIMS)
+    for size in (5, 50, 500):
+        search = handler(make_search_results(size))
+
+        async def run(_, search=search, size=size):
+            await search.vector_search(query, top_k=size)
+
+        cases.append(Case("azure_vector_search_results", size, run))
+    return cases
+
+
+def local_cases() -> List[Case]:
+    from memory_handler.local_memory_handler import LocalMemoryHandler
+    from memory_handler.memory_config import HnswConfig, LocalMemoryConfig, QuantizationConfig
+
+    async def fresh(config: Optional[LocalMemoryConfig] = None) -> LocalMemoryHandler:
+        handler = LocalMemoryHandler("benchmark", config or LocalMemoryConfig())
+        await handler.create_index(dims=DIMS)
+        return handler
+
+    async def populated(size: int, chunk: int = 2000, config: Optional[LocalMemoryConfig] = None) -> LocalMemoryHandler:
+        handler = await fresh(config)
+        for start in range(0, size, chunk):
+            await handler.add_documents(make_corpus(min(chunk, size - start), DIMS, start=start))
+        return handler
+
+    cases = []
+    for size in (100, 1000, 10000):
+        docs = make_corpus(size, DIMS)
+
+        async def add(handler, docs=docs):
+            assert await handler.add_documents(docs)
+
+        cases.append(Case("local_add_documents", size, add, setup=fresh))
+
+    queries = [text_vector(f"query {i}", DIMS) for i in range(8)]
+    for size in (1000, 10000, 50000):
+        handler = asyncio.get_event_loop().run_until_complete(populated(size))
+
+        async def run(_, handler=handler):
+            for query in queries:
+                await handler.vector_search(query, top_k=5)
+
+        cases.append(Case("local_vector_search_x8", size, run))
+
+    # Graph searches at the same sizes place `hnsw.min_rows` against the flat scan above;
+    # a graph takes minutes to build, so it is built on the first round only.
+    for size in (1000, 10000):
+        built: Dict[str, LocalMemoryHandler] = {}
+
+        async def graph(size=size, built=built) -> LocalMemoryHandler:
+            if "handler" not in built:
+                config = LocalMemoryConfig(index="hnsw", hnsw=HnswConfig(min_rows=0))
+                built["handler"] = await populated(size, config=config)
+                await built["handler"].build_graphs()
+            return built["handler"]
+
+        async def run(handler):
+            for query in queries:
+                await handler.vector_search(query, top_k=5)
+
+        cases.append(Case("local_hnsw_search_x8", size, run, setup=graph))
+
+    # Quantised flat scans over segment files, reporting the RAM their codes take and their recall@10
+    # against the float32 scan next to the timings.
+    for mode in ("int8", "pq"):
+        size = 10000
+        built: Dict[str, LocalMemoryHandler] = {}
+
+        async def quantized(mode=mode, size=size, built=built) -> LocalMemoryHandler:
+            if "handler" not in built:
+                config = LocalMemoryConfig(
+                    storage="segments",
+                    data_dir=tempfile.mkdtemp(prefix="benchmark-"),
+                    quantization=QuantizationConfig(mode=mode),
+                )
+                built["handler"] = await populated(size, config=config)
+            return built["handler"]
+
+        async def run(handler):
+            for query in queries:
+                await handler.vector_search(query, top_k=5)
+
+        async def report(quantized=quantized) -> dict:
+            handler = await quantized()
+            return {**handler.memory_footprint(), "recall_at_10": await handler.quantization_recall(queries, top_k=10)}
+
+        cases.append(Case(f"local_{mode}_search_x8", size, run, setup=quantized, report=report))
+    return cases
+
+
+def tool_cases(llm_latency: float, search_latency: float) -> List[Case]:
+    from agents.tools import add_memory, search_memory
+
+    store = FakeVectorDBProvider(DIMS, latency=search_latency)
+    asyncio.get_event_loop().run_until_complete(store.add_documents(make_corpus(1000, DIMS)))
+
+    async def create_store():
+        return store
+
+    add_memory.create_memory_handler = create_store
+    search_memory.create_memory_handler = create_store
+
+    cases = []
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in make_history(40) if m.get("content"))
+    for size in (5, 20):
+        llm = FakeOpenAIHandler(
+            responses=[{"content": make_summary(size, seed=size)}],
+            dims=DIMS,
+            latency=llm_latency,
+            embedding_latency=llm_latency,
+        )
+
+        async def store_memories(_, llm=llm):
+            add_memory.openai_handler_obj = llm
+            await add_memory.store_memories(transcript)
+
+        cases.append(Case("store_memories_pipeline", size, store_memories))
+
+    llm = FakeOpenAIHandler(dims=DIMS, embedding_latency=llm_latency)
+    for size in (1, 4):
+        queries = [{"search_text": f"what does the user like {i}"} for i in range(size)]
+
+        async def search(_, queries=queries):
+            search_memory.openai_handler_obj = llm
+            await search_memory.search_memory_tool(queries=queries)
+
+        cases.append(Case("search_memory_tool", size, search))
+    return cases
+
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> List[dict]:
+    """Median change of every case also present in the baseline run."""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"] if "stats" in r}
+    changes = []
+    for result in results:
+        old = baseline.get((result["name"], result["size"]))
+        if old is None or "stats" not in result:
+            continue
+        ratio = result["stats"]["median"] / old["stats"]["median"]
+        changes.append({
+            "name": result["name"],
+            "size": result["size"],
+            "baseline_median": old["stats"]["median"],
+            "median": result["stats"]["median"],
+            "ratio": ratio,
+            "regression": ratio > 1.0 + threshold,
+        })
+    return changes
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="median slowdown reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on any regression")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="latency injected into fake model calls")
+    parser.add_argument("--search-latency-ms", type=float, default=0.0, help="latency injected into fake store calls")
+    args = parser.parse_args()
+    output = Path(args.output).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+
+    # llm_config.yaml is looked up from the working directory.
+    os.chdir(ROOT)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    llm_latency = args.llm_latency_ms / 1000
+    search_latency = args.search_latency_ms / 1000
+
+    results = []
+    skip_reason = tokenizer_available()
+    if skip_reason:
+        results.append({"name": "check_token_count_tool", "size": None, "skipped": skip_reason})
+        print(f"skipping token ledger cases: {skip_reason}")
+    groups = [jsonize_cases, stream_cases, lambda: azure_cases(search_latency), local_cases,
+              lambda: tool_cases(llm_latency, search_latency)]
+    if not skip_reason:
+        groups.insert(0, token_cases)
+
+    loop = asyncio.get_event_loop()
+    for group in groups:
+        for case in group():
+            if args.filter not in case.name:
+                continue
+            stats = loop.run_until_complete(measure(case, args.rounds, args.warmup))
+            results.append({"name": case.name, "size": case.size, "stats": stats})
+            print(f"{case.name:<32} {case.size:>7}  median {stats['median'] * 1e3:10.3f} ms  p95 {stats['p95'] * 1e3:10.3f} ms")
+            if case.report is not None:
+                results[-1]["metrics"] = loop.run_until_complete(case.report())
+                print(f"{'':<32} {'':>7}  {results[-1]['metrics']}")
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "settings": {
+            "rounds": args.rounds,
+            "warmup": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms,
+            "search_latency_ms": args.search_latency_ms,
+        },
+        "results": results,
+    }
+    regressions = []
+    if baseline:
+        report["comparison"] = compare(results, baseline, args.threshold)
+        regressions = [change for change in report["comparison"] if change["regression"]]
+        for change in report["comparison"]:
+            flag = "  REGRESSION" if change["regression"] else ""
+            print(f"{change['name']:<32} {change['size']:>7}  x{change['ratio']:.2f} vs baseline{flag}")
+
+    output.write_text(json.dumps(report, indent=2))
+    print(f"wrote {len(results)} results to {output}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Local stand-in for the OpenAI / Azure OpenAI API, used by the load generator.
+
+    python benchmarks/stub_openai_server.py --port 8765 --tokens-per-sec 50 --first-token-ms 300
+
+Chat completions stream one word per chunk at `--tokens-per-sec` after `--first-token-ms`.
+A deterministic share (`--tool-rate`) of user messages is answered with a search_memory
+tool call first; requests for a JSON object get a memory summary. Embeddings are
+hash-seeded unit vectors returned after `--embedding-ms`. Both the OpenAI (/v1/...) and
+Azure (/openai/deployments/<name>/...) routes are served.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = "sure here is what I remember about that and a few more details you might find useful".split()
+
+
+class StubSettings:
+    def __init__(self, args: argparse.Namespace):
+        self.first_token = args.first_token_ms / 1000
+        self.token_interval = 1.0 / args.tokens_per_sec if args.tokens_per_sec > 0 else 0.0
+        self.answer_words = args.answer_words
+        self.tool_rate = args.tool_rate
+        self.embedding_latency = args.embedding_ms / 1000
+        self.dims = args.dims
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+
+
+def _vector(text: str, dims: int) -> np.ndarray:
+    vector = np.random.default_rng(_digest(text)).normal(size=dims).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _chunk(delta: dict, finish_reason=None) -> str:
+    body = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "stub",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def plan_reply(body: dict, settings: StubSettings) -> dict:
+    """What the stub model answers: a memory summary, a search_memory call, or text."""
+    messages = body.get("messages") or []
+    last = messages[-1] if messages else {"role": "user", "content": ""}
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        transcript = str(last.get("content") or "")
+        lines = [line for line in transcript.splitlines() if line.startswith("user:")] or [transcript]
+        segments = [{"memory": line[:200], "category": "general_info"} for line in lines[-2:]]
+        return {"content": json.dumps({"segments": segments})}
+
+    tool_names = {tool["function"]["name"] for tool in body.get("tools") or []}
+    if (
+        last.get("role") == "user"
+        and "search_memory" in tool_names
+        and _digest(str(last.get("content"))) % 1000 < settings.tool_rate * 1000
+    ):
+        arguments = json.dumps({"queries": [{"search_text": str(last.get("content"))[:80]}]})
+        return {"tool_calls": [{"id": f"call_{_digest(arguments) % 10**8}", "name": "search_memory", "arguments": arguments}]}
+
+    return {"content": " ".join(WORDS[i % len(WORDS)] for i in range(settings.answer_words))}
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="OpenAI stand-in")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    def usage(body: dict, reply: dict) -> dict:
+        # Word counts stand in for tokens.
+        prompt = sum(len(str(m.get("content") or "").split()) for m in body.get("messages") or [])
+        completion = len((reply.get("content") or "").split()) + sum(len(c["arguments"]) // 4 for c in reply.get("tool_calls") or [])
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    async def stream(body: dict, reply: dict):
+        await asyncio.sleep(settings.first_token)
+        yield _chunk({"role": "assistant", "content": ""})
+        words = reply["content"].split(" ") if reply.get("content") else []
+        for i, word in enumerate(words):
+            yield _chunk({"content": word if i == 0 else " " + word})
+            await asyncio.sleep(settings.token_interval)
+        for index, call in enumerate(reply.get("tool_calls") or []):
+            yield _chunk({"tool_calls": [{
+                "index": index, "id": call["id"], "type": "function",
+                "function": {"name": call["name"], "arguments": ""},
+            }]})
+            arguments = call["arguments"]
+            for start in range(0, len(arguments), 16):
+                yield _chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[start : start + 16]}}]})
+                await asyncio.sleep(settings.token_interval)
+        yield _chunk({}, "tool_calls" if reply.get("tool_calls") else "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': 'stub', 'choices': [], 'usage': usage(body, reply)})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def chat(request: Request):
+        body = await request.json()
+        reply = plan_reply(body, settings)
+        if body.get("stream"):
+            return StreamingResponse(stream(body, reply), media_type="text/event-stream")
+
+        await asyncio.sleep(settings.first_token + settings.token_interval * len((reply.get("content") or "").split()))
+        message = {"role": "assistant", "content": reply.get("content")}
+        if reply.get("tool_calls"):
+            message["tool_calls"] = [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in reply["tool_calls"]
+            ]
+        return JSONResponse({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if reply.get("tool_calls") else "stop"}],
+            "usage": usage(body, reply),
+        })
+
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dims = body.get("dimensions") or settings.dims
+        await asyncio.sleep(settings.embedding_latency)
+        data = []
+        for i, text in enumerate(inputs):
+            vector = _vector(str(text), dims)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return JSONResponse({
+            "object": "list",
+            "model": "stub",
+            "data": data,
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    for path in ("/v1/chat/completions", "/chat/completions", "/openai/deployments/{deployment}/chat/completions"):
+        app.add_api_route(path, chat, methods=["POST"])
+    for path in ("/v1/embeddings", "/embeddings", "/openai/deployments/{deployment}/embeddings"):
+        app.add_api_route(path, embeddings, methods=["POST"])
+    return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--tool-rate", type=float, default=0.5, help="share of user messages answered with search_memory")
+    parser.add_argument("--embedding-ms", type=float, default=50.0)
+    parser.add_argument("--dims", type=int, default=1536)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    uvicorn.run(create_app(StubSettings(args)), host=args.host, port=args.port, log_level="warning")
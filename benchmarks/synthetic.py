@@ -0,0 +1,86 @@
+"""Seeded synthetic chat histories, memory corpora and model outputs of a given size."""
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List
+import numpy as np
+from providers.vector_db_provider import MemoryDocument
+
+WORDS = (
+    "memory user prefers coffee morning meeting project deadline python travel berlin "
+    "family birthday allergy peanuts vegetarian running marathon budget invoice team "
+    "manager guitar lessons weekend hiking book novel recommendation flight hotel"
+).split()
+CATEGORIES = ["general_info", "preferences", "work", "health", "travel"]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_history(messages: int, words_per_message: int = 40, tool_every: int = 5, seed: int = 0) -> List[dict]:
+    """A system prompt followed by user/assistant turns, with a search_memory tool call every `tool_every` turns."""
+    rng = random.Random(seed)
+    history = [{"role": "system", "content": "You are a helpful assistant with long-term memory."}]
+    turn = 0
+    while len(history) - 1 < messages:
+        history.append({"role": "user", "content": sentence(rng, words_per_message)})
+        if tool_every and turn % tool_every == tool_every - 1:
+            call_id = f"call_{turn}"
+            arguments = json.dumps({"queries": [{"search_text": sentence(rng, 6)}]})
+            history.append({
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "search_memory", "arguments": arguments}}],
+            })
+            history.append({"role": "tool", "tool_call_id": call_id, "content": json.dumps([{"memory": sentence(rng, 12)}])})
+        history.append({"role": "assistant", "content": sentence(rng, words_per_message)})
+        turn += 1
+    return history[: messages + 1]
+
+
+def make_corpus(size: int, dims: int = 1536, seed: int = 0, start: int = 0) -> List[MemoryDocument]:
+    """
+    `size` memory documents with unit-norm random embeddings spread over a few categories,
+    numbered from `start` so large corpora can be built in chunks.
+    """
+    rng = random.Random(seed + start)
+    vectors = np.random.default_rng(seed + start).normal(size=(size, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    epoch = datetime(2025, 1, 1)
+    return [
+        MemoryDocument(
+            id=f"doc{start + i:08d}",
+            memory=sentence(rng, 12),
+            embeddings=vectors[i].tolist(),
+            category=CATEGORIES[(start + i) % len(CATEGORIES)],
+            time=epoch + timedelta(minutes=start + i),
+        )
+        for i in range(size)
+    ]
+
+
+def make_summary(segments: int, seed: int = 0) -> str:
+    """Model output of the chat history summary prompt with `segments` memory segments."""
+    rng = random.Random(seed)
+    return json.dumps({
+        "segments": [
+            {"memory": sentence(rng, 15), "category": rng.choice(CATEGORIES)}
+            for _ in range(segments)
+        ]
+    })
+
+
+def make_search_results(size: int, seed: int = 0) -> List[dict]:
+    """Raw Azure AI Search result rows as the async result iterator yields them."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"doc{i:08d}",
+            "memory": sentence(rng, 12),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "time": "2025-01-01T00:00:00Z",
+            "@search.score": 1.0 / (1.0 + i / size),
+        }
+        for i in range(size)
+    ]
@@ -0,0 +1,109 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from loguru import logger
+from agents.tools.check_token_count import check_token_count_tool, check_token_count_definition
+from agents.tools.add_memory import add_memory_tool, add_memory_tool_definition
+from agents.tools.search_memory import search_memory_tool, search_memory_tool_definition
+from agents.tools.delete_memory import delete_memory_tool, delete_memory_tool_definition
+from agents.tool_scheduler import run_tool_calls
+from agents.token_budget import TokenBudgetPolicy
+from agents.context_compaction import ContextCompactor
+from agents.memory_prefetch import MemoryPrefetcher
+from llm_handler.openai_handler import OpenAIHandler
+from memory_handler.memory_config import load_memory_config
+from prompts.system_prompt import build_system_message
+from utilities.chat_history import ChatHistory
+from utilities.llm_helper import assemble_stream
+from utilities.stream_buffer import StreamBuffer
+from utilities.telemetry import traced
+
+# Tool schema registrations
+TOOLS = [
+    {"type": "function", "function": add_memory_tool_definition},
+    {"type": "function", "function": check_token_count_definition},
+    {"type": "function", "function": search_memory_tool_definition},
+    {"type": "function", "function": delete_memory_tool_definition},
+]
+TOOL_MAP = {
+    add_memory_tool_definition["name"]: add_memory_tool,
+    check_token_count_definition["name"]: check_token_count_tool,
+    search_memory_tool_definition["name"]: search_memory_tool,
+    delete_memory_tool_definition["name"]: delete_memory_tool,
+}
+TOKEN_BUDGET = TokenBudgetPolicy()
+CONTEXT_COMPACTOR = ContextCompactor()
+MEMORY_PREFETCHER = MemoryPrefetcher()
+
+
+def new_chat_history() -> ChatHistory:
+    """History of a new session, holding just the system prompt."""
+    return ChatHistory([{"role": "system", "content": build_system_message(TOKEN_BUDGET.mode, dedup=load_memory_config().dedup.enabled)}])
+
+
+@traced("agent.turn", "agent_turn_seconds")
+async def run_agent_turn(
+    history: ChatHistory,
+    client: OpenAIHandler,
+    text: str,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    runner: Optional[Callable[[str, Callable, dict], Awaitable]] = None,
+    prepare: Optional[Awaitable] = None,
+) -> str:
+    """
+    Answers one user message: streams model responses (content deltas go to `on_token`,
+    coalesced by a StreamBuffer) and runs the tool calls they request until the model
+    replies without tools.
+    `prepare` is awaited while the message is prefetched against the memory store;
+    `runner(name, tool_fn, args)` wraps every tool execution.
+    """
+    history.append({"role": "user", "content": text})
+    buffer = StreamBuffer(on_token) if on_token is not None else None
+    # Search the memory with the raw message while the turn is being set up.
+    prefetch = asyncio.create_task(MEMORY_PREFETCHER.fetch(text))
+    try:
+        if prepare is not None:
+            await prepare
+        context = MemoryPrefetcher.context_message(await prefetch)
+    except BaseException:
+        # A failed (or cancelled) turn leaves no search running behind it.
+        prefetch.cancel()
+        raise
+    # Memories prefetched for an earlier message are replaced, not piled up.
+    for stale in [msg for msg in history if MemoryPrefetcher.is_context(msg)]:
+        history.remove(stale)
+    if context:
+        history.append(context)
+
+    while True:
+        # Turns already stored in memory give way to the rolling summary.
+        CONTEXT_COMPACTOR.compact(history)
+        resp = await client.chat_completion(
+            messages=history,
+            tools=TOKEN_BUDGET.tools(TOOLS),
+            tool_choice="auto",
+            temperature=0.3,
+            top_p=0.4,
+            stream=True
+        )
+
+        assistant_content, tool_calls = await assemble_stream(resp, on_token=buffer.write if buffer else None)
+        if buffer is not None:
+            # Text before tool calls is shown before their steps start.
+            await buffer.flush()
+
+        logger.info("Model streamed response.")
+
+        if tool_calls:
+            history.append({
+                "role": "assistant",
+                "content": assistant_content if assistant_content else None,
+                "tool_calls": tool_calls
+            })
+
+            history.extend(await run_tool_calls(tool_calls, history, TOOL_MAP, runner=runner))
+            continue
+        else:
+            if assistant_content:
+                history.append({"role": "assistant", "content": assistant_content})
+            await TOKEN_BUDGET.enforce(history, runner=runner)
+            return assistant_content
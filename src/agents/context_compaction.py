@@ -0,0 +1,77 @@
+import os
+from typing import List
+from loguru import logger
+from utilities.chat_history import ChatHistory, get_encoder
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+CONTEXT_COMPACTION = os.getenv("CONTEXT_COMPACTION", "true").lower() == "true"
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "512"))
+
+SUMMARY_HEADER = "Summary of earlier turns of this conversation (stored in memory, use `search_memory` for details):"
+
+
+class ContextCompactor:
+    """
+    Keeps the prompt bounded: whole turns (a user message and everything up to the next
+    one) that are already consolidated into memory and older than the last `keep_turns`
+    turns are dropped, and a rolling summary of the stored memories, capped at
+    `summary_tokens`, takes their place right after the system prompt.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = CONTEXT_COMPACTION,
+        keep_turns: int = CONTEXT_KEEP_TURNS,
+        summary_tokens: int = CONTEXT_SUMMARY_TOKENS,
+    ):
+        self.enabled = enabled
+        self.keep_turns = max(1, keep_turns)
+        self.summary_tokens = summary_tokens
+
+    @staticmethod
+    def _is_summary(msg: dict) -> bool:
+        return msg["role"] == "system" and (msg.get("content") or "").startswith(SUMMARY_HEADER)
+
+    def _summary(self, memories: List[str]) -> str:
+        """Newest memories first until the token cap, rendered oldest first."""
+        enc = get_encoder()
+        lines, tokens = [], len(enc.encode(SUMMARY_HEADER))
+        for memory in reversed(memories):
+            tokens += len(enc.encode(memory)) + 1
+            if tokens > self.summary_tokens:
+                break
+            lines.append(f"- {memory}")
+        # Memories that no longer fit stay searchable in the memory store.
+        del memories[: len(memories) - len(lines)]
+        return "\n".join([SUMMARY_HEADER, *reversed(lines)])
+
+    def compact(self, history: List[dict]) -> int:
+        """Compacts `history` in place and returns the number of messages dropped."""
+        if not self.enabled or not isinstance(history, ChatHistory):
+            return 0
+
+        start = 0
+        while start < len(history) and history[start]["role"] == "system":
+            start += 1
+        turns = [i for i in range(start, len(history)) if history[i]["role"] == "user"]
+        watermark = history.state.watermark
+
+        end = start
+        for turn_end in turns[1:][: max(0, len(turns) - self.keep_turns)]:
+            if any(history.seq(i) >= watermark for i in range(end, turn_end)):
+                break
+            end = turn_end
+        if end == start:
+            return 0
+
+        del history[start:end]
+        summary = {"role": "system", "content": self._summary(history.state.memories)}
+        summary_at = next((i for i in range(start) if self._is_summary(history[i])), None)
+        if summary_at is None:
+            history.insert(start, summary)
+        else:
+            history[summary_at] = summary
+        logger.info("Compacted {} consolidated messages, {} left in context", end - start, len(history))
+        return end - start
@@ -0,0 +1,64 @@
+import os
+from typing import List, Optional
+from loguru import logger
+from llm_handler.openai_handler import OpenAIHandler
+from memory_handler.memory_handler_factory import create_memory_handler
+from utilities.llm_config_handler import find_llm_config
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+MEMORY_PREFETCH = os.getenv("MEMORY_PREFETCH", "false").lower() == "true"
+MEMORY_PREFETCH_THRESHOLD = float(os.getenv("MEMORY_PREFETCH_THRESHOLD", "0.8"))
+MEMORY_PREFETCH_TOP_K = int(os.getenv("MEMORY_PREFETCH_TOP_K", "3"))
+
+CONTEXT_HEADER = "Memories retrieved for the latest user message (call `search_memory` only if they are not sufficient):"
+
+openai_handler_obj = OpenAIHandler(config_path=find_llm_config())
+
+openai_handler_obj.init_client()
+
+
+class MemoryPrefetcher:
+    """
+    Speculatively searches the memory store with the raw user message while the turn
+    is being set up, so that relevant memories are in context for the first model call
+    and the search_memory round trip can usually be skipped.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = MEMORY_PREFETCH,
+        threshold: float = MEMORY_PREFETCH_THRESHOLD,
+        top_k: int = MEMORY_PREFETCH_TOP_K,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.top_k = top_k
+
+    async def fetch(self, text: str) -> List[dict]:
+        """Memories scoring at least `threshold` against `text`; failures yield no memories."""
+        if not self.enabled or not text.strip():
+            return []
+        try:
+            query_emb = (await openai_handler_obj.embed_inputs(inputs=[text]))["data"][0]["embedding"]
+            memory_handler_obj = await create_memory_handler()
+            docs = await memory_handler_obj.vector_search(query_emb=query_emb, top_k=self.top_k)
+        except Exception:
+            logger.exception("Memory prefetch failed")
+            return []
+        relevant = [doc for doc in docs if doc.get("score", 0.0) >= self.threshold]
+        logger.info("Prefetched {} of {} memories above {}", len(relevant), len(docs), self.threshold)
+        return relevant
+
+    @staticmethod
+    def is_context(msg: dict) -> bool:
+        """Whether `msg` is a message built by `context_message`."""
+        return msg.get("role") == "system" and str(msg.get("content") or "").startswith(CONTEXT_HEADER)
+
+    @staticmethod
+    def context_message(docs: List[dict]) -> Optional[dict]:
+        """Compact system message listing the prefetched memories, or None if there are none."""
+        if not docs:
+            return None
+        lines = [f"- [{doc.get('category') or 'uncategorised'}] {doc['memory']} (id: {doc['id']})" for doc in docs]
+        return {"role": "system", "content": "\n".join([CONTEXT_HEADER, *lines])}
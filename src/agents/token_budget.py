@@ -0,0 +1,58 @@
+import os
+from typing import Awaitable, Callable, List, Optional
+from loguru import logger
+from agents.tools.add_memory import add_memory_tool, add_memory_tool_definition
+from agents.tools.check_token_count import TOKEN_LIMIT, check_token_count_definition
+from agents.tool_scheduler import invoke_tool
+from utilities.chat_history import unconsolidated_tokens
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+# "tool": the model calls check_token_count before answering (one extra model round trip),
+# "host": the agent loop compares the history against TOKEN_LIMIT itself,
+# "hybrid": host enforcement with check_token_count still offered to the model.
+TOKEN_BUDGET_MODE = os.getenv("TOKEN_BUDGET_MODE", "tool")
+
+
+class TokenBudgetPolicy:
+    """Decides where the chat history token budget is enforced and consolidates memories on the host."""
+
+    def __init__(self, mode: str = TOKEN_BUDGET_MODE, limit: int = TOKEN_LIMIT):
+        if mode not in ("tool", "host", "hybrid"):
+            raise ValueError(f"Unsupported token budget mode: {mode}")
+        self.mode = mode
+        self.limit = limit
+
+    @property
+    def host_enforced(self) -> bool:
+        return self.mode in ("host", "hybrid")
+
+    @property
+    def offers_tool(self) -> bool:
+        return self.mode in ("tool", "hybrid")
+
+    def tools(self, tools: List[dict]) -> List[dict]:
+        """Tool schemas to offer the model under this policy."""
+        if self.offers_tool:
+            return tools
+        return [t for t in tools if t["function"]["name"] != check_token_count_definition["name"]]
+
+    def tokens(self, history: List[dict]) -> int:
+        """Tokens of the messages not yet consolidated into memory."""
+        return unconsolidated_tokens(history)
+
+    def exceeded(self, history: List[dict]) -> bool:
+        return self.tokens(history) > self.limit
+
+    async def enforce(
+        self,
+        history: List[dict],
+        runner: Optional[Callable[[str, Callable, dict], Awaitable]] = None,
+    ) -> Optional[dict]:
+        """Runs add_memory on a history snapshot when host enforcement is on and the limit is crossed."""
+        if not self.host_enforced or not self.exceeded(history):
+            return None
+        logger.info("Chat history holds {} tokens (limit {}), consolidating memories", self.tokens(history), self.limit)
+        args = {"chat_history": history.copy()}
+        name = add_memory_tool_definition["name"]
+        return await (runner(name, add_memory_tool, args) if runner else invoke_tool(add_memory_tool, args))
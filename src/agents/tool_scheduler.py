@@ -0,0 +1,65 @@
+import os
+import json
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+from agents.tools.add_memory import add_memory_tool_definition
+from agents.tools.check_token_count import check_token_count_definition
+from utilities.telemetry import TELEMETRY
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+MAX_TOOL_CONCURRENCY = int(os.getenv("MAX_TOOL_CONCURRENCY", "4"))
+
+# Tools that receive the chat history as an argument.
+HISTORY_TOOLS = {add_memory_tool_definition["name"], check_token_count_definition["name"]}
+
+
+async def invoke_tool(tool_fn: Callable, args: dict):
+    """Calls a tool function, awaiting it if it is a coroutine function."""
+    return await tool_fn(**args) if asyncio.iscoroutinefunction(tool_fn) else tool_fn(**args)
+
+
+async def run_tool_calls(
+    tool_calls: List[dict],
+    history: List[dict],
+    tool_map: Dict[str, Callable],
+    max_concurrency: int = MAX_TOOL_CONCURRENCY,
+    runner: Optional[Callable[[str, Callable, dict], Awaitable]] = None,
+) -> List[dict]:
+    """
+    Executes the tool calls of one model turn concurrently (at most `max_concurrency`
+    at a time) and returns their `tool` messages in the original tool_call order.
+    History-dependent tools all see the same snapshot, taken before any tool runs.
+    `runner(name, tool_fn, args)` can wrap each execution, e.g. in a UI step.
+    """
+    snapshot = history.copy()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(tc: dict) -> dict:
+        name = tc["function"]["name"]
+        async with semaphore:
+            try:
+                tool_fn = tool_map.get(name)
+                if not tool_fn:
+                    raise ValueError(f"Unknown tool: {name}")
+                args = json.loads(tc["function"]["arguments"] or "{}")
+                if name in HISTORY_TOOLS:
+                    args["chat_history"] = snapshot
+
+                logger.info(f"ARGS: {args}")
+                async with TELEMETRY.span(f"tool.{name}", "tool_seconds", tool=name):
+                    result = await (runner(name, tool_fn, args) if runner else invoke_tool(tool_fn, args))
+                logger.info(f"Tool result: {result}")
+            except Exception as e:
+                logger.error(f"Error executing tool {name}: {e}")
+                result = {"error": str(e)}
+
+        return {
+            "role": "tool",
+            "name": name,
+            "tool_call_id": tc["id"],
+            "content": json.dumps(result),
+        }
+
+    return list(await asyncio.gather(*(run(tc) for tc in tool_calls)))
@@ -1,5 +1,8 @@
-from typing import List, Annotated
-from memory_handler.azure_search_memory_handler import AzureSearchMemoryHandler
+from typing import List, Annotated, Optional
+from memory_handler.memory_handler_factory import create_memory_handler
+from memory_handler.memory_config import load_memory_config
+from memory_handler.memory_write_queue import MemoryWriteQueue
+from memory_handler.memory_dedup import deduplicate_documents
 from llm_handler.openai_handler import OpenAIHandler
 from utilities.llm_config_handler import find_llm_config
 from providers.vector_db_provider import MemoryDocument
@@ -9,39 +12,83 @@ import datetime
 import asyncio
 from prompts.chat_history_summary_prompt import chat_history_summary_prompt
 from utilities.llm_helper import jsonize_response
+from utilities.chat_history import ConsolidationBatch, claim_unconsolidated, format_transcript
 openai_handler_obj = OpenAIHandler(config_path=find_llm_config())
 
 openai_handler_obj.init_client()
 
+async def consolidate_memory(
+    batch: Annotated[ConsolidationBatch, "Messages claimed for consolidation"],
+) -> Annotated[bool, "Whether the memory segments were stored"]:
+    try:
+        memories = await store_memories(format_transcript(batch.messages))
+    except Exception:
+        batch.release()
+        raise
+    # Only messages that made it into the store move the watermark.
+    if memories is None:
+        batch.release()
+        return False
+    batch.commit(memories)
+    return True
+
+async def store_memories(
+    transcript: Annotated[str, "Conversation transcript to summarise"],
+) -> Annotated[Optional[List[str]], "The stored memories, or None if storing failed"]:
+    if not transcript:
+        return []
+    memory_handler_obj =  await create_memory_handler()
+    logger.info("adding memory to the memory store")
+    messages = [{"role": "system", "content": chat_history_summary_prompt},{"role": "user","content":f"chat history: >>>{transcript}<<<"}]  
+    memory_summary = await openai_handler_obj.chat_completion(
+        messages=messages,
+        response_format={"type":"json_object"},
+        temperature=0.2,
+        top_p=0.4,
+        seed=42
+    ) 
+    memory_summary =  await jsonize_response(memory_summary['choices'][0]['message']['content'])
+    embeddings = (await openai_handler_obj.embed_inputs(
+        inputs=[obj['memory'] for obj in memory_summary['segments']]
+    ))["data"]
+    memory_documents = [MemoryDocument(id=str(uuid1()).split("-")[0],
+            memory=obj['memory'],
+            category=obj['category'],
+            embeddings=embedding["embedding"],
+            time=datetime.datetime.now(),
+        ) 
+        for obj, embedding in zip(memory_summary['segments'], embeddings)
+    ]
+    # Near duplicates are dropped or merged here instead of by a search_memory round trip.
+    memory_documents = await deduplicate_documents(
+        memory_handler_obj, memory_documents, load_memory_config().dedup
+    )
+    if not memory_documents:
+        return []
+    if not await memory_handler_obj.add_documents(docs=memory_documents):
+        return None
+    return [doc.memory for doc in memory_documents]
+
+memory_write_queue = MemoryWriteQueue(consolidate_memory, load_memory_config().write_behind)
+
 async def add_memory_tool(
     chat_history: Annotated[List[dict], "Chat history"],
     **kwargs
 ) -> bool:
     try:
-        memory_handler_obj =  await AzureSearchMemoryHandler.create()
-        logger.info("adding memory to the memory store")
-        messages = [{"role": "system", "content": chat_history_summary_prompt},{"role": "user","content":f"chat history: >>>{chat_history}<<<"}]  
-        memory_summary = await openai_handler_obj.chat_completion(
-            messages=messages,
-            response_format={"type":"json_object"},
-            temperature=0.2,
-            top_p=0.4,
-            seed=42
-        ) 
-        memory_summary =  await jsonize_response(memory_summary['choices'][0]['message']['content'])
-        memory_documents = [MemoryDocument(id=str(uuid1()).split("-")[0],
-                memory=obj['memory'],
-                category=obj['category'],
-                embeddings=(await openai_handler_obj.embed_inputs(inputs=[obj['memory']]))[
-                    "data"
-                ][0]["embedding"],
-                time=datetime.datetime.now(),
-            ) 
-            for obj in memory_summary['segments']
-        ]
-        status = await memory_handler_obj.add_documents(
-            docs=memory_documents
-        )
+        batch = claim_unconsolidated(chat_history)
+        if not batch.messages:
+            return {"status": "no new messages to add to the memory store"}
+
+        if memory_write_queue.enabled:
+            # Summarising, embedding and uploading happen in the background workers.
+            if await memory_write_queue.enqueue(batch):
+                logger.info("queued {} new messages for the memory store", len(batch.messages))
+                return {"status": "queued for addition to the memory store"}
+            batch.release()
+            return {"status": "memory store is busy, the memory was not added"}
+
+        status = await consolidate_memory(batch)
         if status:
             logger.info("successfully added to the memory store")
             return {"status": "successfully added to the memory store"}
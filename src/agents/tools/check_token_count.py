@@ -1,5 +1,5 @@
-import tiktoken
 import os
+from utilities.chat_history import unconsolidated_tokens
 from dotenv import load_dotenv
 load_dotenv(override=True)
 
@@ -7,22 +7,8 @@ TOKEN_LIMIT = int(os.getenv('TOKEN_LIMIT'))
 
 async def check_token_count_tool(chat_history):
     global TOKEN_LIMIT
-    enc = tiktoken.encoding_for_model("gpt-4o")
-    
-    def count_tokens(msg):
-        if msg["role"] == "system":
-            return 0
-        elif msg["role"] == "tool":
-            return len(enc.encode(msg.get("content", "")))
-        elif msg["role"] == "assistant" and "tool_calls" in msg:
-            return sum(
-                len(enc.encode(str(tc.get("function", {}).get("arguments", ""))))
-                for tc in msg["tool_calls"]
-            )
-        else:
-            return len(enc.encode(msg.get("content", "")))
-
-    total_tokens = sum(count_tokens(m) for m in chat_history)
+    # Messages already stored in memory do not count against the limit.
+    total_tokens = unconsolidated_tokens(chat_history)
 
     if total_tokens > TOKEN_LIMIT:
         return {"status": "exceeds-limit", "tokens": total_tokens}
@@ -32,7 +18,7 @@ async def check_token_count_tool(chat_history):
 
 check_token_count_definition = {
     "name": "check_token_count",
-    "description": "Checks total token count in the chat history and returns the status whether the chat history is within the limit or exceeds the limit.",
+    "description": "Checks the token count of the chat history not yet added to memory and returns the status whether the chat history is within the limit or exceeds the limit.",
     "parameters": {
         "type": "object",
         "properties": {
@@ -1,5 +1,5 @@
 from typing import List, Annotated
-from memory_handler.azure_search_memory_handler import AzureSearchMemoryHandler
+from memory_handler.memory_handler_factory import create_memory_handler
 from loguru import logger
 
 
@@ -8,7 +8,7 @@ async def delete_memory_tool(
     document_ids: Annotated[List[str], "List of document ids which has to be deleted"],
 ) -> Annotated[str, "Status message of the deletion operation"]:
     try:
-        memory_handler_obj =  await AzureSearchMemoryHandler.create()
+        memory_handler_obj =  await create_memory_handler()
         logger.info("deleting memory from the memory store")
         status = await memory_handler_obj.delete_document(
             doc_ids=[{"id": doc_id} for doc_id in document_ids]
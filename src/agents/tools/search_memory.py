@@ -1,5 +1,8 @@
-from typing import List, Annotated, Union
-from memory_handler.azure_search_memory_handler import AzureSearchMemoryHandler
+from typing import List, Annotated, Optional, Union
+from memory_handler.memory_handler_factory import create_memory_handler
+from memory_handler.memory_config import load_memory_config
+from memory_handler.retrieval_cache import get_retrieval_cache
+from memory_handler.rank_fusion import reciprocal_rank_fusion
 from llm_handler.openai_handler import OpenAIHandler
 from utilities.llm_config_handler import find_llm_config
 from providers.vector_db_provider import MemoryDocument
@@ -11,20 +14,41 @@ openai_handler_obj = OpenAIHandler(config_path=find_llm_config())
 openai_handler_obj.init_client()
 
 async def search_memory_tool(
-    search_text: Annotated[str, "memory segment from the conversation"],
-    category: Annotated[str, "category to which the search text belongs to"],
+    queries: Annotated[Optional[List[dict]], "queries, each with a search_text and an optional category"] = None,
+    search_text: Annotated[Optional[str], "memory segment from the conversation"] = None,
+    category: Annotated[Optional[str], "category to which the search text belongs to"] = None,
     **kwargs
 ) -> Union[List[MemoryDocument],str]:
     try:
         logger.info("Searching in the memory...!")
-        memory_handler_obj = await AzureSearchMemoryHandler.create()
-        documents = await memory_handler_obj.vector_search(
-            query_emb=(await openai_handler_obj.embed_inputs(inputs=[search_text]))[
-                    "data"
-                ][0]["embedding"],
-            category=category
-        )
-        return json.dumps(documents)
+        if not queries:
+            queries = [{"search_text": search_text, "category": category}]
+        texts = [query["search_text"] for query in queries]
+        categories = [query.get("category") or None for query in queries]
+
+        cache = get_retrieval_cache(load_memory_config().retrieval_cache)
+        ranked = [cache.get(c, text) if cache else None for c, text in zip(categories, texts)]
+        missing = [i for i, docs in enumerate(ranked) if docs is None]
+        if cache and len(missing) < len(queries):
+            logger.info("Served {} of {} queries from the retrieval cache, stats: {}", len(queries) - len(missing), len(queries), cache.stats())
+
+        if missing:
+            # One embedding request for every query, then all searches at once.
+            embeddings = (await openai_handler_obj.embed_inputs(inputs=[texts[i] for i in missing]))["data"]
+            memory_handler_obj = await create_memory_handler()
+            searched = await memory_handler_obj.multi_vector_search(
+                query_embs=[embedding["embedding"] for embedding in embeddings],
+                categories=[categories[i] for i in missing],
+                search_texts=[texts[i] for i in missing],
+            )
+            for i, documents in zip(missing, searched):
+                ranked[i] = documents
+                if cache:
+                    cache.put(categories[i], texts[i], documents)
+
+        if len(ranked) == 1:
+            return json.dumps(ranked[0])
+        return json.dumps(reciprocal_rank_fusion(ranked))
     except Exception as e:
         logger.exception(f"{e}")
         return f"Exception occured while searching in the memory: {e}"
@@ -32,16 +56,26 @@ async def search_memory_tool(
 
 search_memory_tool_definition = {
     "name": "search_memory",
-    "description": "Search for memory item in the memory store",
+    "description": "Search for memory items in the memory store. Pass several queries to look up several facets in one call; their results are merged and deduplicated.",
     "parameters": {
         "type": "object",
         "properties": {
-            "search_text": {"type": "string", "description": "relevant text that you want to search about"},
-            "category": {
-                "type": "string",
-                "description": "category the search text belongs to",
+            "queries": {
+                "type": "array",
+                "description": "one entry per facet to search for",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "search_text": {"type": "string", "description": "relevant text that you want to search about"},
+                        "category": {
+                            "type": "string",
+                            "description": "category the search text belongs to; omit to search every category",
+                        },
+                    },
+                    "required": ["search_text"],
+                },
             },
         },
-        "required": ["search_text", "category"],
+        "required": ["queries"],
     },
 }
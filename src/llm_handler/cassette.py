@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Literal, Optional, Tuple
+import httpx
+from pydantic import BaseModel
+from loguru import logger
+
+# Parts of a request that differ between otherwise identical runs (memory timestamps
+# and ids echoed back in tool results) and are left out of its fingerprint.
+_VOLATILE = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+    r"|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+# Memory ids are the first 8 hex digits of a uuid1; they are masked where they appear
+# as an `id` value: JSON fields of tool results (also escaped inside message content)
+# and the `(id: ...)` references of the prefetched memories.
+_MEMORY_ID = re.compile(r'(\bid\\*"?\s*:\s*\\*"?)[0-9a-f]{8}\b')
+
+
+class CassetteConfig(BaseModel):
+    """`cassette` section of llm_config.yaml."""
+    mode: Literal["off", "record", "replay"] = "off"
+    path: str = "cassettes/llm.jsonl"
+    speed: float = 1.0
+    on_miss: Literal["error", "next"] = "error"
+
+
+def fingerprint(request: httpx.Request) -> str:
+    """Hash of the method, path and canonical JSON body of an API request."""
+    body = request.content
+    try:
+        text = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        text = body.decode("utf-8", "replace")
+    text = _MEMORY_ID.sub(r"\1~", _VOLATILE.sub("~", text))
+    target = request.url.raw_path.decode("ascii", "replace")
+    return hashlib.sha256(f"{request.method} {target}\n{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def _embedding_key(request: httpx.Request, body: dict, text: str) -> Tuple:
+    return (request.url.path, body.get("model"), body.get("dimensions"), body.get("encoding_format"), text)
+
+
+class Cassette:
+    """
+    Recorded API exchanges in a JSON-lines file: one line per request with its
+    fingerprint, the response status and the response body as the chunks it arrived
+    in, each with the delay before it (the first one after `wait`, the time to headers).
+    Repeated identical requests replay their recordings in order, the last one
+    again once they run out.
+    """
+
+    def __init__(self, config: CassetteConfig):
+        self.config = config
+        self.recorded = 0
+        self.played = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._exchanges: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._last: Dict[str, dict] = {}
+        self._unplayed: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._vectors: Dict[Tuple, Tuple[object, float]] = {}
+        if config.mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(config.path)), exist_ok=True)
+            self._file = open(config.path, "w", encoding="utf-8")
+            logger.info("Recording LLM traffic to {}", config.path)
+        elif config.mode == "replay":
+            with open(config.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._load(json.loads(line))
+            logger.info("Replaying {} recorded LLM exchanges from {}", sum(len(q) for q in self._exchanges.values()), config.path)
+
+    def _load(self, exchange: dict) -> None:
+        self._exchanges[exchange["fingerprint"]].append(exchange)
+        self._unplayed[exchange["endpoint"]].append(exchange)
+        inputs = exchange.get("inputs")
+        if inputs is None or exchange["status"] != 200:
+            return
+        # Embedding vectors are indexed per input too, so requests batched differently
+        # than during the recording can still be answered.
+        data = json.loads("".join(text for _, text in exchange["chunks"]))["data"]
+        for item in data:
+            self._vectors[tuple(exchange["embedding_key"]) + (inputs[item["index"]],)] = (item["embedding"], exchange["wait"])
+
+    def add(self, request: httpx.Request, status: int, content_type: str, wait: float, chunks: List[list]) -> None:
+        exchange = {
+            "fingerprint": fingerprint(request),
+            "endpoint": f"{request.method} {request.url.path}",
+            "status": status,
+            "content_type": content_type,
+            "wait": round(wait, 4),
+            "chunks": chunks,
+        }
+        if request.url.path.endswith("/embeddings"):
+            body = json.loads(request.content)
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            exchange["inputs"] = inputs
+            exchange["embedding_key"] = list(_embedding_key(request, body, "")[:-1])
+        line = json.dumps(exchange, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def find(self, request: httpx.Request) -> Optional[dict]:
+        """The recorded exchange to answer a request with, or None."""
+        key = fingerprint(request)
+        with self._lock:
+            queue = self._exchanges.get(key)
+            if queue:
+                exchange = queue.popleft()
+                self._last[key] = exchange
+            else:
+                exchange = self._last.get(key)
+            if exchange is None:
+                exchange = self._from_vectors(request)
+            if exchange is None:
+                self.misses += 1
+                if self.config.on_miss == "next":
+                    unplayed = self._unplayed[f"{request.method} {request.url.path}"]
+                    while unplayed and unplayed[0].get("played"):
+                        unplayed.popleft()
+                    exchange = unplayed.popleft() if unplayed else None
+            if exchange is not None:
+                exchange["played"] = True
+                self.played += 1
+            return exchange
+
+    def _from_vectors(self, request: httpx.Request) -> Optional[dict]:
+        if not request.url.path.endswith("/embeddings"):
+            return None
+        body = json.loads(request.content)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        found = [self._vectors.get(_embedding_key(request, body, text)) for text in inputs]
+        if not inputs or any(entry is None for entry in found):
+            return None
+        content = json.dumps({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, (vector, _) in enumerate(found)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+        return {
+            "status": 200,
+            "content_type": "application/json",
+            "wait": max(wait for _, wait in found),
+            "chunks": [[0.0, content]],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Passes a response body through while noting every chunk and the delay before it."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_complete):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._chunks: List[list] = []
+
+    async def __aiter__(self):
+        last = time.perf_counter()
+        async for chunk in self._stream:
+            now = time.perf_counter()
+            # surrogateescape keeps chunks that split a multi-byte character reversible.
+            self._chunks.append([round(now - last, 4), chunk.decode("utf-8", "surrogateescape")])
+            last = now
+            yield chunk
+        self._on_complete(self._chunks)
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: List[list], speed: float):
+        self._chunks = chunks
+        self._speed = speed
+
+    async def __aiter__(self):
+        for delay, text in self._chunks:
+            if self._speed > 0 and delay:
+                await asyncio.sleep(delay / self._speed)
+            yield text.encode("utf-8", "surrogateescape")
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport for the OpenAI clients. Recording, it forwards requests upstream
+    and saves every completed exchange to the cassette; replaying, it answers from the
+    cassette with the recorded timing divided by `speed` (0 skips the delays). Requests
+    that were not recorded get a 404, or with `on_miss: next` the next unplayed
+    exchange of the same endpoint.
+    """
+
+    def __init__(self, cassette: Cassette, upstream: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.upstream = upstream or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.config.mode == "replay":
+            return await self._replay(request)
+        return await self._record(request)
+
+    async def _record(self, request: httpx.Request) -> httpx.Response:
+        # Uncompressed bodies keep the cassette readable and the chunks replayable as-is.
+        request.headers["accept-encoding"] = "identity"
+        start = time.perf_counter()
+        response = await self.upstream.handle_async_request(request)
+        wait = time.perf_counter() - start
+        content_type = response.headers.get("content-type", "application/json")
+
+        def on_complete(chunks: List[list]) -> None:
+            self.cassette.add(request, response.status_code, content_type, wait, chunks)
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, on_complete),
+            extensions=response.extensions,
+        )
+
+    async def _replay(self, request: httpx.Request) -> httpx.Response:
+        exchange = self.cassette.find(request)
+        if exchange is None:
+            message = f"No recorded response for {request.method} {request.url.path} in {self.cassette.config.path}"
+            logger.error(message)
+            return httpx.Response(404, json={"error": {"message": message, "type": "cassette_miss"}})
+        speed = self.cassette.config.speed
+        if speed > 0 and exchange["wait"]:
+            await asyncio.sleep(exchange["wait"] / speed)
+        return httpx.Response(
+            status_code=exchange["status"],
+            headers={"content-type": exchange["content_type"]},
+            stream=_ReplayStream(exchange["chunks"], speed),
+        )
+
+    async def aclose(self) -> None:
+        await self.upstream.aclose()
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def get_cassette(config: CassetteConfig) -> Optional[Cassette]:
+    """
+    Returns the process-wide cassette for this configuration, or None when recording
+    and replay are off. LLM_CASSETTE_MODE, LLM_CASSETTE_PATH and LLM_CASSETTE_SPEED
+    override the llm_config.yaml settings.
+    """
+    overrides = {
+        field: os.getenv(name)
+        for field, name in (("mode", "LLM_CASSETTE_MODE"), ("path", "LLM_CASSETTE_PATH"), ("speed", "LLM_CASSETTE_SPEED"))
+        if os.getenv(name)
+    }
+    if overrides:
+        config = CassetteConfig(**{**config.model_dump(), **overrides})
+    if config.mode == "off":
+        return None
+    name = os.path.abspath(config.path)
+    if name not in _cassettes:
+        _cassettes[name] = Cassette(config)
+    return _cassettes[name]
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel
+from loguru import logger
+
+
+class EmbeddingBatchConfig(BaseModel):
+    """`embedding_batching` section of llm_config.yaml."""
+    enabled: bool = False
+    max_wait_ms: float = 10.0
+    max_batch_size: int = 64
+    max_batch_tokens: int = 8000
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token) used to cap batch size."""
+    return len(text) // 4 + 1
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched upstream calls.
+    Texts are collected for up to `max_wait_ms`, or until the batch reaches
+    `max_batch_size` inputs / `max_batch_tokens` estimated tokens, then sent in one
+    request; each caller is resolved with the vectors of its own texts.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]], config: EmbeddingBatchConfig):
+        self.embed_fn = embed_fn
+        self.config = config
+        self.requests = 0
+        self.batches = 0
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            tokens = approx_tokens(text)
+            if self._pending and self._tokens + tokens > self.config.max_batch_tokens:
+                self._flush()
+            future = loop.create_future()
+            self._pending.append((text, future))
+            self._tokens += tokens
+            futures.append(future)
+            if len(self._pending) >= self.config.max_batch_size:
+                self._flush()
+        self.requests += 1
+
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.config.max_wait_ms / 1000, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._tokens = self._pending, [], 0
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        try:
+            vectors = await self.embed_fn(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        logger.info("Embedded batch of {} texts for {} waiting inputs", len(texts), len(batch))
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+_batchers: Dict[Tuple[str, asyncio.AbstractEventLoop], EmbeddingBatcher] = {}
+
+
+def get_embedding_batcher(
+    namespace: str,
+    embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+    config: EmbeddingBatchConfig,
+) -> EmbeddingBatcher:
+    """Returns the batcher shared by every handler embedding into `namespace` on the running loop."""
+    key = (namespace, asyncio.get_running_loop())
+    if key not in _batchers:
+        # Batchers of closed loops can never flush again.
+        for stale in [k for k in _batchers if k[1].is_closed()]:
+            del _batchers[stale]
+        _batchers[key] = EmbeddingBatcher(embed_fn, config)
+    return _batchers[key]
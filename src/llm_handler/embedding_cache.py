@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from pydantic import BaseModel
+from loguru import logger
+from utilities.telemetry import TELEMETRY
+
+
+class EmbeddingCacheConfig(BaseModel):
+    """`embedding_cache` section of llm_config.yaml."""
+    enabled: bool = False
+    max_entries: int = 10000
+    ttl_seconds: Optional[float] = 7 * 24 * 3600
+    path: Optional[str] = ".embedding_cache.sqlite"
+    max_disk_entries: int = 500000
+
+
+class EmbeddingCache:
+    """
+    Two-level cache of embedding vectors keyed by (model, content hash):
+    a bounded in-memory LRU in front of an optional SQLite table of raw float32 blobs.
+    Entries older than the TTL are treated as misses; both levels evict least
+    recently used entries once they exceed their size limit.
+    """
+
+    def __init__(self, config: EmbeddingCacheConfig):
+        self.config = config
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0
+        if config.path:
+            os.makedirs(os.path.dirname(os.path.abspath(config.path)), exist_ok=True)
+            self._db = sqlite3.connect(config.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.config.ttl_seconds is not None and now - created > self.config.ttl_seconds
+
+    def _remember(self, key: str, vector: np.ndarray, created: float) -> None:
+        self._lru[key] = (vector, created)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.config.max_entries:
+            self._lru.popitem(last=False)
+
+    def _recall(self, keys: List[str], now: float) -> Dict[str, np.ndarray]:
+        """In-memory lookups only; cheap enough to run on the event loop."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._lru.get(key)
+                if entry is not None and not self._expired(entry[1], now):
+                    self._lru.move_to_end(key)
+                    found[key] = entry[0]
+        return found
+
+    def _load(self, keys: List[str], now: float) -> Dict[str, tuple]:
+        """Reads `keys` from SQLite and touches their access time. Blocking."""
+        found: Dict[str, tuple] = {}
+        if self._db is None or not keys:
+            return found
+        with self._db_lock:
+            rows = []
+            for start in range(0, len(keys), 900):
+                chunk = keys[start : start + 900]
+                rows.extend(self._db.execute(
+                    f"SELECT key, vector, created FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ))
+            for key, blob, created in rows:
+                if not self._expired(created, now):
+                    found[key] = (np.frombuffer(blob, dtype=np.float32), created)
+            if rows:
+                self._db.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?", [(now, row[0]) for row in rows]
+                )
+                self._db.commit()
+        return found
+
+    def _collect(self, keys: List[str], found: Dict[str, np.ndarray], loaded: Dict[str, tuple]) -> List[Optional[List[float]]]:
+        with self._lock:
+            for key, (vector, created) in loaded.items():
+                self._remember(key, vector, created)
+                found[key] = vector
+        self.disk_hits += len(loaded)
+        results = [found[key].tolist() if key in found else None for key in keys]
+        hits = sum(vector is not None for vector in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def _pending(self, keys: List[str], found: Dict[str, np.ndarray]) -> List[str]:
+        return [key for key in dict.fromkeys(keys) if key not in found]
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Returns the cached embedding of every text, or None for misses."""
+        now = time.time()
+        keys = [self.key(model, text) for text in texts]
+        found = self._recall(keys, now)
+        return self._collect(keys, found, self._load(self._pending(keys, found), now))
+
+    async def aget_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """`get_many` for the event loop: LRU hits are served inline, SQLite is read in a worker thread."""
+        now = time.time()
+        keys = [self.key(model, text) for text in texts]
+        found = self._recall(keys, now)
+        pending = self._pending(keys, found)
+        loaded = await asyncio.to_thread(self._load, pending, now) if self._db is not None and pending else {}
+        return self._collect(keys, found, loaded)
+
+    def _entries(self, model: str, texts: List[str], vectors: List[List[float]], now: float) -> List[tuple]:
+        entries = [
+            (self.key(model, text), np.asarray(vector, dtype=np.float32))
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            for key, vector in entries:
+                self._remember(key, vector, now)
+        return entries
+
+    def _store(self, entries: List[tuple], now: float) -> None:
+        """Writes `entries` to SQLite, evicting if it has grown past its limit. Blocking."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created, accessed) VALUES (?, ?, ?, ?)",
+                [(key, vector.tobytes(), now, now) for key, vector in entries],
+            )
+            self._disk_entries += len(entries)
+            if self._disk_entries > self.config.max_disk_entries:
+                self._evict_disk(now)
+            self._db.commit()
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        self._store(self._entries(model, texts, vectors, now), now)
+
+    async def aput_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """`put_many` for the event loop: the LRU is filled inline, SQLite is written in a worker thread."""
+        now = time.time()
+        entries = self._entries(model, texts, vectors, now)
+        if self._db is not None:
+            await asyncio.to_thread(self._store, entries, now)
+
+    def _evict_disk(self, now: float) -> None:
+        if self.config.ttl_seconds is not None:
+            self._db.execute("DELETE FROM embeddings WHERE created < ?", (now - self.config.ttl_seconds,))
+        self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_entries - self.config.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+            self._disk_entries -= excess
+        logger.info("Evicted embedding cache down to {} entries", self._disk_entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "disk_entries": self._disk_entries,
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+
+
+def get_embedding_cache(config: EmbeddingCacheConfig) -> Optional[EmbeddingCache]:
+    """Returns the process-wide cache for this configuration, or None when caching is disabled."""
+    if not config.enabled:
+        return None
+    name = os.path.abspath(config.path) if config.path else ""
+    if name not in _caches:
+        _caches[name] = cache = EmbeddingCache(config)
+        if len(_caches) == 1:
+            TELEMETRY.gauge("embedding_cache_memory_entries", "Embeddings held in the in-memory LRU", lambda: len(cache._lru))
+            TELEMETRY.gauge("embedding_cache_disk_entries", "Embeddings stored in the SQLite cache", lambda: cache._disk_entries)
+    return _caches[name]
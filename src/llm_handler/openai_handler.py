@@ -3,11 +3,15 @@ import yaml
 from typing import Literal, Optional
 from pydantic import BaseModel, Field, ValidationError
 from loguru import logger
-from openai import AsyncOpenAI, AsyncAzureOpenAI
+from openai import AsyncOpenAI, AsyncAzureOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from providers.llm_provider import LLMProvider
+from llm_handler.embedding_cache import EmbeddingCacheConfig, get_embedding_cache
+from llm_handler.embedding_batcher import EmbeddingBatchConfig, get_embedding_batcher
+from llm_handler.cassette import CassetteConfig, CassetteTransport, get_cassette
 from utilities.llm_config_handler import find_llm_config
+from utilities.telemetry import TELEMETRY, traced
 load_dotenv(override=True)
 
 class OpenAIConfig(BaseModel):
@@ -24,12 +28,19 @@ class AzureConfig(BaseModel):
 
 class OpenAIConfig(BaseSettings):
     provider: Literal["azure", "openai"]
+    embedding_dimensions: Optional[int] = None
+    embedding_cache: EmbeddingCacheConfig = EmbeddingCacheConfig()
+    embedding_batching: EmbeddingBatchConfig = EmbeddingBatchConfig()
+    cassette: CassetteConfig = CassetteConfig()
 
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         extra = "ignore"  # Ignore extra fields from YAML
 
+# Embedding sizes probed per model (and requested dimensions) in this process.
+_probed_dims: dict = {}
+
 class OpenAIHandler(LLMProvider):
     """
     Initializes and exposes an async LLM client based on provider configuration.
@@ -75,6 +86,8 @@ class OpenAIHandler(LLMProvider):
             raise
 
         self.client = None
+        self.embedding_cache = get_embedding_cache(self.cfg.embedding_cache)
+        self.cassette = get_cassette(self.cfg.cassette)
 
     def init_client(self) -> None:
         """
@@ -87,13 +100,14 @@ class OpenAIHandler(LLMProvider):
                     api_key=self.azure_config.api_key,
                     azure_endpoint=self.azure_config.endpoint,
                     api_version=self.azure_config.api_version,
+                    http_client=self._http_client(),
                 )
                 logger.info("AsyncAzureOpenAI client initialized")
             elif self.cfg.provider == "openai":
                 assert self.openai_config is not None
-                kwargs = {"api_key": self.openai_config.api_key}
+                kwargs = {"api_key": self.openai_config.api_key, "http_client": self._http_client()}
                 if self.openai_config.api_base:
-                    kwargs["api_base"] = self.openai_config.api_base
+                    kwargs["base_url"] = self.openai_config.api_base
                 self.client = AsyncOpenAI(**kwargs)
                 logger.info("AsyncOpenAI client initialized")
             else:
@@ -102,12 +116,21 @@ class OpenAIHandler(LLMProvider):
             logger.exception("Failed to initialize client")
             raise
 
+    def _http_client(self):
+        """HTTP client of the SDK, recording to / replaying from the cassette if one is configured."""
+        transport = CassetteTransport(self.cassette) if self.cassette is not None else None
+        return DefaultAsyncHttpxClient(transport=transport, event_hooks={"request": [TELEMETRY.on_llm_request]})
+
+    @traced("llm.chat_completion", "llm_request_seconds", operation="chat")
     async def chat_completion(self, messages: list[dict], **kwargs) -> dict:
         """
         Send chat completion request via the selected client.
         """
         if self.client is None:
             raise RuntimeError("Client not initialized; call init_client() first")
+        if TELEMETRY.enabled and kwargs.get("stream"):
+            # Streams only report token usage in a final chunk on request.
+            kwargs.setdefault("stream_options", {"include_usage": True})
 
         try:
             if self.cfg.provider == "azure":
@@ -128,18 +151,94 @@ class OpenAIHandler(LLMProvider):
             logger.exception("Error during chat_completion call")
             raise
 
+    @traced("llm.embed_inputs")
     async def embed_inputs(self, inputs: list[str], **kwargs) -> dict:
         """
         Generate embeddings via selected provider client.
+        With the embedding cache enabled only the cache misses are sent upstream;
+        with batching enabled they are coalesced with concurrent requests.
         """
         if self.client is None:
             raise RuntimeError("Client not initialized; call init_client() first")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if self.cfg.embedding_dimensions and "dimensions" not in kwargs:
+            kwargs["dimensions"] = self.cfg.embedding_dimensions
+        if self.embedding_cache is None and not self.cfg.embedding_batching.enabled:
+            return await self._embed_upstream(inputs, **kwargs)
+
+        namespace = self._embedding_namespace(kwargs)
+        if self.embedding_cache is not None:
+            vectors = await self.embedding_cache.aget_many(namespace, inputs)
+        else:
+            vectors = [None] * len(inputs)
+        missing = list(dict.fromkeys(text for text, vector in zip(inputs, vectors) if vector is None))
+        if self.embedding_cache is not None:
+            misses = sum(vector is None for vector in vectors)
+            TELEMETRY.count("cache_lookups_total", len(inputs) - misses, cache="embedding", result="hit")
+            TELEMETRY.count("cache_lookups_total", misses, cache="embedding", result="miss")
+        if missing:
+            fresh = await self._embed_missing(missing, namespace, **kwargs)
+            if self.embedding_cache is not None:
+                await self.embedding_cache.aput_many(namespace, missing, fresh)
+            fresh = dict(zip(missing, fresh))
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(inputs, vectors)]
+        if self.embedding_cache is not None:
+            logger.info(
+                "Embedding cache served {}/{} inputs, stats: {}",
+                len(inputs) - len(missing),
+                len(inputs),
+                self.embedding_cache.stats(),
+            )
+        return {
+            "object": "list",
+            "model": namespace,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": vector}
+                for i, vector in enumerate(vectors)
+            ],
+        }
+
+    async def _embed_missing(self, texts: list[str], namespace: str, **kwargs) -> list[list[float]]:
+        async def embed(batch: list[str]) -> list[list[float]]:
+            resp = await self._embed_upstream(batch, **dict(kwargs))
+            return [item["embedding"] for item in sorted(resp["data"], key=lambda item: item["index"])]
+
+        if self.cfg.embedding_batching.enabled:
+            batcher = get_embedding_batcher(namespace, embed, self.cfg.embedding_batching)
+            return await batcher.embed(texts)
+        return await embed(texts)
 
+    async def probe_embedding_dims(self) -> int:
+        """
+        Embeds a probe text once per process and returns the size of the vectors the
+        model produces with the configured `embedding_dimensions`.
+        """
+        namespace = self._embedding_namespace({"dimensions": self.cfg.embedding_dimensions})
+        if namespace not in _probed_dims:
+            resp = await self.embed_inputs(inputs=["dimension probe"])
+            dims = len(resp["data"][0]["embedding"])
+            if self.cfg.embedding_dimensions and dims != self.cfg.embedding_dimensions:
+                raise ValueError(
+                    f"Embedding model returned {dims} dims, {self.cfg.embedding_dimensions} configured"
+                )
+            logger.info("Embedding model '{}' produces {}-dim vectors", namespace, dims)
+            _probed_dims[namespace] = dims
+        return _probed_dims[namespace]
+
+    def _embedding_namespace(self, kwargs: dict) -> str:
+        model = self.azure_config.embedding_deployment if self.cfg.provider == "azure" else kwargs.get("model")
+        dimensions = kwargs.get("dimensions")
+        return f"{model}:{dimensions}" if dimensions else str(model)
+
+    @traced("llm.embeddings", "llm_request_seconds", operation="embeddings")
+    async def _embed_upstream(self, inputs: list[str], **kwargs) -> dict:
         try:
             if self.cfg.provider == "azure":
                 resp = await self.client.embeddings.create(
                     model=self.azure_config.embedding_deployment,
                     input=inputs,
+                    **({"dimensions": kwargs["dimensions"]} if kwargs.get("dimensions") else {}),
                     # **{"api_version": self.azure_config.embedding_api_version or self.azure_config.api_version, **kwargs}
                 )
             else:
@@ -154,7 +253,6 @@ class OpenAIHandler(LLMProvider):
             logger.exception("Error during embed_inputs call")
             raise
 
-
 if __name__ == "__main__":
     import asyncio
     async def main():
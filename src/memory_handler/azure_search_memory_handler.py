@@ -1,8 +1,12 @@
 import os
-from typing import List
+import asyncio
+from typing import List, Optional
 from datetime import datetime
+import aiohttp
 from loguru import logger
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
 from azure.search.documents.indexes.aio import SearchIndexClient
 from azure.search.documents.aio import SearchClient
 from azure.search.documents.indexes.models import (
@@ -26,8 +30,12 @@ from azure.search.documents.indexes.models import (
 )
 from azure.search.documents.models import VectorizedQuery
 from providers.vector_db_provider import VectorDBProvider, MemoryDocument
+from memory_handler.retrieval_cache import invalidate_retrieval_caches
+from memory_handler.memory_config import load_memory_config
+from memory_handler.tenancy import DEFAULT_TENANT, current_tenant, odata_literal
 from dotenv import load_dotenv
 from utilities.llm_config_handler import find_llm_config
+from utilities.telemetry import TELEMETRY, traced
 
 load_dotenv(override=True)
 
@@ -36,38 +44,140 @@ class AzureSearchMemoryHandler(VectorDBProvider):
     """
     Azure-based memory handler implementing index creation,
     document ingestion, vector search, and deletion.
+    One handler is shared per process (and event loop): its clients reuse a single
+    pooled aiohttp session and the index is only bootstrapped when it is missing.
+    Every document carries the tenant that wrote it, and searches and deletes are
+    filtered to the tenant of the current context.
     """
 
+    _instance: Optional["AzureSearchMemoryHandler"] = None
+    _lock: Optional[asyncio.Lock] = None
+    _lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
     def __init__(self):
-        pass
+        self.search_client = None
     
     @classmethod
-    async def create(cls):
+    async def create(cls, dims: int = 1536):
+        loop = asyncio.get_running_loop()
+        if cls._instance is not None and cls._instance._loop is loop:
+            return cls._instance
+
+        if cls._lock_loop is not loop:
+            cls._lock, cls._lock_loop = asyncio.Lock(), loop
+        async with cls._lock:
+            if cls._instance is None or cls._instance._loop is not loop:
+                cls._instance = await cls._start(loop, dims)
+        return cls._instance
+
+    @classmethod
+    async def _start(cls, loop: asyncio.AbstractEventLoop, dims: int):
         self = cls()
+        self._loop = loop
         self.endpoint = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
         self.key = os.getenv("AZURE_AI_SEARCH_KEY")
         self.index_name = os.getenv("INDEX_NAME")
         self.cred = AzureKeyCredential(self.key)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=int(os.getenv("AZURE_AI_SEARCH_POOL_SIZE", "100")))
+        )
         self.idx_client = SearchIndexClient(
-            endpoint=self.endpoint, credential=self.cred
+            endpoint=self.endpoint, credential=self.cred, transport=self._transport()
         )
-        self.search_client = None
-        success = await self.create_index(dims=1536)
-        if not success:
-            raise RuntimeError("Index setup failed")
+        self.search_client = SearchClient(
+            self.endpoint, self.index_name, self.cred, transport=self._transport()
+        )
+        try:
+            if not await self.index_exists():
+                success = await self.create_index(dims=dims)
+                if not success:
+                    raise RuntimeError("Index setup failed")
+            else:
+                index_dims = await self.index_dims()
+                if index_dims != dims:
+                    # Uploads of differently sized vectors would only fail one by one later on.
+                    raise RuntimeError(
+                        f"Index '{self.index_name}' holds {index_dims}-dim embeddings, "
+                        f"the embedding model produces {dims}"
+                    )
+                await self.ensure_tenant_field()
+        except Exception:
+            await self.close()
+            raise
         return self
 
+    def _transport(self) -> AioHttpTransport:
+        return AioHttpTransport(session=self.session, session_owner=False)
+
+    async def close(self) -> None:
+        """Closes both clients and the shared HTTP session."""
+        await self.search_client.close()
+        await self.idx_client.close()
+        await self.session.close()
+        logger.info("Closed search clients for '{}'", self.index_name)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """Closes the process-wide handler, if one was started."""
+        instance, cls._instance = cls._instance, None
+        if instance is not None:
+            await instance.close()
+
+    @traced("azure_search.index_exists", "memory_store_seconds", backend="azure", operation="index_exists")
     async def index_exists(self) -> bool:
         try:
-            idxs = self.idx_client.list_indexes()
-            names = [idx.name async for idx in idxs]
-            exists = self.index_name in names
-            logger.info("Index '{}' exists? {}", self.index_name, exists)
-            return exists
+            await self.idx_client.get_index(self.index_name)
+            exists = True
+        except ResourceNotFoundError:
+            exists = False
         except Exception:
             logger.exception("Error checking index existence: {}", self.index_name)
             return False
+        logger.info("Index '{}' exists? {}", self.index_name, exists)
+        return exists
+
+    @traced("azure_search.index_dims", "memory_store_seconds", backend="azure", operation="index_dims")
+    async def index_dims(self) -> Optional[int]:
+        """Vector size of the `embeddings` field of the existing index."""
+        index = await self.idx_client.get_index(self.index_name)
+        field = next((f for f in index.fields if f.name == "embeddings"), None)
+        return field.vector_search_dimensions if field is not None else None
+
+    @staticmethod
+    def _tenant_field() -> SimpleField:
+        return SimpleField(name="tenant", type=SearchFieldDataType.String, filterable=True)
+
+    @traced("azure_search.ensure_tenant_field", "memory_store_seconds", backend="azure", operation="ensure_tenant_field")
+    async def ensure_tenant_field(self) -> None:
+        """
+        Adds the `tenant` field to an index created before memories were partitioned and
+        assigns documents without a tenant to the default tenant.
+        """
+        index = await self.idx_client.get_index(self.index_name)
+        if not any(f.name == "tenant" for f in index.fields):
+            index.fields.append(self._tenant_field())
+            await self.idx_client.create_or_update_index(index)
+            logger.info("Added tenant field to index '{}'", self.index_name)
+        await self.backfill_tenant()
+
+    async def backfill_tenant(self, batch_size: int = 1000) -> int:
+        """
+        Stamps DEFAULT_TENANT on every document without a tenant, which would otherwise
+        match no tenant filter. Runs on every start, so an interrupted backfill resumes.
+        """
+        results = await self.search_client.search(search_text="*", filter="tenant eq null", select=["id"])
+        ids = [r["id"] async for r in results]
+        for start in range(0, len(ids), batch_size):
+            res = await self.search_client.merge_or_upload_documents(
+                documents=[{"id": doc_id, "tenant": DEFAULT_TENANT} for doc_id in ids[start : start + batch_size]]
+            )
+            if not all(r.succeeded for r in res):
+                raise RuntimeError(f"Assigning a tenant to existing documents of '{self.index_name}' failed")
+        if ids:
+            logger.info("Assigned {} existing documents of '{}' to tenant '{}'", len(ids), self.index_name, DEFAULT_TENANT)
+        return len(ids)
 
+    @traced("azure_search.create_index", "memory_store_seconds", backend="azure", operation="create_index")
     async def create_index(self, dims: int = 1536) -> bool:
         try:
             fields = [
@@ -86,10 +196,11 @@ class AzureSearchMemoryHandler(VectorDBProvider):
                     filterable=True,
                     facetable=True,
                 ),
-                SearchField(name="memory", type=SearchFieldDataType.String),
+                SearchField(name="memory", type=SearchFieldDataType.String, searchable=True),
                 SearchField(
                     name="category", type=SearchFieldDataType.String, filterable=True
                 ),
+                self._tenant_field(),
                 SearchField(
                     name="time",
                     type=SearchFieldDataType.DateTimeOffset,
@@ -152,25 +263,29 @@ class AzureSearchMemoryHandler(VectorDBProvider):
                 semantic_search=semantic_search,
             )
             await self.idx_client.create_or_update_index(idx)
-            self.search_client = SearchClient(self.endpoint, self.index_name, self.cred)
             logger.info("Index '{}' created", self.index_name)
             return True
         except Exception:
             logger.exception("Failed to create index '{}'", self.index_name)
             return False
 
+    @traced("azure_search.add_documents", "memory_store_seconds", backend="azure", operation="add_documents")
     async def add_documents(self, docs: List[MemoryDocument]) -> bool:
         assert self.search_client
         try:
+            tenant = current_tenant()
             payload = []
             for doc in docs:
                 doc = doc.dict()
                 if 'time' not in doc:
                     doc['time'] = datetime.now()
+                doc['tenant'] = tenant
                 payload.append(doc)
 
             res = await self.search_client.upload_documents(documents=payload)
             succeeded = all(r.succeeded for r in res)
+            TELEMETRY.count("memory_documents_uploaded_total", sum(r.succeeded for r in res), backend="azure")
+            invalidate_retrieval_caches((doc['category'] for doc in payload), tenant=tenant)
             logger.info(
                 "Uploaded {} docs to '{}', success={}",
                 len(payload),
@@ -182,25 +297,39 @@ class AzureSearchMemoryHandler(VectorDBProvider):
             logger.exception("Failed to upload documents to '{}'", self.index_name)
             return False
 
+    @traced("azure_search.vector_search", "memory_store_seconds", backend="azure", operation="vector_search")
     async def vector_search(
         self,
         query_emb: List[float],
         top_k: int = 5,
         exhaustive: bool = False,
         category: str | None = None,
+        search_text: str | None = None,
     ) -> List[MemoryDocument]:
         assert self.search_client
         try:
+            hybrid = load_memory_config().hybrid
+            if not hybrid.enabled or hybrid.lexical_weight <= 0:
+                search_text = None
 
+            # In a hybrid query Azure fuses the BM25 and vector rankings with RRF,
+            # the vector ranking weighted relative to the text ranking; a zero vector
+            # weight leaves the text ranking alone.
             vector_query = VectorizedQuery(
-                vector=query_emb, k_nearest_neighbors=top_k, fields="embeddings"
+                vector=query_emb,
+                k_nearest_neighbors=max(top_k, hybrid.candidates) if search_text else top_k,
+                fields="embeddings",
+                weight=hybrid.vector_weight / hybrid.lexical_weight if search_text else None,
             )
+            vector_queries = [vector_query] if not search_text or hybrid.vector_weight > 0 else None
 
-            filter_expr = f"category eq '{category}'" if category else None
+            filter_expr = f"(tenant eq {odata_literal(current_tenant())})"
+            if category:
+                filter_expr += f" and (category eq {odata_literal(category)})"
 
             results = await self.search_client.search(
-                search_text=None,
-                vector_queries=[vector_query],
+                search_text=search_text,
+                vector_queries=vector_queries,
                 top=top_k,
                 query_type="semantic",
                 filter=filter_expr,
@@ -209,13 +338,18 @@ class AzureSearchMemoryHandler(VectorDBProvider):
 
             docs = []
             async for r in results:
-                docs.append({
-                        'id':r["id"],
-                        'memory':r["memory"],
-                        'category':r['category'],
-                        'time':r['time']
-                    }
-                )
+                doc = {
+                    'id':r["id"],
+                    'memory':r["memory"],
+                    'category':r['category'],
+                    'time':r['time'],
+                }
+                if search_text:
+                    doc['rrf_score'] = r["@search.score"]
+                else:
+                    # Cosine indexes score 1 / (1 + cosine distance).
+                    doc['score'] = 2 - 1 / r["@search.score"]
+                docs.append(doc)
             logger.info("Vector search returned {} results", len(docs))
 
             return docs
@@ -223,14 +357,36 @@ class AzureSearchMemoryHandler(VectorDBProvider):
             logger.exception("Vector search failed on '{}'", self.index_name)
             return []
 
+    @traced("azure_search.owned_ids", "memory_store_seconds", backend="azure", operation="owned_ids")
+    async def _owned_ids(self, ids: List[str], tenant: str) -> List[str]:
+        """The subset of `ids` written by `tenant`; deletes never reach other tenants' documents."""
+        if not ids:
+            return []
+        results = await self.search_client.search(
+            search_text="*",
+            filter=f"(tenant eq {odata_literal(tenant)}) and search.in(id, {odata_literal(','.join(ids))}, ',')",
+            select=["id"],
+            top=len(ids),
+        )
+        return [r["id"] async for r in results]
+
+    @traced("azure_search.delete_document", "memory_store_seconds", backend="azure", operation="delete_document")
     async def delete_document(self, doc_ids: List[str]) -> bool:
         assert self.search_client
         try:
-            res = await self.search_client.delete_documents(documents=doc_ids)
-            succeeded = all(r.succeeded for r in res)
+            tenant = current_tenant()
+            owned = await self._owned_ids(
+                [doc_id["id"] if isinstance(doc_id, dict) else doc_id for doc_id in doc_ids], tenant
+            )
+            succeeded = True
+            if owned:
+                res = await self.search_client.delete_documents(documents=[{"id": doc_id} for doc_id in owned])
+                succeeded = all(r.succeeded for r in res)
+            # Deletes only carry ids, so every category of the tenant may have changed.
+            invalidate_retrieval_caches(tenant=tenant)
             logger.info(
                 "Deleted document '{}' from '{}', success={}",
-                doc_ids,
+                owned,
                 self.index_name,
                 succeeded,
             )
@@ -255,9 +411,7 @@ if __name__ == "__main__":
         except Exception:
             logger.error("Initialization failed, exiting.")
             return
-        handler = AzureSearchMemoryHandler()
-
-        await handler.create_index()
+        handler = await AzureSearchMemoryHandler.create()
 
         memory = "My name is prakhar"
         embedding = await openai_handler.embed_inputs(inputs=[memory])
@@ -277,5 +431,6 @@ if __name__ == "__main__":
             print(res)
 
         await handler.delete_document(doc_ids=[{"id":"1"}])
+        await AzureSearchMemoryHandler.shutdown()
 
     asyncio.run(main())
@@ -0,0 +1,171 @@
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word and number tokens."""
+    return _TOKEN.findall(text.lower())
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    """Returns `array` with room for at least `size` entries, doubling its capacity."""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+class _Postings:
+    """Posting list of one term: ascending document numbers with their term frequencies."""
+
+    __slots__ = ("docs", "tfs", "size", "df")
+
+    def __init__(self):
+        self.docs = np.zeros(4, dtype=np.int32)
+        self.tfs = np.zeros(4, dtype=np.float32)
+        self.size = 0
+        self.df = 0
+
+    def append(self, docno: int, tf: int) -> None:
+        # Document numbers only ever grow, so appending keeps the list sorted.
+        self.docs = _grow(self.docs, self.size + 1)
+        self.tfs = _grow(self.tfs, self.size + 1)
+        self.docs[self.size] = docno
+        self.tfs[self.size] = tf
+        self.size += 1
+        self.df += 1
+
+
+class BM25Index:
+    """
+    Incremental inverted index over memory texts scored with Okapi BM25.
+    Every term maps to a posting list of sorted int32 document numbers and float32
+    term frequencies, so a query reads only the postings of its own terms. Deleted
+    documents are masked out and dropped from the postings once they make up
+    `compaction_ratio` of the index.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, compaction_ratio: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.compaction_ratio = compaction_ratio
+        self._postings: Dict[str, _Postings] = {}
+        self._docnos: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._terms: List[Tuple[str, ...]] = []
+        self._lengths = np.zeros(16, dtype=np.float32)
+        self._alive = np.zeros(16, dtype=bool)
+        self._category_codes: Dict[str, int] = {}
+        self._categories = np.zeros(16, dtype=np.int32)
+        self._total_length = 0.0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._docnos)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docnos
+
+    def add(self, doc_id: str, text: str, category: str = "") -> None:
+        """Indexes a document, replacing any previous version with the same id."""
+        self.remove(doc_id)
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        docno = len(self._ids)
+        self._lengths = _grow(self._lengths, docno + 1)
+        self._alive = _grow(self._alive, docno + 1)
+        self._categories = _grow(self._categories, docno + 1)
+        self._lengths[docno] = len(tokens)
+        self._alive[docno] = True
+        self._categories[docno] = self._category_codes.setdefault(category, len(self._category_codes))
+        self._ids.append(doc_id)
+        self._terms.append(tuple(counts))
+        self._docnos[doc_id] = docno
+        self._total_length += len(tokens)
+        for term, tf in counts.items():
+            self._postings.setdefault(term, _Postings()).append(docno, tf)
+
+    def add_many(self, docs: Iterable[Tuple[str, str, str]]) -> None:
+        """Indexes (id, text, category) triples."""
+        for doc_id, text, category in docs:
+            self.add(doc_id, text, category)
+
+    def remove(self, doc_id: str) -> bool:
+        docno = self._docnos.pop(doc_id, None)
+        if docno is None:
+            return False
+        self._alive[docno] = False
+        self._ids[docno] = None
+        self._total_length -= self._lengths[docno]
+        for term in self._terms[docno]:
+            self._postings[term].df -= 1
+        self._terms[docno] = ()
+        self._dead += 1
+        if self._dead >= self.compaction_ratio * len(self._ids):
+            self._compact()
+        return True
+
+    def _compact(self) -> None:
+        """Renumbers the live documents and drops deleted ones from every posting list."""
+        keep = np.flatnonzero(self._alive[: len(self._ids)])
+        renumber = np.full(len(self._ids), -1, dtype=np.int32)
+        renumber[keep] = np.arange(len(keep), dtype=np.int32)
+
+        for term in list(self._postings):
+            postings = self._postings[term]
+            docs = postings.docs[: postings.size]
+            mask = renumber[docs] >= 0
+            if not mask.any():
+                del self._postings[term]
+                continue
+            postings.docs = renumber[docs[mask]]
+            postings.tfs = postings.tfs[: postings.size][mask]
+            postings.size = len(postings.docs)
+
+        self._lengths = self._lengths[keep].copy()
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._categories = self._categories[keep].copy()
+        self._ids = [self._ids[i] for i in keep]
+        self._terms = [self._terms[i] for i in keep]
+        self._docnos = {doc_id: docno for docno, doc_id in enumerate(self._ids)}
+        self._dead = 0
+
+    def search(self, query: str, top_k: int = 5, category: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Returns up to `top_k` (id, BM25 score) pairs, optionally within one category."""
+        live = len(self._docnos)
+        postings = [self._postings[term] for term in set(tokenize(query)) if term in self._postings]
+        if not live or not postings:
+            return []
+        if category is not None and category not in self._category_codes:
+            return []
+
+        avgdl = max(self._total_length / live, 1e-9)
+        docs_parts, score_parts = [], []
+        for p in postings:
+            docs = p.docs[: p.size]
+            tfs = p.tfs[: p.size]
+            idf = math.log(1.0 + (live - p.df + 0.5) / (p.df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self._lengths[docs] / avgdl)
+            docs_parts.append(docs)
+            score_parts.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        candidates, inverse = np.unique(np.concatenate(docs_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        mask = self._alive[candidates]
+        if category is not None:
+            mask &= self._categories[candidates] == self._category_codes[category]
+        candidates, scores = candidates[mask], scores[mask]
+
+        if len(candidates) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            candidates, scores = candidates[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(self._ids[candidates[i]], float(scores[i])) for i in order]
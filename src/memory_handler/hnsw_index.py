@@ -0,0 +1,257 @@
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+
+class HNSWIndex:
+    """
+    Pure Python/NumPy Hierarchical Navigable Small World graph over cosine similarity.
+    Mirrors the `m`, `ef_construction` and `ef_search` knobs of the Azure AI Search index.
+    Nodes are addressed by string labels (document ids); deletes are lazy, deleted
+    nodes keep routing searches but are never returned.
+    """
+
+    def __init__(
+        self,
+        dims: int,
+        m: int = 4,
+        ef_construction: int = 400,
+        ef_search: int = 500,
+        capacity: int = 1024,
+        seed: int = 42,
+    ):
+        self.dims = dims
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1 / np.log(max(m, 2))
+        self._rng = np.random.default_rng(seed)
+        self._vectors = np.zeros((max(capacity, 1), dims), dtype=np.float32)
+        self._deleted = np.zeros(max(capacity, 1), dtype=bool)
+        self._levels: List[int] = []
+        self._links: List[List[List[int]]] = []
+        self._labels: List[str] = []
+        self._nodes: Dict[str, int] = {}
+        self._entry = -1
+        self._max_level = -1
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def deleted_count(self) -> int:
+        return len(self._labels) - len(self._nodes)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self._nodes
+
+    def labels(self) -> List[str]:
+        """Labels of the nodes that are not deleted."""
+        return list(self._nodes)
+
+    def vectors(self, labels: List[str]) -> np.ndarray:
+        """Stored vectors of the given (not deleted) labels."""
+        return self._vectors[[self._nodes[label] for label in labels]]
+
+    def _reserve(self, rows: int) -> None:
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dims), dtype=np.float32)
+        vectors[: len(self._labels)] = self._vectors[: len(self._labels)]
+        deleted = np.zeros(capacity, dtype=bool)
+        deleted[: len(self._labels)] = self._deleted[: len(self._labels)]
+        self._vectors, self._deleted = vectors, deleted
+
+    def _distances(self, query: np.ndarray, nodes: List[int]) -> List[float]:
+        return (1.0 - self._vectors[nodes] @ query).tolist()
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[Tuple[float, int]],
+        ef: int,
+        level: int,
+        accept: Optional[Callable[[int], bool]] = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        Best-first search of one layer. Every node routes the search, only nodes
+        passing `accept` enter the result set. Returns (distance, node) ascending.
+        """
+        visited = {node for _, node in entry_points}
+        candidates = list(entry_points)
+        heapq.heapify(candidates)
+        results = [(-dist, node) for dist, node in entry_points if accept is None or accept(node)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if len(results) >= ef and dist > -results[0][0]:
+                break
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for n_dist, n in zip(self._distances(query, neighbours), neighbours):
+                if len(results) < ef or n_dist < -results[0][0]:
+                    heapq.heappush(candidates, (n_dist, n))
+                    if accept is None or accept(n):
+                        heapq.heappush(results, (-n_dist, n))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+
+        return sorted((-dist, node) for dist, node in results)
+
+    def _select_neighbours(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Neighbour selection heuristic: keeps a candidate only if it is closer to the
+        base node than to every neighbour already kept, then tops up with the closest
+        pruned candidates. Keeps the graph navigable at small `m`.
+        """
+        selected: List[int] = []
+        pruned: List[int] = []
+        for dist, node in candidates:
+            if len(selected) >= m:
+                break
+            if selected:
+                to_selected = 1.0 - self._vectors[selected] @ self._vectors[node]
+                if dist >= to_selected.min():
+                    pruned.append(node)
+                    continue
+            selected.append(node)
+        return selected + pruned[: m - len(selected)]
+
+    def add(self, label: str, vector: List[float]) -> None:
+        """Inserts one normalised vector; an existing label is replaced."""
+        if label in self._nodes:
+            self.mark_deleted(label)
+
+        node = len(self._labels)
+        self._reserve(node + 1)
+        query = np.asarray(vector, dtype=np.float32)
+        self._vectors[node] = query
+        level = int(-np.log(1.0 - self._rng.random()) * self._level_mult)
+        self._levels.append(level)
+        self._links.append([[] for _ in range(level + 1)])
+        self._labels.append(label)
+        self._nodes[label] = node
+
+        if self._entry == -1:
+            self._entry, self._max_level = node, level
+            return
+
+        entry_points = [(self._distances(query, [self._entry])[0], self._entry)]
+        for lc in range(self._max_level, level, -1):
+            entry_points = self._search_layer(query, entry_points, 1, lc)[:1]
+
+        for lc in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(query, entry_points, self.ef_construction, lc)
+            max_links = self.m0 if lc == 0 else self.m
+            neighbours = self._select_neighbours(found, self.m)
+            self._links[node][lc] = neighbours
+            for n in neighbours:
+                links = self._links[n][lc]
+                links.append(node)
+                if len(links) > max_links:
+                    dists = self._distances(self._vectors[n], links)
+                    self._links[n][lc] = self._select_neighbours(sorted(zip(dists, links)), max_links)
+            entry_points = found
+
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+
+    def add_items(self, vectors: np.ndarray, labels: List[str]) -> None:
+        """Incrementally inserts a batch of normalised vectors."""
+        for label, vector in zip(labels, vectors):
+            self.add(label, vector)
+
+    def mark_deleted(self, label: str) -> bool:
+        """Lazily deletes a label; returns False if it is unknown."""
+        node = self._nodes.pop(label, None)
+        if node is None:
+            return False
+        self._deleted[node] = True
+        return True
+
+    def search(
+        self,
+        query: List[float],
+        k: int = 5,
+        ef: Optional[int] = None,
+        filter_fn: Optional[Callable[[str], bool]] = None,
+    ) -> Tuple[List[str], List[float]]:
+        """
+        Returns the labels and cosine similarities of the approximate k nearest
+        neighbours of a normalised query, optionally restricted to labels accepted
+        by `filter_fn`.
+        """
+        if not self._nodes:
+            return [], []
+
+        query = np.asarray(query, dtype=np.float32)
+        entry_points = [(self._distances(query, [self._entry])[0], self._entry)]
+        for lc in range(self._max_level, 0, -1):
+            entry_points = self._search_layer(query, entry_points, 1, lc)[:1]
+
+        deleted = self._deleted
+        if filter_fn is None:
+            accept = lambda node: not deleted[node]
+        else:
+            accept = lambda node: not deleted[node] and filter_fn(self._labels[node])
+
+        found = self._search_layer(query, entry_points, max(ef or self.ef_search, k), 0, accept)[:k]
+        return [self._labels[node] for _, node in found], [1.0 - dist for dist, _ in found]
+
+    def save(self, path: str) -> None:
+        """Writes the graph, its vectors and the lazy-delete flags to an .npz file."""
+        count = len(self._labels)
+        link_counts = [len(links) for node_links in self._links for links in node_links]
+        flat_links = [n for node_links in self._links for links in node_links for n in links]
+        np.savez(
+            path,
+            params=np.array(
+                [self.dims, self.m, self.ef_construction, self.ef_search, self._entry, self._max_level],
+                dtype=np.int64,
+            ),
+            vectors=self._vectors[:count],
+            deleted=self._deleted[:count],
+            levels=np.array(self._levels, dtype=np.int32),
+            link_counts=np.array(link_counts, dtype=np.int32),
+            links=np.array(flat_links, dtype=np.int32),
+            labels=np.array(self._labels, dtype=str),
+        )
+        logger.info("Saved HNSW index with {} nodes to {}", count, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        """Restores a graph written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            dims, m, ef_construction, ef_search, entry, max_level = data["params"].tolist()
+            self = cls(dims, m=m, ef_construction=ef_construction, ef_search=ef_search, capacity=len(data["levels"]))
+            count = len(data["levels"])
+            self._vectors[:count] = data["vectors"]
+            self._deleted[:count] = data["deleted"]
+            self._levels = data["levels"].tolist()
+            self._labels = data["labels"].tolist()
+            link_counts = data["link_counts"].tolist()
+            flat_links = data["links"].tolist()
+
+        cursor = offset = 0
+        for level in self._levels:
+            node_links = []
+            for _ in range(level + 1):
+                node_links.append(flat_links[offset : offset + link_counts[cursor]])
+                offset += link_counts[cursor]
+                cursor += 1
+            self._links.append(node_links)
+
+        self._nodes = {label: node for node, label in enumerate(self._labels) if not self._deleted[node]}
+        self._entry, self._max_level = entry, max_level
+        logger.info("Loaded HNSW index with {} nodes from {}", count, path)
+        return self
@@ -0,0 +1,809 @@
+import os
+import asyncio
+import threading
+from contextlib import nullcontext
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+import numpy as np
+from loguru import logger
+from providers.vector_db_provider import VectorDBProvider, MemoryDocument
+from memory_handler.memory_config import HybridConfig, LocalMemoryConfig, load_memory_config
+from memory_handler.bm25_index import BM25Index
+from memory_handler.rank_fusion import reciprocal_rank_fusion
+from memory_handler.quantization import ProductQuantizer, QuantizedBlock, ScalarQuantizer, pq_subspaces, recall_at_k
+from memory_handler.hnsw_index import HNSWIndex
+from memory_handler.segment_store import SegmentStore
+from memory_handler.retrieval_cache import invalidate_retrieval_caches
+from memory_handler.tenancy import shard_name
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Partition key used for documents stored without a category.
+UNCATEGORISED = ""
+
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    """Returns row-wise L2-normalised float32 vectors so cosine similarity becomes a dot product."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the column indices of the k highest scores of every row, best first.
+    Uses argpartition so only the selected k columns get sorted.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k == scores.shape[1]:
+        return np.argsort(-scores, axis=1, kind="stable")
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+
+class _Partition:
+    """
+    Contiguous float32 slab holding the normalised embeddings of one category.
+    Deleted rows are tombstoned and physically removed on compaction.
+    """
+
+    def __init__(self, category: str, dims: int, capacity: int):
+        self.category = category
+        self.matrix = np.zeros((capacity, dims), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.ids: List[str] = []
+        self.memories: List[str] = []
+        self.times: List[datetime] = []
+        self.tombstones = 0
+        self.codes = None
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def live(self) -> int:
+        return self.size - self.tombstones
+
+    def _reserve(self, rows: int) -> None:
+        capacity = self.matrix.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[: self.size] = self.matrix[: self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self.size] = self.alive[: self.size]
+        self.matrix, self.alive = matrix, alive
+
+    def append(self, vectors: np.ndarray, ids: List[str], memories: List[str], times: List[datetime]) -> range:
+        start = self.size
+        self._reserve(start + len(ids))
+        self.matrix[start : start + len(ids)] = vectors
+        self.alive[start : start + len(ids)] = True
+        self.ids.extend(ids)
+        self.memories.extend(memories)
+        self.times.extend(times)
+        return range(start, self.size)
+
+    def tombstone(self, row: int) -> None:
+        if self.alive[row]:
+            self.alive[row] = False
+            self.tombstones += 1
+
+    def needs_compaction(self, ratio: float) -> bool:
+        return self.tombstones > 0 and self.tombstones >= ratio * self.size
+
+    def compact(self) -> Dict[str, int]:
+        """Drops tombstoned rows in place and returns the new row of every surviving id."""
+        keep = np.flatnonzero(self.alive[: self.size])
+        n = len(keep)
+        self.matrix[:n] = self.matrix[keep]
+        self.alive[:n] = True
+        self.alive[n:] = False
+        self.ids = [self.ids[i] for i in keep]
+        self.memories = [self.memories[i] for i in keep]
+        self.times = [self.times[i] for i in keep]
+        self.tombstones = 0
+        self.codes = None
+        return {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every query against every row; tombstones score -inf."""
+        scores = queries @ self.matrix[: self.size].T
+        scores[:, ~self.alive[: self.size]] = -np.inf
+        return scores
+
+    def document(self, row: int) -> dict:
+        return {
+            'id': self.ids[row],
+            'memory': self.memories[row],
+            'category': self.category or None,
+            'time': self.times[row].isoformat(),
+        }
+
+
+class LocalMemoryHandler(VectorDBProvider):
+    """
+    In-process memory handler keeping embeddings in per-category float32 matrices,
+    pre-normalised for cosine similarity. One store is shared per index name.
+    With `index: hnsw` every category of at least `hnsw.min_rows` documents also
+    gets an HNSW graph, built and updated in a thread, which serves non-exhaustive
+    searches once it holds every write; until then the category is scanned flat.
+    With `storage: segments` the embeddings are kept in memory-mapped segment files
+    instead, so startup does not load them into RAM, and graphs are saved next to them.
+    With hybrid retrieval enabled a BM25 index over the memory texts is kept as well
+    and searches given a `search_text` fuse both rankings; over segments it is built in
+    a thread on the first such search rather than at startup. With quantisation enabled
+    flat scans read int8 or PQ codes and re-rank the best candidates in float32; it
+    needs segment storage, so that only the codes are held in RAM. A handler created for a `tenant`
+    holds that tenant's shard only (see TenantShardedMemoryHandler).
+    """
+
+    _instances: Dict[str, "LocalMemoryHandler"] = {}
+
+    def __init__(
+        self,
+        index_name: str,
+        config: LocalMemoryConfig,
+        hybrid: Optional[HybridConfig] = None,
+        tenant: Optional[str] = None,
+    ):
+        self.index_name = index_name
+        self.config = config
+        self.tenant = tenant
+        self.hybrid = hybrid or load_memory_config().hybrid
+        # None until built; over segments the stored texts are indexed on first use.
+        self._lexical: Optional[BM25Index] = (
+            BM25Index(k1=self.hybrid.k1, b=self.hybrid.b)
+            if self.hybrid.enabled and config.storage != "segments"
+            else None
+        )
+        self._lexical_task: Optional[asyncio.Task] = None
+        # Writes made while the index is being built, replayed onto it (None when not building).
+        self._lexical_backlog: Optional[List[Tuple[str, Optional[str], str]]] = None
+        self.dims: Optional[int] = None
+        self._partitions: Dict[str, _Partition] = {}
+        self._locations: Dict[str, Tuple[str, int]] = {}
+        self._graphs: Dict[str, HNSWIndex] = {}
+        self._graph_locks: Dict[str, threading.Lock] = {}
+        self._graph_tasks: Dict[str, asyncio.Task] = {}
+        # Writes per category, and the write each graph is up to date with.
+        self._versions: Dict[str, int] = {}
+        self._graph_versions: Dict[str, int] = {}
+        # Ids written since their category's graph was last synced (upserts change vectors).
+        self._rewritten: Dict[str, Set[str]] = {}
+        self._unsaved: Set[str] = set()
+        self._store: Optional[SegmentStore] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._quantizer = None
+        self._training: Optional[asyncio.Task] = None
+        if config.storage == "segments":
+            directory = os.path.join(config.data_dir, index_name)
+            if tenant is not None:
+                directory = os.path.join(directory, "tenants", shard_name(tenant))
+            self._store = SegmentStore(directory, config.segment_rows)
+            self.dims = self._store.dims
+
+    @classmethod
+    async def create(cls, config: Optional[LocalMemoryConfig] = None, dims: int = 1536):
+        index_name = os.getenv("INDEX_NAME") or "memory"
+        self = cls._instances.get(index_name)
+        if self is None:
+            self = cls(index_name, config or load_memory_config().local)
+            success = await self.create_index(dims=dims)
+            if not success:
+                raise RuntimeError("Index setup failed")
+            self.start_compaction()
+            cls._instances[index_name] = self
+        return self
+
+    def start_compaction(self) -> None:
+        """Starts merging segments in the background; a no-op for in-memory storage."""
+        if self._store is not None and self._compaction_task is None:
+            self._compaction_task = asyncio.create_task(self._compaction_loop())
+
+    async def _compaction_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.compaction_interval)
+            try:
+                await asyncio.to_thread(self._store.compact, self.config.compaction_ratio)
+            except Exception:
+                logger.exception("Segment compaction failed for '{}'", self.index_name)
+
+    async def close(self) -> None:
+        """Stops background work, saves the HNSW graphs and closes the segment store."""
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            self._compaction_task = None
+        for task in self._graph_tasks.values():
+            task.cancel()
+        self._graph_tasks.clear()
+        if self._lexical_task is not None and not self._lexical_task.done():
+            self._lexical_task.cancel()
+        if self._store is not None:
+            for category in list(self._unsaved):
+                await asyncio.to_thread(self._save_graph, category)
+            await asyncio.to_thread(self._store.close)
+        if type(self)._instances.get(self.index_name) is self:
+            del type(self)._instances[self.index_name]
+
+    async def index_exists(self) -> bool:
+        exists = self.dims is not None
+        logger.info("Index '{}' exists? {}", self.index_name, exists)
+        return exists
+
+    async def create_index(self, dims: int = 1536) -> bool:
+        if self.dims is not None and self.dims != dims:
+            logger.error(
+                "Index '{}' already holds {}-dim embeddings, cannot switch to {}",
+                self.index_name,
+                self.dims,
+                dims,
+            )
+            return False
+        self.dims = dims
+        if self._store is not None and self._store.dims is None:
+            self._store.set_dims(dims)
+        quantization = self.config.quantization
+        if quantization.mode == "int8":
+            self._quantizer = ScalarQuantizer()
+        elif quantization.mode == "pq" and self._quantizer is None:
+            subspaces = pq_subspaces(dims, quantization.pq_subspaces)
+            if subspaces != quantization.pq_subspaces:
+                logger.error(
+                    "quantization.pq_subspaces {} does not divide the {} embedding dims of '{}'; using {} subspaces",
+                    quantization.pq_subspaces,
+                    dims,
+                    self.index_name,
+                    subspaces,
+                )
+            self._quantizer = ProductQuantizer(dims, subspaces, quantization.pq_iterations)
+        logger.info("Local index '{}' ready ({} dims)", self.index_name, dims)
+        return True
+
+    def _partition(self, category: str) -> _Partition:
+        partition = self._partitions.get(category)
+        if partition is None:
+            partition = _Partition(category, self.dims, self.config.initial_capacity)
+            self._partitions[category] = partition
+        return partition
+
+    def _categories(self) -> List[str]:
+        if self._store is not None:
+            return list({segment.category for segment in self._store.segments()})
+        return list(self._partitions)
+
+    def _live_count(self, category: str) -> int:
+        if self._store is not None:
+            return sum(segment.live for segment in self._store.segments(category))
+        partition = self._partitions.get(category)
+        return partition.live if partition is not None else 0
+
+    def _changed(self, categories: Iterable[str], written: Iterable[MemoryDocument] = ()) -> None:
+        """Records writes; the graphs of `categories` serve searches again once they are synced."""
+        for category in set(categories):
+            self._versions[category] = self._versions.get(category, 0) + 1
+        for doc in written:
+            category = doc.category or UNCATEGORISED
+            if category in self._graphs or category in self._graph_tasks:
+                self._rewritten.setdefault(category, set()).add(doc.id)
+
+    def _acquire_graph(self, category: str) -> Optional[HNSWIndex]:
+        """
+        The graph of `category`, locked for a search, when the category is large enough
+        to have one and the graph holds every write. Otherwise returns None, so the
+        category is scanned flat, and brings the graph up to date in the background.
+        """
+        if self._live_count(category) < self.config.hnsw.min_rows:
+            return None
+        graph = self._graphs.get(category)
+        if graph is None or self._graph_versions.get(category) != self._versions.get(category, 0):
+            task = self._graph_tasks.get(category)
+            if task is None or task.done():
+                self._graph_tasks[category] = asyncio.create_task(self._sync_graph(category))
+            return None
+        return graph if self._graph_locks[category].acquire(blocking=False) else None
+
+    async def build_graphs(self) -> None:
+        """Brings the graph of every category with at least `hnsw.min_rows` documents up to date."""
+        if not self._use_graphs:
+            return
+        for category in self._categories():
+            if self._acquire_graph(category) is not None:
+                self._graph_locks[category].release()
+        await asyncio.gather(*self._graph_tasks.values())
+
+    async def _sync_graph(self, category: str) -> None:
+        """Loads, builds or updates the graph of `category` in a thread until it holds every write."""
+        lock = self._graph_locks.setdefault(category, threading.Lock())
+        try:
+            while self._graph_versions.get(category) != self._versions.get(category, 0):
+                version = self._versions.get(category, 0)
+                rewritten = self._rewritten.pop(category, set())
+                graph = self._graphs.get(category)
+                if graph is None and self._store is not None:
+                    graph, changed = await asyncio.to_thread(self._load_graph, category)
+                    rewritten |= changed
+                if graph is not None and graph.deleted_count > self.config.compaction_ratio * max(len(graph), 1):
+                    # Lazily deleted nodes are only dropped by building the graph afresh.
+                    graph = None
+                stale, ids, vectors = await self._graph_delta(category, graph, rewritten)
+                if graph is None:
+                    graph = await asyncio.to_thread(self._build_graph, ids, vectors)
+                    self._unsaved.add(category)
+                    if self._store is not None:
+                        self._graphs[category] = graph
+                        await asyncio.to_thread(self._save_graph, category)
+                elif stale or ids:
+                    await asyncio.to_thread(self._update_graph, graph, lock, stale, ids, vectors)
+                    self._unsaved.add(category)
+                self._graphs[category] = graph
+                self._graph_versions[category] = version
+        except Exception:
+            logger.exception("Syncing the HNSW graph of '{}' in '{}' failed", category, self.index_name)
+
+    async def _graph_delta(self, category: str, graph: Optional[HNSWIndex], rewritten: Set[str]):
+        """Labels `graph` has to drop, and the ids and vectors it is missing or holds outdated."""
+        if self._store is not None:
+            live = await asyncio.to_thread(self._store.ids, category)
+        else:
+            partition = self._partitions.get(category)
+            live = [partition.ids[row] for row in np.flatnonzero(partition.alive[: partition.size])] if partition else []
+        known = set(graph.labels()) if graph is not None else set()
+        live_ids = set(live)
+        stale = [label for label in known if label not in live_ids]
+        missing = [doc_id for doc_id in live if doc_id not in known or doc_id in rewritten]
+        if self._store is not None:
+            ids, vectors = await asyncio.to_thread(self._store.vectors, missing)
+            return stale, ids, vectors
+        # In-memory partitions are compacted in place, so the rows are copied here, on the loop.
+        rows = [self._locations[doc_id][1] for doc_id in missing]
+        return stale, missing, self._partitions[category].matrix[rows] if rows else np.empty((0, self.dims), np.float32)
+
+    def _build_graph(self, ids: List[str], vectors: np.ndarray) -> HNSWIndex:
+        hnsw = self.config.hnsw
+        graph = HNSWIndex(
+            self.dims,
+            m=hnsw.m,
+            ef_construction=hnsw.ef_construction,
+            ef_search=hnsw.ef_search,
+            capacity=max(len(ids), 1),
+        )
+        graph.add_items(vectors, ids)
+        return graph
+
+    @staticmethod
+    def _update_graph(graph: HNSWIndex, lock: threading.Lock, stale: List[str], ids: List[str], vectors: np.ndarray) -> None:
+        with lock:
+            for label in stale:
+                graph.mark_deleted(label)
+            graph.add_items(vectors, ids)
+
+    def _graph_path(self, category: str) -> str:
+        return os.path.join(self._store.directory, "graphs", f"{shard_name(category)}.npz")
+
+    def _load_graph(self, category: str) -> Tuple[Optional[HNSWIndex], Set[str]]:
+        """
+        The saved graph of `category` and the ids whose vectors changed since it was
+        saved; `_graph_delta` reconciles the rest by id.
+        """
+        path = self._graph_path(category)
+        if not os.path.exists(path):
+            return None, set()
+        try:
+            graph = HNSWIndex.load(path)
+        except Exception:
+            logger.exception("Ignoring unreadable HNSW graph {}", path)
+            return None, set()
+        if graph.dims != self.dims:
+            return None, set()
+        ids, vectors = self._store.vectors(graph.labels())
+        changed = np.any(graph.vectors(ids) != vectors, axis=1) if ids else []
+        return graph, {doc_id for doc_id, differs in zip(ids, changed) if differs}
+
+    def _save_graph(self, category: str) -> None:
+        path = self._graph_path(category)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path[: -len(".npz")] + ".tmp.npz"
+        with self._graph_locks[category]:
+            self._graphs[category].save(tmp_path)
+        os.replace(tmp_path, path)
+        self._unsaved.discard(category)
+
+    def _tombstone(self, doc_id: str) -> Optional[str]:
+        location = self._locations.pop(doc_id, None)
+        if location is None:
+            return None
+        category, row = location
+        self._partitions[category].tombstone(row)
+        return category
+
+    def _maybe_compact(self, categories, ratio: Optional[float] = None) -> None:
+        ratio = self.config.compaction_ratio if ratio is None else ratio
+        for category in set(categories):
+            partition = self._partitions.get(category)
+            if partition is None or not partition.needs_compaction(ratio):
+                continue
+            dropped = partition.tombstones
+            for doc_id, row in partition.compact().items():
+                self._locations[doc_id] = (category, row)
+            logger.info(
+                "Compacted partition '{}' of '{}', dropped {} rows",
+                category,
+                self.index_name,
+                dropped,
+            )
+
+    def compact(self) -> None:
+        """Compacts every partition (or segment) holding deleted rows."""
+        if self._store is not None:
+            self._store.compact(ratio=0.0)
+        else:
+            self._maybe_compact(list(self._partitions), ratio=0.0)
+
+    @property
+    def _use_graphs(self) -> bool:
+        return self.config.index == "hnsw"
+
+    def _append(self, docs: List[MemoryDocument]) -> List[str]:
+        grouped: Dict[str, List[MemoryDocument]] = {}
+        for doc in docs:
+            grouped.setdefault(doc.category or UNCATEGORISED, []).append(doc)
+
+        touched = []
+        for category, group in grouped.items():
+            # Upserts replace the previous version of the document.
+            touched.extend(category for category in (self._tombstone(doc.id) for doc in group) if category is not None)
+            partition = self._partition(category)
+            vectors = normalise([doc.embeddings for doc in group])
+            rows = partition.append(
+                vectors,
+                ids=[doc.id for doc in group],
+                memories=[doc.memory for doc in group],
+                times=[doc.time or datetime.now() for doc in group],
+            )
+            for doc, row in zip(group, rows):
+                self._locations[doc.id] = (category, row)
+        self._maybe_compact(touched)
+        return touched
+
+    async def add_documents(self, docs: List[MemoryDocument]) -> bool:
+        try:
+            for doc in docs:
+                if doc.embeddings is None or len(doc.embeddings) != self.dims:
+                    raise ValueError(f"Document '{doc.id}' has no {self.dims}-dim embedding")
+
+            if self._store is not None:
+                replaced = self._store.append(
+                    docs,
+                    normalise([doc.embeddings for doc in docs]),
+                    [doc.category or UNCATEGORISED for doc in docs],
+                )
+            else:
+                replaced = self._append(docs)
+            self._changed([doc.category or UNCATEGORISED for doc in docs] + list(replaced), docs)
+            self._index_lexical([(doc.id, doc.memory, doc.category or UNCATEGORISED) for doc in docs])
+            invalidate_retrieval_caches((doc.category for doc in docs), tenant=self.tenant)
+
+            logger.info("Uploaded {} docs to '{}', success={}", len(docs), self.index_name, True)
+            return True
+        except Exception:
+            logger.exception("Failed to upload documents to '{}'", self.index_name)
+            return False
+
+    def _reading(self):
+        """Holds segment compaction off for a scan; partitions are only changed on the loop."""
+        return self._store.reading() if self._store is not None else nullcontext()
+
+    def _scan_units(self, category: str | None) -> list:
+        """Partitions (or segments) an exhaustive search of `category` has to scan."""
+        if self._store is not None:
+            return self._store.segments(category)
+        if category is not None:
+            return [self._partitions[category]] if category in self._partitions else []
+        return list(self._partitions.values())
+
+    def _train_quantizer(self) -> None:
+        """Fits the PQ codebooks on a sample of the live vectors of every unit."""
+        with self._reading():
+            units = [unit for unit in self._scan_units(None) if unit.live]
+            total = sum(unit.live for unit in units)
+            if total < 256:
+                return
+            share = min(1.0, self.config.quantization.pq_train_size / total)
+            rng = np.random.default_rng(0)
+            sample = []
+            for unit in units:
+                rows = np.flatnonzero(unit.alive[: unit.size])
+                rows = np.sort(rng.choice(rows, max(1, int(len(rows) * share)), replace=False))
+                sample.append(np.asarray(unit.matrix[rows]))
+        self._quantizer.fit(np.concatenate(sample))
+
+    async def _ensure_quantizer(self) -> bool:
+        """Trains the quantiser once enough vectors are stored; False while scans stay exact."""
+        if self._quantizer is None:
+            return False
+        if not self._quantizer.trained:
+            if self._training is None or self._training.done():
+                self._training = asyncio.ensure_future(asyncio.to_thread(self._train_quantizer))
+            await asyncio.shield(self._training)
+        return self._quantizer.trained
+
+    def _codes(self, unit) -> QuantizedBlock:
+        """Codes of every row of `unit`, encoding rows appended since the last scan."""
+        coded = len(unit.codes) if unit.codes is not None else 0
+        if coded < unit.size:
+            block = self._quantizer.encode(unit.matrix[coded : unit.size])
+            unit.codes = block if unit.codes is None else unit.codes.extend(block)
+        return unit.codes
+
+    def _unit_top_k(self, unit, queries: np.ndarray, top_k: int, quantized: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k scores and rows of one partition or segment per query."""
+        if not quantized:
+            scores = unit.scores(queries)
+            rows = top_k_indices(scores, top_k)
+            return np.take_along_axis(scores, rows, axis=1), rows
+
+        approx = self._quantizer.scores(queries, self._codes(unit))
+        approx[:, ~unit.alive[: unit.size]] = -np.inf
+        candidates = top_k_indices(approx, top_k * self.config.quantization.rerank)
+        # The float32 re-rank reads just the candidate rows (pages of a segment file).
+        rows = np.unique(candidates)
+        exact = queries @ np.asarray(unit.matrix[rows]).T
+        exact = np.take_along_axis(exact, np.searchsorted(rows, candidates), axis=1)
+        exact[~np.isfinite(np.take_along_axis(approx, candidates, axis=1))] = -np.inf
+        best = top_k_indices(exact, top_k)
+        return np.take_along_axis(exact, best, axis=1), np.take_along_axis(candidates, best, axis=1)
+
+    def memory_footprint(self) -> dict:
+        """Bytes held by the float32 embeddings and by their quantised codes."""
+        units = self._scan_units(None)
+        return {
+            "vectors": sum(unit.size for unit in units),
+            "float32_bytes": sum(unit.size * self.dims * 4 for unit in units),
+            "code_bytes": sum(unit.codes.nbytes for unit in units if unit.codes is not None),
+        }
+
+    def resident_bytes(self) -> int:
+        """Estimated RAM a fully scanned shard occupies: its embeddings (mapped or not) plus codes."""
+        footprint = self.memory_footprint()
+        return footprint["float32_bytes"] + footprint["code_bytes"]
+
+    async def quantization_recall(self, query_embs: List[List[float]], top_k: int = 10, category: str | None = None) -> float:
+        """recall@k of the quantised scan against the exact float32 scan for the given queries."""
+        approximate = await self.batch_vector_search(query_embs, top_k=top_k, exhaustive=True, category=category)
+        exact = await self.batch_vector_search(
+            query_embs, top_k=top_k, exhaustive=True, category=category, quantized=False
+        )
+        recall = recall_at_k(
+            [[doc['id'] for doc in docs] for docs in approximate],
+            [[doc['id'] for doc in docs] for docs in exact],
+        )
+        logger.info("Quantised scan recall@{} on '{}': {:.3f}", top_k, self.index_name, recall)
+        return recall
+
+    def _documents(self, ids: Iterable[str]) -> Dict[str, dict]:
+        """Documents of the given ids that are still stored, by id."""
+        if self._store is not None:
+            return {doc['id']: doc for doc in self._store.documents(list(ids))}
+        located = ((doc_id, self._locations.get(doc_id)) for doc_id in ids)
+        return {
+            doc_id: self._partitions[location[0]].document(location[1])
+            for doc_id, location in located
+            if location is not None
+        }
+
+    def _graph_search(self, graphs: List[HNSWIndex], queries: np.ndarray, top_k: int) -> List[List[dict]]:
+        hits = []
+        for query in queries:
+            found = []
+            for graph in graphs:
+                labels, scores = graph.search(query, k=top_k)
+                found.extend(zip(labels, scores))
+            hits.append(found)
+        docs = self._documents({doc_id for found in hits for doc_id, _ in found})
+        return [
+            [{**docs[doc_id], 'score': float(score)} for doc_id, score in found if doc_id in docs]
+            for found in hits
+        ]
+
+    async def batch_vector_search(
+        self,
+        query_embs: List[List[float]],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        category: str | None = None,
+        quantized: bool = True,
+    ) -> List[List[dict]]:
+        """
+        Runs several queries as one matrix product per partition and returns top-k per query.
+        Non-exhaustive searches go through the HNSW graphs of the categories that have an
+        up-to-date one; flat scans read quantised codes when quantisation is configured,
+        unless `quantized` is False.
+        """
+        queries = normalise(np.asarray(query_embs, dtype=np.float32).reshape(len(query_embs), -1))
+        quantized = quantized and await self._ensure_quantizer()
+        graphs: Dict[str, HNSWIndex] = {}
+        if self._use_graphs and not exhaustive:
+            for key in [category] if category is not None else self._categories():
+                graph = self._acquire_graph(key)
+                if graph is not None:
+                    graphs[key] = graph
+        try:
+            with self._reading():
+                units = [unit for unit in self._scan_units(category) if unit.category not in graphs]
+                results = self._scan(units, queries, top_k, quantized)
+            if graphs:
+                for docs, graph_docs in zip(results, self._graph_search(list(graphs.values()), queries, top_k)):
+                    docs.extend(graph_docs)
+                    docs.sort(key=lambda doc: -doc['score'])
+                    del docs[top_k:]
+            return results
+        finally:
+            for key in graphs:
+                self._graph_locks[key].release()
+
+    def _scan(self, units: list, queries: np.ndarray, top_k: int, quantized: bool) -> List[List[dict]]:
+        """Exhaustive top-k over the given partitions or segments."""
+        candidate_scores, candidate_parts, candidate_rows = [], [], []
+        for i, unit in enumerate(units):
+            if unit.live == 0:
+                continue
+            scores, rows = self._unit_top_k(unit, queries, top_k, quantized)
+            candidate_scores.append(scores)
+            candidate_parts.append(np.full(rows.shape, i))
+            candidate_rows.append(rows)
+
+        if not candidate_scores:
+            return [[] for _ in range(len(queries))]
+
+        scores = np.concatenate(candidate_scores, axis=1)
+        parts = np.concatenate(candidate_parts, axis=1)
+        rows = np.concatenate(candidate_rows, axis=1)
+        best = top_k_indices(scores, top_k)
+
+        results = []
+        for q, columns in enumerate(best):
+            results.append([
+                {**units[parts[q, c]].document(int(rows[q, c])), 'score': float(scores[q, c])}
+                for c in columns
+                if np.isfinite(scores[q, c])
+            ])
+        return results
+
+    def _index_lexical(self, entries: List[Tuple[str, Optional[str], str]]) -> None:
+        """Applies (id, text, category) writes to the BM25 index; a None text removes the id."""
+        if self._lexical is None:
+            # Not built yet: a build reads the store, one under way replays what it missed.
+            if self._lexical_backlog is not None:
+                self._lexical_backlog.extend(entries)
+            return
+        for doc_id, text, category in entries:
+            if text is None:
+                self._lexical.remove(doc_id)
+            else:
+                self._lexical.add(doc_id, text, category)
+
+    async def _load_lexical(self) -> None:
+        """Builds the BM25 index over the stored texts once, off the event loop."""
+        if not self.hybrid.enabled or self._lexical is not None:
+            return
+        if self._lexical_task is None or self._lexical_task.cancelled():
+            self._lexical_task = asyncio.ensure_future(self._build_lexical())
+        await asyncio.shield(self._lexical_task)
+
+    async def _build_lexical(self) -> None:
+        self._lexical_backlog = []
+        try:
+            index = await asyncio.to_thread(self._read_lexical)
+            for doc_id, text, category in self._lexical_backlog:
+                if text is None:
+                    index.remove(doc_id)
+                else:
+                    index.add(doc_id, text, category)
+            self._lexical = index
+        finally:
+            self._lexical_backlog = None
+        logger.info("Indexed {} memory texts of '{}' for BM25", len(index), self.index_name)
+
+    def _read_lexical(self) -> BM25Index:
+        index = BM25Index(k1=self.hybrid.k1, b=self.hybrid.b)
+        index.add_many(
+            (doc['id'], doc['memory'], doc['category'] or UNCATEGORISED) for doc in self._store.documents()
+        )
+        return index
+
+    def _lexical_search(self, search_text: str, top_k: int, category: str | None) -> List[dict]:
+        hits = self._lexical.search(search_text, top_k, category)
+        docs = self._documents(doc_id for doc_id, _ in hits)
+        return [{**docs[doc_id], 'bm25_score': score} for doc_id, score in hits if doc_id in docs]
+
+    def _fuse(self, vector_hits: List[dict], search_text: str | None, top_k: int, category: str | None) -> List[dict]:
+        """Fuses vector hits with the BM25 ranking of `search_text` when hybrid retrieval is on."""
+        if not self.hybrid.enabled or not search_text or self.hybrid.lexical_weight <= 0:
+            return vector_hits[:top_k]
+        lexical_hits = self._lexical_search(search_text, self.hybrid.candidates, category)
+        return reciprocal_rank_fusion(
+            [vector_hits, lexical_hits],
+            top_k=top_k,
+            weights=[self.hybrid.vector_weight, self.hybrid.lexical_weight],
+        )
+
+    def _candidates(self, top_k: int, search_texts) -> int:
+        if not self.hybrid.enabled or not search_texts:
+            return top_k
+        return max(top_k, self.hybrid.candidates)
+
+    async def multi_vector_search(
+        self,
+        query_embs: List[List[float]],
+        categories: List[Optional[str]],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        search_texts: Optional[List[Optional[str]]] = None,
+    ) -> List[List[dict]]:
+        """Queries sharing a category are answered by one batched search."""
+        grouped: Dict[Optional[str], List[int]] = {}
+        for i, category in enumerate(categories):
+            grouped.setdefault(category or None, []).append(i)
+
+        candidates = self._candidates(top_k, search_texts)
+        if search_texts and any(search_texts):
+            await self._load_lexical()
+        results: List[List[dict]] = [[] for _ in query_embs]
+        for category, indices in grouped.items():
+            hits = await self.batch_vector_search(
+                [query_embs[i] for i in indices], top_k=candidates, exhaustive=exhaustive, category=category
+            )
+            for i, docs in zip(indices, hits):
+                results[i] = self._fuse(docs, search_texts[i] if search_texts else None, top_k, category)
+        return results
+
+    async def vector_search(
+        self,
+        query_emb: List[float],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        category: str | None = None,
+        search_text: str | None = None,
+    ) -> List[MemoryDocument]:
+        try:
+            docs = (
+                await self.batch_vector_search(
+                    [query_emb], top_k=self._candidates(top_k, search_text), exhaustive=exhaustive, category=category
+                )
+            )[0]
+            if search_text:
+                await self._load_lexical()
+            docs = self._fuse(docs, search_text, top_k, category)
+            logger.info("Vector search returned {} results", len(docs))
+            return docs
+        except Exception:
+            logger.exception("Vector search failed on '{}'", self.index_name)
+            return []
+
+    async def delete_document(self, doc_ids: List[str]) -> bool:
+        try:
+            ids = [doc_id["id"] if isinstance(doc_id, dict) else doc_id for doc_id in doc_ids]
+            if self._store is not None:
+                touched = list(self._store.delete(ids))
+            else:
+                touched = [category for category in map(self._tombstone, ids) if category is not None]
+                self._maybe_compact(touched)
+            self._changed(touched)
+            self._index_lexical([(doc_id, None, UNCATEGORISED) for doc_id in ids])
+            invalidate_retrieval_caches(touched, tenant=self.tenant)
+            logger.info("Deleted document '{}' from '{}', success={}", ids, self.index_name, True)
+            return True
+        except Exception:
+            logger.exception(
+                "Deletion failed for doc '{}' in '{}'", doc_ids, self.index_name
+            )
+            return False
@@ -0,0 +1,100 @@
+from functools import lru_cache
+from typing import Literal
+from pydantic import BaseModel, model_validator
+from utilities.llm_config_handler import load_llm_config
+
+
+class HnswConfig(BaseModel):
+    """
+    HNSW graph parameters, defaulting to the ones of the Azure AI Search index. Only
+    categories holding `min_rows` documents get a graph; smaller ones are scanned flat.
+    """
+    m: int = 4
+    ef_construction: int = 400
+    ef_search: int = 500
+    min_rows: int = 50000
+
+
+class QuantizationConfig(BaseModel):
+    """
+    Compressed embedding codes scanned before a float32 re-rank of the best candidates.
+    Needs segment storage: in memory the codes would sit on top of the float32 rows.
+    """
+    mode: Literal["none", "int8", "pq"] = "none"
+    rerank: int = 4
+    pq_subspaces: int = 96
+    pq_train_size: int = 20000
+    pq_iterations: int = 15
+
+
+class LocalMemoryConfig(BaseModel):
+    """Settings for the in-process memory store."""
+    initial_capacity: int = 1024
+    compaction_ratio: float = 0.25
+    index: Literal["flat", "hnsw"] = "flat"
+    hnsw: HnswConfig = HnswConfig()
+    storage: Literal["memory", "segments"] = "memory"
+    data_dir: str = ".memory_store"
+    segment_rows: int = 65536
+    compaction_interval: float = 300.0
+    quantization: QuantizationConfig = QuantizationConfig()
+    shard_budget_mb: float = 1024.0
+
+    @model_validator(mode="after")
+    def _quantization_needs_segments(self) -> "LocalMemoryConfig":
+        if self.quantization.mode != "none" and self.storage != "segments":
+            raise ValueError('quantization needs storage: "segments"; in memory it would add to the float32 embeddings')
+        return self
+
+
+class WriteBehindConfig(BaseModel):
+    """Background consolidation of add_memory requests."""
+    enabled: bool = False
+    workers: int = 2
+    max_queue: int = 100
+    max_retries: int = 3
+    retry_backoff: float = 1.0
+    enqueue_timeout: float = 1.0
+    drain_timeout: float = 30.0
+
+
+class DedupConfig(BaseModel):
+    """Write-time deduplication of memory segments."""
+    enabled: bool = True
+    threshold: float = 0.92
+    action: Literal["skip", "merge"] = "merge"
+
+
+class RetrievalCacheConfig(BaseModel):
+    """Cache of search_memory results, invalidated by writes."""
+    enabled: bool = False
+    scope: Literal["session", "process"] = "session"
+    max_entries: int = 256
+    ttl_seconds: float = 300.0
+
+
+class HybridConfig(BaseModel):
+    """Lexical (BM25) retrieval fused with vector search."""
+    enabled: bool = False
+    vector_weight: float = 0.5
+    lexical_weight: float = 0.5
+    candidates: int = 20
+    k1: float = 1.2
+    b: float = 0.75
+
+
+class MemoryConfig(BaseModel):
+    """`memory` section of llm_config.yaml."""
+    backend: Literal["azure", "local"] = "azure"
+    local: LocalMemoryConfig = LocalMemoryConfig()
+    write_behind: WriteBehindConfig = WriteBehindConfig()
+    dedup: DedupConfig = DedupConfig()
+    retrieval_cache: RetrievalCacheConfig = RetrievalCacheConfig()
+    hybrid: HybridConfig = HybridConfig()
+
+
+@lru_cache(maxsize=1)
+def load_memory_config() -> MemoryConfig:
+    """Reads the `memory` section of llm_config.yaml once per process."""
+    raw = load_llm_config().get("memory") or {}
+    return MemoryConfig(**raw)
@@ -0,0 +1,73 @@
+from typing import Dict, List
+import numpy as np
+from loguru import logger
+from memory_handler.memory_config import DedupConfig
+from providers.vector_db_provider import MemoryDocument, VectorDBProvider
+
+
+def batch_duplicates(vectors: np.ndarray, categories: List[str], threshold: float) -> np.ndarray:
+    """
+    Marks every segment that is a near duplicate of an earlier, kept segment of the same
+    category, using one cosine similarity matrix for the whole batch.
+    """
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    categories = np.asarray(categories, dtype=object)
+    similar = (vectors @ vectors.T >= threshold) & (categories[:, None] == categories[None, :])
+    similar = np.triu(similar, k=1)
+
+    duplicate = np.zeros(len(vectors), dtype=bool)
+    for i in range(len(vectors)):
+        if not duplicate[i]:
+            duplicate |= similar[i]
+    return duplicate
+
+
+async def deduplicate_documents(
+    handler: VectorDBProvider,
+    docs: List[MemoryDocument],
+    config: DedupConfig,
+) -> List[MemoryDocument]:
+    """
+    Drops segments that repeat each other or a stored memory of their category.
+    With `action: merge` a segment close to a stored memory takes over its id, so
+    the upload refreshes that memory instead of adding a duplicate next to it.
+    Uncategorised segments are only checked against each other: a search without a
+    category would compare them with every stored memory.
+    """
+    if not config.enabled or not docs:
+        return docs
+
+    duplicate = batch_duplicates(
+        np.asarray([doc.embeddings for doc in docs], dtype=np.float32),
+        [doc.category or "" for doc in docs],
+        config.threshold,
+    )
+    unique = [doc for doc, dup in zip(docs, duplicate) if not dup]
+
+    grouped: Dict[str, List[MemoryDocument]] = {}
+    for doc in unique:
+        grouped.setdefault(doc.category, []).append(doc)
+
+    kept, claimed = [], set()
+    for category, group in grouped.items():
+        if not category:
+            kept.extend(group)
+            continue
+        neighbours = await handler.batch_vector_search(
+            [doc.embeddings for doc in group], top_k=1, category=category
+        )
+        for doc, hits in zip(group, neighbours):
+            nearest = hits[0] if hits else None
+            if nearest is None or nearest.get("score", -1.0) < config.threshold:
+                kept.append(doc)
+            elif config.action == "merge" and nearest["id"] not in claimed:
+                claimed.add(nearest["id"])
+                kept.append(doc.model_copy(update={"id": nearest["id"]}))
+
+    logger.info(
+        "Deduplicated {} memory segments to {} ({} within the batch)",
+        len(docs),
+        len(kept),
+        int(duplicate.sum()),
+    )
+    return kept
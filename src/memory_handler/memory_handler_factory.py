@@ -0,0 +1,42 @@
+from typing import Optional
+from loguru import logger
+from providers.vector_db_provider import VectorDBProvider
+from llm_handler.openai_handler import OpenAIHandler
+from utilities.llm_config_handler import find_llm_config
+from memory_handler.memory_config import load_memory_config
+from memory_handler.azure_search_memory_handler import AzureSearchMemoryHandler
+from memory_handler.local_memory_handler import LocalMemoryHandler
+from memory_handler.tenant_sharded_memory_handler import TenantShardedMemoryHandler
+
+
+_openai_handler: Optional[OpenAIHandler] = None
+
+
+async def embedding_dims() -> int:
+    """Size of the embeddings the configured model produces, probed once per process."""
+    global _openai_handler
+    if _openai_handler is None:
+        _openai_handler = OpenAIHandler(config_path=find_llm_config())
+        _openai_handler.init_client()
+    return await _openai_handler.probe_embedding_dims()
+
+
+async def create_memory_handler() -> VectorDBProvider:
+    """
+    Returns the memory handler for the backend selected in llm_config.yaml. Its index
+    is sized for the embedding model, and an existing index of another size is rejected.
+    Both backends keep the memories of every tenant (see memory_handler.tenancy) apart.
+    """
+    config = load_memory_config()
+    dims = await embedding_dims()
+    logger.info("Using '{}' memory backend", config.backend)
+    if config.backend == "local":
+        return await TenantShardedMemoryHandler.create(config=config.local, dims=dims)
+    return await AzureSearchMemoryHandler.create(dims=dims)
+
+
+async def close_memory_handlers() -> None:
+    """Closes every shared memory handler; called when the app shuts down."""
+    await AzureSearchMemoryHandler.shutdown()
+    for handler in [*TenantShardedMemoryHandler._instances.values(), *LocalMemoryHandler._instances.values()]:
+        await handler.close()
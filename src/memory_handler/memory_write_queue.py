@@ -0,0 +1,127 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+from loguru import logger
+from memory_handler.memory_config import WriteBehindConfig
+from utilities.telemetry import TELEMETRY
+
+
+class MemoryWriteQueue:
+    """
+    Bounded write-behind queue: callers enqueue a payload (a chat history snapshot)
+    and return immediately while a small pool of workers runs `process` on it,
+    retrying failures with exponential backoff. A full queue makes `enqueue` wait up
+    to `enqueue_timeout` before rejecting the payload. Workers start lazily on the
+    running event loop and run every job in the context of the caller that queued it,
+    so it writes to that caller's tenant.
+    """
+
+    def __init__(self, process: Callable[[Any], Awaitable[bool]], config: WriteBehindConfig):
+        self.process = process
+        self.config = config
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        TELEMETRY.gauge("memory_write_queue_depth", "Memory writes waiting for a worker", lambda: self.depth)
+        TELEMETRY.gauge("memory_write_max_lag_seconds", "Longest memory write so far, queueing included", lambda: self.max_lag)
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._queue is not None and self.depth:
+            logger.warning("Dropping {} queued memory writes of a closed event loop", self.depth)
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.config.max_queue)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.config.workers)]
+
+    async def enqueue(self, payload: Any) -> bool:
+        """Queues a payload; returns False if the queue stayed full for `enqueue_timeout` seconds."""
+        self._start()
+        try:
+            await asyncio.wait_for(self._queue.put((payload, contextvars.copy_context(), time.monotonic())), self.config.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            TELEMETRY.count("memory_writes_total", outcome="rejected")
+            logger.warning("Memory write queue full ({} jobs), rejecting write", self.depth)
+            return False
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            payload, context, enqueued_at = await self._queue.get()
+            stored = False
+            try:
+                stored = await asyncio.create_task(self._run(payload), context=context)
+            finally:
+                self.last_lag = time.monotonic() - enqueued_at
+                self.max_lag = max(self.max_lag, self.last_lag)
+                TELEMETRY.observe("memory_write_lag_seconds", self.last_lag, outcome="stored" if stored else "failed")
+                self._queue.task_done()
+                logger.info(
+                    "Memory write finished on worker {} after {:.2f}s, {} still queued",
+                    worker_id,
+                    self.last_lag,
+                    self.depth,
+                )
+
+    async def _run(self, payload: Any) -> bool:
+        for attempt in range(self.config.max_retries + 1):
+            if attempt:
+                self.retried += 1
+                TELEMETRY.count("retries_total", operation="memory_write")
+                await asyncio.sleep(self.config.retry_backoff * 2 ** (attempt - 1))
+            try:
+                if await self.process(payload):
+                    self.processed += 1
+                    TELEMETRY.count("memory_writes_total", outcome="stored")
+                    return True
+                logger.warning("Memory write attempt {} failed", attempt + 1)
+            except Exception:
+                logger.exception("Memory write attempt {} raised", attempt + 1)
+        self.failed += 1
+        TELEMETRY.count("memory_writes_total", outcome="failed")
+        logger.error("Giving up memory write after {} attempts", self.config.max_retries + 1)
+        return False
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Waits for queued writes to finish (up to `timeout` seconds), then stops the workers."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        timeout = self.config.drain_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Memory write queue not drained within {}s, {} jobs lost", timeout, self.depth)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers, self._queue, self._loop = [], None, None
+        logger.info("Memory write queue drained: {}", self.metrics())
+
+    def metrics(self) -> dict:
+        """Counters since startup; telemetry exports the same figures as they change."""
+        return {
+            "depth": self.depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "last_lag_seconds": self.last_lag,
+            "max_lag_seconds": self.max_lag,
+        }
@@ -0,0 +1,130 @@
+from typing import List, Optional
+import numpy as np
+from loguru import logger
+
+# Rows scored per step, bounding the (queries x rows x subspaces) lookup gather of PQ.
+_CHUNK_ROWS = 16384
+
+
+class QuantizedBlock:
+    """Codes of consecutive rows of one scan unit, plus the per-vector scales of int8 codes."""
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def extend(self, other: "QuantizedBlock") -> "QuantizedBlock":
+        return QuantizedBlock(
+            np.concatenate([self.codes, other.codes]),
+            np.concatenate([self.scales, other.scales]) if self.scales is not None else None,
+        )
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantisation with one scale per vector: every component is stored as
+    round(x / scale) with scale = max|x| / 127, a quarter of the float32 size.
+    """
+
+    trained = True
+
+    def encode(self, vectors: np.ndarray) -> QuantizedBlock:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return QuantizedBlock(codes, scales.astype(np.float32))
+
+    def scores(self, queries: np.ndarray, block: QuantizedBlock) -> np.ndarray:
+        """Approximate inner products of every query with every encoded row."""
+        scores = np.empty((len(queries), len(block)), dtype=np.float32)
+        for start in range(0, len(block), _CHUNK_ROWS):
+            chunk = slice(start, start + _CHUNK_ROWS)
+            scores[:, chunk] = (queries @ block.codes[chunk].T.astype(np.float32)) * block.scales[chunk]
+        return scores
+
+
+class ProductQuantizer:
+    """
+    Product quantisation: vectors are split into `subspaces` slices, each replaced by the
+    uint8 index of its nearest k-means centroid (256 per slice). Queries are scored by
+    asymmetric distance computation, summing per-slice lookup tables of the exact query
+    against the centroids.
+    """
+
+    def __init__(self, dims: int, subspaces: int = 96, iterations: int = 15, seed: int = 0):
+        if dims % subspaces:
+            raise ValueError(f"{dims} dims cannot be split into {subspaces} subspaces")
+        self.dims = dims
+        self.subspaces = subspaces
+        self.sub_dims = dims // subspaces
+        self.iterations = iterations
+        self.centroids: Optional[np.ndarray] = None
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.subspaces, self.sub_dims)
+
+    def _assign(self, parts: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # Squared distances without the constant |x|^2 term.
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * parts @ centroids.T
+        return distances.argmin(axis=1)
+
+    def fit(self, vectors: np.ndarray, clusters: int = 256) -> None:
+        """Trains one k-means codebook per subspace on a sample of the stored vectors."""
+        parts = self._split(vectors)
+        clusters = min(clusters, len(parts))
+        centroids = np.empty((self.subspaces, clusters, self.sub_dims), dtype=np.float32)
+        for j in range(self.subspaces):
+            data = parts[:, j]
+            centres = data[self._rng.choice(len(data), clusters, replace=False)].copy()
+            for _ in range(self.iterations):
+                labels = self._assign(data, centres)
+                sums = np.zeros_like(centres)
+                np.add.at(sums, labels, data)
+                counts = np.bincount(labels, minlength=clusters)
+                filled = counts > 0
+                centres[filled] = sums[filled] / counts[filled, None]
+            centroids[j] = centres
+        self.centroids = centroids
+        logger.info("Trained product quantiser: {} subspaces x {} centroids on {} vectors", self.subspaces, clusters, len(parts))
+
+    def encode(self, vectors: np.ndarray) -> QuantizedBlock:
+        parts = self._split(vectors)
+        codes = np.empty((len(parts), self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            codes[:, j] = self._assign(parts[:, j], self.centroids[j])
+        return QuantizedBlock(codes)
+
+    def scores(self, queries: np.ndarray, block: QuantizedBlock) -> np.ndarray:
+        """Asymmetric inner products: exact query slices against the centroids of every code."""
+        tables = np.einsum("qjd,jkd->qjk", self._split(queries), self.centroids)
+        subspace = np.arange(self.subspaces)[None, :]
+        scores = np.empty((len(queries), len(block)), dtype=np.float32)
+        for start in range(0, len(block), _CHUNK_ROWS):
+            codes = block.codes[start : start + _CHUNK_ROWS]
+            scores[:, start : start + len(codes)] = tables[:, subspace, codes].sum(axis=-1)
+        return scores
+
+
+def pq_subspaces(dims: int, requested: int) -> int:
+    """The largest number of subspaces up to `requested` that splits `dims` evenly."""
+    return next(n for n in range(max(1, min(requested, dims)), 0, -1) if dims % n == 0)
+
+
+def recall_at_k(approximate: List[List[str]], exact: List[List[str]]) -> float:
+    """Share of the exact top-k ids that the approximate search returned as well."""
+    found = sum(len(set(a) & set(e)) for a, e in zip(approximate, exact))
+    total = sum(len(e) for e in exact)
+    return found / total if total else 1.0
@@ -0,0 +1,24 @@
+from typing import Dict, List, Optional
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[dict]],
+    k: int = 60,
+    top_k: Optional[int] = None,
+    weights: Optional[List[float]] = None,
+) -> List[dict]:
+    """
+    Merges ranked result lists with reciprocal-rank fusion: a document scores
+    sum(weight / (k + rank)) over the lists it appears in. Documents are deduplicated
+    by `id`, keeping their first occurrence, and carry the fused score as `rrf_score`.
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    fused: Dict[str, float] = {}
+    docs: Dict[str, dict] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, doc in enumerate(ranked, start=1):
+            fused[doc["id"]] = fused.get(doc["id"], 0.0) + weight / (k + rank)
+            docs.setdefault(doc["id"], doc)
+
+    order = sorted(fused, key=lambda doc_id: -fused[doc_id])
+    return [{**docs[doc_id], "rrf_score": fused[doc_id]} for doc_id in order[:top_k]]
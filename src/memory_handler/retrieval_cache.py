@@ -0,0 +1,112 @@
+import time
+import weakref
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Iterable, List, Optional, Tuple
+from loguru import logger
+from memory_handler.memory_config import RetrievalCacheConfig
+from memory_handler.tenancy import current_tenant
+from utilities.telemetry import TELEMETRY
+
+
+class RetrievalCache:
+    """
+    LRU cache of search_memory results keyed by (tenant, category, normalised query text).
+    Entries expire after `ttl_seconds`; writes to a category drop its entries and
+    those of unfiltered searches, which may include documents of any category.
+    """
+
+    def __init__(self, config: RetrievalCacheConfig):
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], tuple]" = OrderedDict()
+        _live_caches.add(self)
+
+    @staticmethod
+    def key(category: Optional[str], text: str) -> Tuple[str, str, str]:
+        return current_tenant(), category or "", " ".join(text.lower().split())
+
+    def get(self, category: Optional[str], text: str) -> Optional[List[dict]]:
+        key = self.key(category, text)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] <= self.config.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            TELEMETRY.count("cache_lookups_total", cache="retrieval", result="hit")
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        TELEMETRY.count("cache_lookups_total", cache="retrieval", result="miss")
+        return None
+
+    def put(self, category: Optional[str], text: str, docs: List[dict]) -> None:
+        key = self.key(category, text)
+        self._entries[key] = (docs, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, categories: Optional[Iterable[Optional[str]]] = None, tenant: Optional[str] = None) -> None:
+        """
+        Drops the entries of `categories` (and of unfiltered searches), or all entries for
+        None, of one tenant or of every tenant for None.
+        """
+        stale = [key for key in self._entries if tenant is None or key[0] == tenant]
+        if categories is not None:
+            affected = {category or "" for category in categories} | {""}
+            stale = [key for key in stale if key[1] in affected]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+        }
+
+
+_live_caches: "weakref.WeakSet[RetrievalCache]" = weakref.WeakSet()
+_process_cache: Optional[RetrievalCache] = None
+_session_cache: ContextVar[Optional[RetrievalCache]] = ContextVar("retrieval_cache", default=None)
+
+
+def get_retrieval_cache(config: RetrievalCacheConfig) -> Optional[RetrievalCache]:
+    """
+    Returns the cache of the current session when one was started, otherwise the
+    process-wide cache; None when caching is disabled.
+    """
+    global _process_cache
+    if not config.enabled:
+        return None
+    if config.scope == "session" and _session_cache.get() is not None:
+        return _session_cache.get()
+    if _process_cache is None:
+        _process_cache = RetrievalCache(config)
+    return _process_cache
+
+
+def use_session_cache(cache: Optional[RetrievalCache]) -> None:
+    """Makes `cache` the retrieval cache of the current context (one Chainlit message handler)."""
+    _session_cache.set(cache)
+
+
+def invalidate_retrieval_caches(
+    categories: Optional[Iterable[Optional[str]]] = None, tenant: Optional[str] = None
+) -> None:
+    """Called after every write to the memory store; None invalidates every category (or tenant)."""
+    categories = None if categories is None else set(categories)
+    for cache in list(_live_caches):
+        cache.invalidate(categories, tenant)
+    logger.debug(
+        "Invalidated retrieval caches of tenant {} for {}",
+        "*" if tenant is None else tenant,
+        "all categories" if categories is None else categories,
+    )
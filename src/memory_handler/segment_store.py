@@ -0,0 +1,379 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from loguru import logger
+from providers.vector_db_provider import MemoryDocument
+
+# SQLite's default limit on bound parameters per statement.
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    live INTEGER NOT NULL,
+    sealed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id TEXT PRIMARY KEY,
+    memory TEXT NOT NULL,
+    category TEXT NOT NULL,
+    time TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    row INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_segment_row ON docs (segment, row);
+"""
+
+
+def _chunks(items: List, size: int = _MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class Segment:
+    """
+    Fixed-width float32 segment file holding embeddings of a single category.
+    The file is only ever appended to and is read through np.memmap, so a search
+    pages in just the segments it scans. Row liveness is loaded on first use.
+    """
+
+    def __init__(self, store: "SegmentStore", segment_id: int, category: str, rows: int, live: int, sealed: bool):
+        self.store = store
+        self.id = segment_id
+        self.category = category
+        self.rows = rows
+        self.live = live
+        self.sealed = sealed
+        self._matrix: Optional[np.memmap] = None
+        self._alive: Optional[np.ndarray] = None
+        self.codes = None
+
+    @property
+    def size(self) -> int:
+        return self.rows
+
+    @property
+    def path(self) -> str:
+        return self.store.segment_path(self.id)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self.rows == 0:
+            return np.empty((0, self.store.dims), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != self.rows:
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.store.dims))
+        return self._matrix
+
+    @property
+    def alive(self) -> np.ndarray:
+        if self._alive is None:
+            alive = np.zeros(self.rows, dtype=bool)
+            rows = self.store.live_rows(self.id)
+            alive[rows] = True
+            self._alive = alive
+        elif len(self._alive) < self.rows:
+            self._alive = np.concatenate([self._alive, np.zeros(self.rows - len(self._alive), dtype=bool)])
+        return self._alive
+
+    def mark(self, rows: List[int], alive: bool) -> None:
+        if self._alive is not None:
+            self.alive[rows] = alive
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every query against every row; deleted rows score -inf."""
+        scores = queries @ self.matrix.T
+        scores[:, ~self.alive] = -np.inf
+        return scores
+
+    def document(self, row: int) -> dict:
+        return self.store.document(self.id, row)
+
+
+class SegmentStore:
+    """
+    On-disk store for memory documents: embeddings live in append-only float32
+    segment files (one active segment per category), metadata (`id`, `memory`,
+    `category`, `time`) and row locations in a SQLite side table. Opening a store
+    reads only the segment table, never the embeddings. `compact` merges sealed
+    segments of a category and drops deleted rows; it is safe to run in a thread
+    as long as scans listing segments and reading their rows hold `reading()`.
+    """
+
+    def __init__(self, directory: str, segment_rows: int = 65536):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "metadata.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dims'").fetchone()
+        self.dims: Optional[int] = int(row[0]) if row else None
+
+        self._segments: Dict[int, Segment] = {}
+        self._active: Dict[str, int] = {}
+        for segment_id, category, rows, live, sealed in self._db.execute(
+            "SELECT id, category, rows, live, sealed FROM segments"
+        ):
+            segment = Segment(self, segment_id, category, rows, live, bool(sealed))
+            self._segments[segment_id] = segment
+            if not segment.sealed:
+                self._active[category] = segment_id
+                self._truncate(segment)
+        logger.info("Opened segment store {} with {} segments", directory, len(self._segments))
+
+    @contextmanager
+    def reading(self):
+        """Keeps compaction from swapping segments out while a scan reads them and their documents."""
+        with self._lock:
+            yield
+
+    def segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"seg-{segment_id:08d}.f32")
+
+    def _truncate(self, segment: Segment) -> None:
+        # Drops vectors written by an append whose metadata never got committed.
+        size = segment.rows * self.dims * 4 if self.dims else 0
+        if os.path.exists(segment.path) and os.path.getsize(segment.path) > size:
+            with open(segment.path, "r+b") as f:
+                f.truncate(size)
+
+    def set_dims(self, dims: int) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dims', ?)", (str(dims),))
+            self._db.commit()
+            self.dims = dims
+
+    def segments(self, category: Optional[str] = None) -> List[Segment]:
+        """Returns the segments of one category, or all segments."""
+        with self._lock:
+            return [s for s in self._segments.values() if category is None or s.category == category]
+
+    def live_rows(self, segment_id: int) -> List[int]:
+        with self._lock:
+            return [row for (row,) in self._db.execute("SELECT row FROM docs WHERE segment = ?", (segment_id,))]
+
+    def document(self, segment_id: int, row: int) -> dict:
+        with self._lock:
+            doc_id, memory, category, time = self._db.execute(
+                "SELECT id, memory, category, time FROM docs WHERE segment = ? AND row = ?",
+                (segment_id, row),
+            ).fetchone()
+        return {'id': doc_id, 'memory': memory, 'category': category or None, 'time': time}
+
+    def documents(self, ids: Optional[List[str]] = None) -> List[dict]:
+        """Metadata of the documents with the given ids, or of every document."""
+        with self._lock:
+            if ids is None:
+                rows = list(self._db.execute("SELECT id, memory, category, time FROM docs"))
+            else:
+                rows = []
+                for chunk in _chunks(ids):
+                    rows.extend(self._db.execute(
+                        f"SELECT id, memory, category, time FROM docs WHERE id IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ))
+        return [
+            {'id': doc_id, 'memory': memory, 'category': category or None, 'time': time}
+            for doc_id, memory, category, time in rows
+        ]
+
+    def ids(self, category: str) -> List[str]:
+        """Ids of the documents of one category."""
+        with self._lock:
+            return [doc_id for (doc_id,) in self._db.execute("SELECT id FROM docs WHERE category = ?", (category,))]
+
+    def vectors(self, ids: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Embeddings of the documents with the given ids, and the ids that were found."""
+        with self._lock:
+            located = []
+            for chunk in _chunks(ids):
+                located.extend(self._db.execute(
+                    f"SELECT id, segment, row FROM docs WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            matrix = np.empty((len(located), self.dims or 0), dtype=np.float32)
+            for i, (_, segment_id, row) in enumerate(located):
+                matrix[i] = self._segments[segment_id].matrix[row]
+        return [doc_id for doc_id, _, _ in located], matrix
+
+    def _active_segment(self, category: str) -> Segment:
+        segment_id = self._active.get(category)
+        if segment_id is not None and self._segments[segment_id].rows < self.segment_rows:
+            return self._segments[segment_id]
+        if segment_id is not None:
+            self._seal(self._segments[segment_id])
+        cursor = self._db.execute(
+            "INSERT INTO segments (category, rows, live, sealed) VALUES (?, 0, 0, 0)", (category,)
+        )
+        segment = Segment(self, cursor.lastrowid, category, 0, 0, False)
+        self._segments[segment.id] = segment
+        self._active[category] = segment.id
+        return segment
+
+    def _seal(self, segment: Segment) -> None:
+        segment.sealed = True
+        self._active.pop(segment.category, None)
+        self._db.execute("UPDATE segments SET sealed = 1 WHERE id = ?", (segment.id,))
+
+    def _delete(self, ids: List[str]) -> Set[str]:
+        located = []
+        for chunk in _chunks(ids):
+            marks = ",".join("?" * len(chunk))
+            located.extend(self._db.execute(f"SELECT segment, row FROM docs WHERE id IN ({marks})", chunk))
+            self._db.execute(f"DELETE FROM docs WHERE id IN ({marks})", chunk)
+
+        by_segment: Dict[int, List[int]] = {}
+        for segment_id, row in located:
+            by_segment.setdefault(segment_id, []).append(row)
+        for segment_id, rows in by_segment.items():
+            segment = self._segments[segment_id]
+            segment.mark(rows, False)
+            segment.live -= len(rows)
+            self._db.execute("UPDATE segments SET live = ? WHERE id = ?", (segment.live, segment_id))
+        return {self._segments[segment_id].category for segment_id in by_segment}
+
+    def append(self, docs: List[MemoryDocument], vectors: np.ndarray, categories: List[str]) -> Set[str]:
+        """
+        Appends normalised vectors to the active segments; existing ids are replaced.
+        Returns the categories the replaced documents belonged to.
+        """
+        with self._lock:
+            replaced = self._delete([doc.id for doc in docs])
+            grouped: Dict[str, List[int]] = {}
+            for i, category in enumerate(categories):
+                grouped.setdefault(category, []).append(i)
+
+            for category, positions in grouped.items():
+                segment = self._active_segment(category)
+                with open(segment.path, "ab") as f:
+                    f.write(np.ascontiguousarray(vectors[positions], dtype=np.float32).tobytes())
+                self._db.executemany(
+                    "INSERT INTO docs (id, memory, category, time, segment, row) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            docs[i].id,
+                            docs[i].memory,
+                            category,
+                            (docs[i].time or datetime.now()).isoformat(),
+                            segment.id,
+                            segment.rows + offset,
+                        )
+                        for offset, i in enumerate(positions)
+                    ],
+                )
+                first = segment.rows
+                segment.rows += len(positions)
+                segment.live += len(positions)
+                segment.mark(list(range(first, segment.rows)), True)
+                self._db.execute(
+                    "UPDATE segments SET rows = ?, live = ? WHERE id = ?",
+                    (segment.rows, segment.live, segment.id),
+                )
+            self._db.commit()
+            return replaced
+
+    def delete(self, ids: List[str]) -> Set[str]:
+        """Deletes documents by id and returns the categories they belonged to."""
+        with self._lock:
+            categories = self._delete(ids)
+            self._db.commit()
+            return categories
+
+    def compact(self, ratio: float = 0.25) -> None:
+        """
+        Seals active segments that are full or carry at least `ratio` deleted rows,
+        then merges every category's sealed segments into one, dropping deleted rows.
+        Vectors are copied without holding the lock; deletes that land meanwhile are
+        honoured when the merged segment is swapped in.
+        """
+        with self._compacting:
+            self._compact(ratio)
+
+    def _compact(self, ratio: float) -> None:
+        with self._lock:
+            for segment_id in list(self._active.values()):
+                segment = self._segments[segment_id]
+                if segment.rows >= self.segment_rows or (
+                    segment.rows and segment.rows - segment.live >= ratio * segment.rows
+                ):
+                    self._seal(segment)
+            self._db.commit()
+
+            plans: Dict[str, List[Segment]] = {}
+            for segment in self._segments.values():
+                if segment.sealed:
+                    plans.setdefault(segment.category, []).append(segment)
+            plans = {
+                category: sources
+                for category, sources in plans.items()
+                if len(sources) > 1 or sources[0].live < sources[0].rows
+            }
+            snapshots = {
+                category: [
+                    (source, self._db.execute(
+                        "SELECT id, row FROM docs WHERE segment = ? ORDER BY row", (source.id,)
+                    ).fetchall())
+                    for source in sources
+                ]
+                for category, sources in plans.items()
+            }
+
+        for category, sources in snapshots.items():
+            self._merge(category, sources)
+
+    def _merge(self, category: str, sources) -> None:
+        tmp_path = os.path.join(self.directory, f"merge-{os.getpid()}-{threading.get_ident()}.tmp")
+        moved = []
+        with open(tmp_path, "wb") as f:
+            for source, live in sources:
+                rows = [row for _, row in live]
+                if rows:
+                    f.write(np.ascontiguousarray(source.matrix[rows]).tobytes())
+                moved.extend((doc_id, source.id, row) for doc_id, row in live)
+
+        with self._lock:
+            merged = None
+            if moved:
+                cursor = self._db.execute(
+                    "INSERT INTO segments (category, rows, live, sealed) VALUES (?, ?, 0, 1)", (category, len(moved))
+                )
+                merged = Segment(self, cursor.lastrowid, category, len(moved), 0, True)
+                os.replace(tmp_path, merged.path)
+                for new_row, (doc_id, segment_id, row) in enumerate(moved):
+                    merged.live += self._db.execute(
+                        "UPDATE docs SET segment = ?, row = ? WHERE id = ? AND segment = ? AND row = ?",
+                        (merged.id, new_row, doc_id, segment_id, row),
+                    ).rowcount
+                self._db.execute("UPDATE segments SET live = ? WHERE id = ?", (merged.live, merged.id))
+                self._segments[merged.id] = merged
+            else:
+                os.remove(tmp_path)
+
+            for source, _ in sources:
+                self._db.execute("DELETE FROM segments WHERE id = ?", (source.id,))
+                del self._segments[source.id]
+            self._db.commit()
+            for source, _ in sources:
+                if os.path.exists(source.path):
+                    os.remove(source.path)
+
+        logger.info(
+            "Merged {} segments of '{}' into {} live rows",
+            len(sources),
+            category,
+            merged.live if merged else 0,
+        )
+
+    def close(self) -> None:
+        """Closes the metadata database once a running compaction has finished."""
+        with self._compacting, self._lock:
+            self._db.close()
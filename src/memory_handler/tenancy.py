@@ -0,0 +1,29 @@
+import hashlib
+import re
+from contextvars import ContextVar
+from typing import Optional
+
+# Tenant of callers that never set one (the CLI, startup checks).
+DEFAULT_TENANT = "default"
+
+_current_tenant: ContextVar[str] = ContextVar("memory_tenant", default=DEFAULT_TENANT)
+
+
+def use_tenant(tenant: Optional[str]) -> None:
+    """Makes `tenant` the owner of the memories read and written in the current context."""
+    _current_tenant.set(tenant or DEFAULT_TENANT)
+
+
+def current_tenant() -> str:
+    return _current_tenant.get()
+
+
+def shard_name(tenant: str) -> str:
+    """File-system safe, collision free directory name of a tenant's shard."""
+    readable = re.sub(r"[^A-Za-z0-9_.-]", "_", tenant)[:32]
+    return f"{readable}-{hashlib.sha1(tenant.encode()).hexdigest()[:12]}"
+
+
+def odata_literal(value: str) -> str:
+    """Quotes `value` as an OData string literal for Azure AI Search filters."""
+    return "'" + value.replace("'", "''") + "'"
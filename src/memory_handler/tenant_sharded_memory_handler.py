@@ -0,0 +1,171 @@
+import os
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from loguru import logger
+from providers.vector_db_provider import VectorDBProvider, MemoryDocument
+from memory_handler.memory_config import LocalMemoryConfig, load_memory_config
+from memory_handler.local_memory_handler import LocalMemoryHandler
+from memory_handler.tenancy import current_tenant
+from utilities.telemetry import TELEMETRY, traced
+
+
+class TenantShardedMemoryHandler(VectorDBProvider):
+    """
+    Local memory store partitioned by tenant: every tenant owns a separate
+    LocalMemoryHandler shard, so a search scans one user's memories only. Shards are
+    opened on first access and, with segment storage, the least recently used idle
+    shards are closed once the open shards exceed `shard_budget_mb`. In-memory shards
+    hold the only copy of their memories and are never evicted.
+    """
+
+    _instances: Dict[str, "TenantShardedMemoryHandler"] = {}
+
+    def __init__(self, index_name: str, config: LocalMemoryConfig, dims: int):
+        self.index_name = index_name
+        self.config = config
+        self.dims = dims
+        self.budget = int(config.shard_budget_mb * 2**20)
+        self.evictions = 0
+        self._shards: "OrderedDict[str, LocalMemoryHandler]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, config: Optional[LocalMemoryConfig] = None, dims: int = 1536):
+        index_name = os.getenv("INDEX_NAME") or "memory"
+        self = cls._instances.get(index_name)
+        if self is None:
+            self = cls(index_name, config or load_memory_config().local, dims)
+            cls._instances[index_name] = self
+        return self
+
+    async def _open(self, tenant: str) -> LocalMemoryHandler:
+        shard = self._shards.get(tenant)
+        if shard is None:
+            async with self._lock:
+                shard = self._shards.get(tenant)
+                if shard is None:
+                    shard = LocalMemoryHandler(self.index_name, self.config, tenant=tenant)
+                    if not await shard.create_index(dims=self.dims):
+                        await shard.close()
+                        raise RuntimeError(f"Shard of tenant '{tenant}' could not be opened")
+                    shard.start_compaction()
+                    self._shards[tenant] = shard
+                    logger.info("Opened shard of tenant '{}' in '{}' ({} open)", tenant, self.index_name, len(self._shards))
+        self._shards.move_to_end(tenant)
+        return shard
+
+    @asynccontextmanager
+    async def _tenant_shard(self):
+        """The current tenant's shard, pinned against eviction while it is in use."""
+        tenant = current_tenant()
+        shard = await self._open(tenant)
+        self._pins[tenant] = self._pins.get(tenant, 0) + 1
+        try:
+            yield shard
+        finally:
+            self._pins[tenant] -= 1
+            if not self._pins[tenant]:
+                del self._pins[tenant]
+            await self._evict()
+
+    def resident_bytes(self) -> int:
+        return sum(shard.resident_bytes() for shard in self._shards.values())
+
+    async def _evict(self) -> None:
+        """Closes least recently used idle shards until the open ones fit the budget."""
+        if self.config.storage != "segments":
+            return
+        resident = self.resident_bytes()
+        for tenant in list(self._shards):
+            if resident <= self.budget:
+                break
+            if tenant in self._pins:
+                continue
+            shard = self._shards.pop(tenant)
+            resident -= shard.resident_bytes()
+            self.evictions += 1
+            # A reopen of this tenant waits until its files are released.
+            async with self._lock:
+                await shard.close()
+            logger.info("Evicted shard of tenant '{}' from '{}', {} bytes still open", tenant, self.index_name, resident)
+
+    async def close(self) -> None:
+        """Closes every open shard."""
+        while self._shards:
+            _, shard = self._shards.popitem(last=False)
+            await shard.close()
+        if type(self)._instances.get(self.index_name) is self:
+            del type(self)._instances[self.index_name]
+
+    def stats(self) -> dict:
+        return {
+            "open_shards": len(self._shards),
+            "resident_bytes": self.resident_bytes(),
+            "budget_bytes": self.budget,
+            "evictions": self.evictions,
+        }
+
+    async def index_exists(self) -> bool:
+        async with self._tenant_shard() as shard:
+            return await shard.index_exists()
+
+    async def create_index(self, dims: int = 1536) -> bool:
+        if dims != self.dims:
+            logger.error("Shards of '{}' hold {}-dim embeddings, cannot switch to {}", self.index_name, self.dims, dims)
+            return False
+        return True
+
+    @traced("local_memory.add_documents", "memory_store_seconds", backend="local", operation="add_documents")
+    async def add_documents(self, docs: List[MemoryDocument]) -> bool:
+        async with self._tenant_shard() as shard:
+            succeeded = await shard.add_documents(docs)
+        if succeeded:
+            TELEMETRY.count("memory_documents_uploaded_total", len(docs), backend="local")
+        return succeeded
+
+    @traced("local_memory.vector_search", "memory_store_seconds", backend="local", operation="vector_search")
+    async def vector_search(
+        self,
+        query_emb: List[float],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        category: str | None = None,
+        search_text: str | None = None,
+    ) -> List[MemoryDocument]:
+        async with self._tenant_shard() as shard:
+            return await shard.vector_search(
+                query_emb, top_k=top_k, exhaustive=exhaustive, category=category, search_text=search_text
+            )
+
+    @traced("local_memory.batch_vector_search", "memory_store_seconds", backend="local", operation="batch_vector_search")
+    async def batch_vector_search(
+        self,
+        query_embs: List[List[float]],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        category: str | None = None,
+    ) -> List[List[dict]]:
+        async with self._tenant_shard() as shard:
+            return await shard.batch_vector_search(query_embs, top_k=top_k, exhaustive=exhaustive, category=category)
+
+    @traced("local_memory.multi_vector_search", "memory_store_seconds", backend="local", operation="multi_vector_search")
+    async def multi_vector_search(
+        self,
+        query_embs: List[List[float]],
+        categories: List[Optional[str]],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        search_texts: Optional[List[Optional[str]]] = None,
+    ) -> List[List[dict]]:
+        async with self._tenant_shard() as shard:
+            return await shard.multi_vector_search(
+                query_embs, categories, top_k=top_k, exhaustive=exhaustive, search_texts=search_texts
+            )
+
+    @traced("local_memory.delete_document", "memory_store_seconds", backend="local", operation="delete_document")
+    async def delete_document(self, doc_ids: List[str]) -> bool:
+        async with self._tenant_shard() as shard:
+            return await shard.delete_document(doc_ids)
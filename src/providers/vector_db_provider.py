@@ -1,6 +1,7 @@
 # services/vector_db_provider.py
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -35,8 +36,40 @@ class VectorDBProvider(ABC):
         top_k: int = 5,
         exhaustive: bool = False,
         category: str = None,
+        search_text: Optional[str] = None,
     ) -> List[MemoryDocument]:
-        """Return top-k similar documents."""
+        """
+        Return top-k similar documents, each with its cosine similarity as `score`.
+        With hybrid retrieval enabled, `search_text` is matched lexically and fused in.
+        """
+
+    async def batch_vector_search(
+        self,
+        query_embs: List[List[float]],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        category: str = None,
+    ) -> List[List[dict]]:
+        """Return top-k similar documents per query; runs the queries concurrently by default."""
+        return list(await asyncio.gather(*(
+            self.vector_search(query_emb, top_k=top_k, exhaustive=exhaustive, category=category)
+            for query_emb in query_embs
+        )))
+
+    async def multi_vector_search(
+        self,
+        query_embs: List[List[float]],
+        categories: Sequence[Optional[str]],
+        top_k: int = 5,
+        exhaustive: bool = False,
+        search_texts: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[dict]]:
+        """Return top-k similar documents per (query, category) pair; runs the searches concurrently."""
+        search_texts = search_texts or [None] * len(query_embs)
+        return list(await asyncio.gather(*(
+            self.vector_search(query_emb, top_k=top_k, exhaustive=exhaustive, category=category, search_text=search_text)
+            for query_emb, category, search_text in zip(query_embs, categories, search_texts)
+        )))
 
     @abstractmethod
     async def delete_document(self, doc_ids: List[str]) -> bool:
@@ -0,0 +1,295 @@
+import weakref
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model: str = "gpt-4o") -> tiktoken.Encoding:
+    """Loads the tiktoken encoder for `model` once per process."""
+    return tiktoken.encoding_for_model(model)
+
+
+def count_message_tokens(msg: dict) -> int:
+    """
+    Token count of one chat message: system messages are free, assistant tool calls
+    count their arguments, every other message counts its content.
+    """
+    enc = get_encoder()
+    if msg["role"] == "system":
+        return 0
+    elif msg["role"] == "tool":
+        return len(enc.encode(msg.get("content") or ""))
+    elif msg["role"] == "assistant" and "tool_calls" in msg:
+        return sum(
+            len(enc.encode(str(tc.get("function", {}).get("arguments", ""))))
+            for tc in msg["tool_calls"]
+        )
+    else:
+        return len(enc.encode(msg.get("content") or ""))
+
+
+def format_transcript(messages: List[dict]) -> str:
+    """
+    Compact `role: content` transcript of the conversational messages. Tool calls and
+    tool results are left out: they hold memories that are already stored.
+    """
+    return "\n".join(
+        f"{msg['role']}: {msg['content']}"
+        for msg in messages
+        if msg["role"] in ("user", "assistant") and msg.get("content")
+    )
+
+
+Span = Tuple[int, int]
+
+
+class ConsolidationState:
+    """
+    Consolidation progress of one session, shared by a history and its snapshots.
+    Messages are numbered in the order they are added. Consolidations claim spans of
+    numbers and may finish in any order, so the spans being stored (`in_flight`) and
+    the stored ones past the first gap (`committed`) are kept apart, and `watermark`
+    only moves over the stored prefix: everything numbered below it is in memory.
+    `memories` collects the memories stored so far, for the rolling context summary.
+    Histories sharing the state are told when spans are claimed or handed back, so
+    that each can keep its pending token total current.
+    """
+
+    def __init__(self):
+        self.next_seq = 0
+        self.watermark = 0
+        self.in_flight: List[Span] = []
+        self.committed: List[Span] = []
+        self.memories: List[str] = []
+        self._ledgers: List[weakref.ref] = []
+
+    def covered(self, seq: int) -> bool:
+        """Whether message `seq` is stored or being stored."""
+        return seq < self.watermark or any(
+            start <= seq < end for start, end in self.in_flight + self.committed
+        )
+
+    def unclaimed(self, limit: Optional[int] = None) -> List[Span]:
+        """Spans of message numbers below `limit` that no consolidation has claimed yet."""
+        limit = self.next_seq if limit is None else min(limit, self.next_seq)
+        spans, cursor = [], self.watermark
+        for start, end in sorted(self.in_flight + self.committed):
+            if start > cursor:
+                spans.append((cursor, min(start, limit)))
+            cursor = max(cursor, end)
+        if cursor < limit:
+            spans.append((cursor, limit))
+        return [(start, end) for start, end in spans if start < end]
+
+    def track(self, history: "ChatHistory") -> None:
+        """Keeps `history`'s pending token total in step with claims on this state."""
+        self._ledgers = [ref for ref in self._ledgers if ref() is not None]
+        self._ledgers.append(weakref.ref(history))
+
+    def _cover(self, spans: List[Span], sign: int) -> None:
+        for ref in self._ledgers:
+            history = ref()
+            if history is not None:
+                history._cover(spans, sign)
+
+    def claim(self, spans: List[Span]) -> None:
+        self.in_flight.extend(spans)
+        self._cover(spans, -1)
+
+    def commit(self, spans: List[Span]) -> None:
+        for span in spans:
+            self.in_flight.remove(span)
+        self.committed.extend(spans)
+        self.committed.sort()
+        while self.committed and self.committed[0][0] <= self.watermark:
+            self.watermark = max(self.watermark, self.committed.pop(0)[1])
+
+    def release(self, spans: List[Span]) -> None:
+        for span in spans:
+            self.in_flight.remove(span)
+        self._cover(spans, 1)
+
+
+class ConsolidationBatch:
+    """Messages claimed for one memory consolidation and the spans of numbers they cover."""
+
+    def __init__(self, messages: List[dict], spans: Iterable[Span] = (), state: Optional[ConsolidationState] = None):
+        self.messages = messages
+        self.spans = list(spans)
+        self.state = state
+
+    def commit(self, memories: Iterable[str] = ()) -> None:
+        """Marks the claimed spans stored; the watermark follows once no earlier span is pending."""
+        if self.state is not None and self.spans:
+            self.state.commit(self.spans)
+            self.state.memories.extend(memories)
+            self.spans = []
+
+    def release(self) -> None:
+        """Hands this batch's messages back so the next consolidation picks them up again."""
+        if self.state is not None and self.spans:
+            self.state.release(self.spans)
+            self.spans = []
+
+
+class ChatHistory(list):
+    """
+    Chat history list with a token ledger: every message is counted once when it
+    is added and its count is dropped when it is removed, so the running totals
+    per role are available in O(1). Messages must not be edited in place.
+    Each message also gets a sequence number, against which the consolidation
+    watermark of the session is kept; the tokens not yet stored in memory are
+    tracked the same way, adjusted when consolidations claim or hand back spans.
+    """
+
+    def __init__(self, messages: Iterable[dict] = ()):
+        super().__init__()
+        self._counts: List[int] = []
+        self._seqs: List[int] = []
+        self.role_tokens: Dict[str, int] = {}
+        self._pending = 0
+        self.state = ConsolidationState()
+        self.state.track(self)
+        self.extend(messages)
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.role_tokens.values())
+
+    @property
+    def pending_tokens(self) -> int:
+        """Tokens of the messages not yet stored (or being stored) in memory."""
+        return self._pending
+
+    def claim(self) -> ConsolidationBatch:
+        """
+        Claims the conversational messages no other consolidation holds or has stored.
+        A snapshot claims nothing numbered past its own messages, which it cannot store.
+        """
+        spans = self.state.unclaimed(max(self._seqs, default=-1) + 1)
+        messages = [
+            msg for msg, seq in zip(self, self._seqs)
+            if msg["role"] != "system" and any(start <= seq < end for start, end in spans)
+        ]
+        self.state.claim(spans)
+        batch = ConsolidationBatch(messages, spans, self.state)
+        if not messages:
+            # Nothing to store (system messages, removed ones): settled right away.
+            batch.commit()
+        return batch
+
+    def _add(self, messages: List[dict]) -> List[int]:
+        counts = [count_message_tokens(msg) for msg in messages]
+        for msg, count in zip(messages, counts):
+            self.role_tokens[msg["role"]] = self.role_tokens.get(msg["role"], 0) + count
+        # New messages get fresh numbers, which no consolidation covers yet.
+        self._pending += sum(counts)
+        return counts
+
+    def _number(self, count: int) -> List[int]:
+        seqs = list(range(self.state.next_seq, self.state.next_seq + count))
+        self.state.next_seq += count
+        return seqs
+
+    def _drop(self, messages: List[dict], counts: List[int], seqs: List[int]) -> None:
+        for msg, count, seq in zip(messages, counts, seqs):
+            self.role_tokens[msg["role"]] -= count
+            if not self.state.covered(seq):
+                self._pending -= count
+
+    def _cover(self, spans: List[Span], sign: int) -> None:
+        """Adds (sign 1) or removes (sign -1) the tokens of the messages numbered within `spans`."""
+        self._pending += sign * sum(
+            count for count, seq in zip(self._counts, self._seqs)
+            if any(start <= seq < end for start, end in spans)
+        )
+
+    def append(self, msg: dict) -> None:
+        self._counts.extend(self._add([msg]))
+        self._seqs.extend(self._number(1))
+        super().append(msg)
+
+    def extend(self, messages: Iterable[dict]) -> None:
+        messages = list(messages)
+        self._counts.extend(self._add(messages))
+        self._seqs.extend(self._number(len(messages)))
+        super().extend(messages)
+
+    def __iadd__(self, messages: Iterable[dict]) -> "ChatHistory":
+        self.extend(messages)
+        return self
+
+    def insert(self, index: int, msg: dict) -> None:
+        self._counts.insert(index, self._add([msg])[0])
+        self._seqs.insert(index, self._number(1)[0])
+        super().insert(index, msg)
+
+    def pop(self, index: int = -1) -> dict:
+        msg = super().pop(index)
+        self._drop([msg], [self._counts.pop(index)], [self._seqs.pop(index)])
+        return msg
+
+    def remove(self, msg: dict) -> None:
+        del self[self.index(msg)]
+
+    def clear(self) -> None:
+        super().clear()
+        self._counts.clear()
+        self._seqs.clear()
+        self.role_tokens.clear()
+        self._pending = 0
+
+    def __delitem__(self, key) -> None:
+        removed = self[key] if isinstance(key, slice) else [self[key]]
+        counts = self._counts[key] if isinstance(key, slice) else [self._counts[key]]
+        seqs = self._seqs[key] if isinstance(key, slice) else [self._seqs[key]]
+        super().__delitem__(key)
+        del self._counts[key]
+        del self._seqs[key]
+        self._drop(removed, counts, seqs)
+
+    def __setitem__(self, key, value) -> None:
+        removed = self[key] if isinstance(key, slice) else [self[key]]
+        counts = self._counts[key] if isinstance(key, slice) else [self._counts[key]]
+        seqs = self._seqs[key] if isinstance(key, slice) else [self._seqs[key]]
+        added = list(value) if isinstance(key, slice) else [value]
+        self._drop(removed, counts, seqs)
+        new_counts = self._add(added)
+        super().__setitem__(key, added if isinstance(key, slice) else value)
+        self._counts[key] = new_counts if isinstance(key, slice) else new_counts[0]
+        new_seqs = self._number(len(added))
+        self._seqs[key] = new_seqs if isinstance(key, slice) else new_seqs[0]
+
+    def seq(self, index: int) -> int:
+        """Sequence number of the message at `index`."""
+        return self._seqs[index]
+
+    def copy(self) -> "ChatHistory":
+        """
+        Snapshot sharing no list state with the original and needing no re-count;
+        it shares the consolidation state, so claims made on it apply to the session.
+        """
+        clone = ChatHistory()
+        list.extend(clone, self)
+        clone._counts = self._counts.copy()
+        clone._seqs = self._seqs.copy()
+        clone.role_tokens = dict(self.role_tokens)
+        clone._pending = self._pending
+        clone.state = self.state
+        self.state.track(clone)
+        return clone
+
+
+def claim_unconsolidated(history: List[dict]) -> ConsolidationBatch:
+    """Claims the messages of `history` that still have to be consolidated into memory."""
+    if isinstance(history, ChatHistory):
+        return history.claim()
+    return ConsolidationBatch([msg for msg in history if msg["role"] != "system"])
+
+
+def unconsolidated_tokens(history: List[dict]) -> int:
+    """Token count of the messages of `history` not yet consolidated into memory."""
+    if isinstance(history, ChatHistory):
+        return history.pending_tokens
+    return sum(count_message_tokens(msg) for msg in history)
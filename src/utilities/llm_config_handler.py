@@ -1,4 +1,5 @@
 import os
+import yaml
 
 def find_llm_config(filename="llm_config.yaml"):
     """Searches for 'llm_config.yaml' from the current directory up to the root directory."""
@@ -15,3 +16,13 @@ def find_llm_config(filename="llm_config.yaml"):
             # Reached the filesystem root
             return None
         current_dir = parent_dir
+
+
+def load_llm_config(config_path=None):
+    """Loads 'llm_config.yaml' as a dictionary; returns an empty dictionary if it cannot be found."""
+    config_path = config_path or find_llm_config()
+    if config_path is None:
+        return {}
+
+    with open(config_path, "r") as f:
+        return yaml.safe_load(f) or {}
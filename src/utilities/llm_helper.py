@@ -1,6 +1,6 @@
 import json
 import ast
-from typing import Annotated
+from typing import Annotated, Awaitable, Callable, List, Optional, Tuple
 from loguru import logger
 
 async def is_valid_ast_literal(
@@ -22,4 +22,47 @@ async def jsonize_response(
         else:
             return json.loads(response)
     except Exception as e:
-        logger.exception(f"Exception occured while jsonizing the llm response: {e}")
\ No newline at end of file
+        logger.exception(f"Exception occured while jsonizing the llm response: {e}")
+
+
+async def assemble_stream(
+    stream: Annotated[object, "Async iterator of chat completion chunks"],
+    on_token: Annotated[Optional[Callable[[str], Awaitable[None]]], "Called with every content delta"] = None,
+) -> Annotated[Tuple[str, Optional[List[dict]]], "Streamed content and tool calls (None without tool calls)"]:
+    content_parts = []
+    tool_calls = None
+
+    async for part in stream:
+        if hasattr(part, 'choices') and part.choices:
+            delta = part.choices[0].delta
+
+            # Handling the content streaming
+            if hasattr(delta, 'content') and delta.content:
+                content_parts.append(delta.content)
+                if on_token is not None:
+                    await on_token(delta.content)
+
+            # Handling the tool calls
+            if hasattr(delta, 'tool_calls') and delta.tool_calls:
+                if tool_calls is None:
+                    tool_calls = []
+
+                # Processing tool call deltas
+                for tc_delta in delta.tool_calls:
+                    while len(tool_calls) <= tc_delta.index:
+                        tool_calls.append({
+                            "id": "",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""}
+                        })
+
+                    # Updating tool call data
+                    if tc_delta.id:
+                        tool_calls[tc_delta.index]["id"] = tc_delta.id
+                    if tc_delta.function:
+                        if tc_delta.function.name:
+                            tool_calls[tc_delta.index]["function"]["name"] = tc_delta.function.name
+                        if tc_delta.function.arguments:
+                            tool_calls[tc_delta.index]["function"]["arguments"] += tc_delta.function.arguments
+
+    return "".join(content_parts), tool_calls
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List, Optional
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "50"))
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "256"))
+
+
+class StreamBuffer:
+    """
+    Coalesces streamed content deltas before they reach a (UI) sink: the first delta
+    is sent at once so time to first token is unchanged, later ones are collected and
+    sent together every `flush_ms` milliseconds, or as soon as `flush_chars` characters
+    are pending. A `flush_ms` of 0 forwards every delta unchanged.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[str], Awaitable[None]],
+        flush_ms: float = STREAM_FLUSH_MS,
+        flush_chars: int = STREAM_FLUSH_CHARS,
+    ):
+        self.sink = sink
+        self.interval = flush_ms / 1000
+        self.flush_chars = flush_chars
+        self.tokens = 0
+        self.frames = 0
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._last_flush: Optional[float] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def write(self, token: str) -> None:
+        self.tokens += 1
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        if self._last_flush is None or self.interval <= 0 or self._pending_chars >= self.flush_chars:
+            await self.flush()
+        elif self._timer is None:
+            # The timer sends what is pending once the interval since the last frame is
+            # up, also when deltas stop arriving (e.g. while tool arguments stream).
+            self._timer = asyncio.create_task(self._flush_later(self._last_flush + self.interval - time.monotonic()))
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Sends everything pending as one frame."""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._pending:
+                return
+            text = "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+            self._last_flush = time.monotonic()
+            self.frames += 1
+            await self.sink(text)
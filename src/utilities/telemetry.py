@@ -0,0 +1,257 @@
+import functools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from loguru import logger
+from utilities.llm_config_handler import load_llm_config
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    trace = None
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+class TelemetryConfig(BaseModel):
+    """`telemetry` section of llm_config.yaml."""
+    enabled: bool = False
+    metrics_port: Optional[int] = 9464
+    metrics_host: str = "127.0.0.1"
+    otlp_endpoint: Optional[str] = None
+    service_name: str = "long-term-memory"
+
+
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name: (type, help, labels); exposed with the `ltm_` prefix.
+_METRICS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "llm_request_seconds": ("histogram", "Latency of model and embedding requests", ("operation", "outcome")),
+    "llm_time_to_first_token_seconds": ("histogram", "Time to the first chunk of streamed completions", ("operation",)),
+    "llm_tokens_total": ("counter", "Tokens reported in API usage", ("operation", "kind")),
+    "retries_total": ("counter", "Retried model requests and memory writes", ("operation",)),
+    "cache_lookups_total": ("counter", "Embedding and retrieval cache lookups", ("cache", "result")),
+    "memory_store_seconds": ("histogram", "Latency of memory store operations", ("backend", "operation", "outcome")),
+    "memory_documents_uploaded_total": ("counter", "Memory documents written to the store", ("backend",)),
+    "memory_writes_total": ("counter", "Write-behind memory writes by outcome", ("outcome",)),
+    "memory_write_lag_seconds": ("histogram", "Time from queueing a memory write until it is done", ("outcome",)),
+    "tool_seconds": ("histogram", "Tool execution time", ("tool", "outcome")),
+    "agent_turn_seconds": ("histogram", "Time to answer one user message", ("outcome",)),
+}
+
+
+class _NoopSpan:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Async context manager around one span and its latency observation."""
+
+    def __init__(self, telemetry: "Telemetry", name: str, histogram: Optional[str], labels: dict):
+        self.telemetry = telemetry
+        self.name = name
+        self.histogram = histogram
+        self.labels = labels
+
+    async def __aenter__(self):
+        self.span, self.scope = self.telemetry._start(self.name, self.labels)
+        self.start = time.perf_counter()
+        return self.span
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self.telemetry._finish(self.span, self.scope, self.histogram, self.labels, self.start, exc)
+        return False
+
+
+class Telemetry:
+    """
+    Spans (OpenTelemetry API) and Prometheus metrics for the hot paths. Until
+    `configure` enables it every hook is a flag check; spans are exported by whatever
+    tracer provider is installed, or by an OTLP exporter set up from `otlp_endpoint`.
+    Either library may be missing, which leaves that half switched off.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._tracer = None
+        self._metrics: Dict[str, object] = {}
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+    def configure(self, config: TelemetryConfig) -> None:
+        if self.enabled or not config.enabled:
+            return
+        if trace is not None:
+            self._setup_tracing(config)
+            self._tracer = trace.get_tracer("long_term_memory")
+        else:
+            logger.warning("opentelemetry-api is not installed, tracing is off")
+        if prometheus_client is not None:
+            for name, (kind, doc, labels) in _METRICS.items():
+                if kind == "histogram":
+                    self._metrics[name] = prometheus_client.Histogram(f"ltm_{name}", doc, labels, buckets=_BUCKETS)
+                else:
+                    self._metrics[name] = prometheus_client.Counter(f"ltm_{name}", doc, labels)
+            for gauge in self._gauges:
+                self._register_gauge(*gauge)
+            if config.metrics_port:
+                try:
+                    prometheus_client.start_http_server(config.metrics_port, addr=config.metrics_host)
+                    logger.info("Serving metrics on http://{}:{}/metrics", config.metrics_host, config.metrics_port)
+                except OSError:
+                    logger.exception("Could not serve metrics on port {}", config.metrics_port)
+        else:
+            logger.warning("prometheus_client is not installed, metrics are off")
+        self.enabled = True
+
+    @staticmethod
+    def _setup_tracing(config: TelemetryConfig) -> None:
+        if not config.otlp_endpoint:
+            return
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("OTLP export needs opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http")
+            return
+        provider = trace.get_tracer_provider()
+        if not isinstance(provider, TracerProvider):
+            provider = TracerProvider(resource=Resource.create({"service.name": config.service_name}))
+            trace.set_tracer_provider(provider)
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=config.otlp_endpoint)))
+        logger.info("Exporting spans to {}", config.otlp_endpoint)
+
+    def _register_gauge(self, name: str, doc: str, fn: Callable[[], float]) -> None:
+        if prometheus_client is not None:
+            prometheus_client.Gauge(f"ltm_{name}", doc).set_function(fn)
+
+    def gauge(self, name: str, doc: str, fn: Callable[[], float]) -> None:
+        """Exposes `fn()` as a gauge, read on every scrape."""
+        if self.enabled:
+            self._register_gauge(name, doc, fn)
+        else:
+            self._gauges.append((name, doc, fn))
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled or not value:
+            return
+        metric = self._metrics.get(name)
+        if metric is not None:
+            (metric.labels(**labels) if labels else metric).inc(value)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        metric = self._metrics.get(name)
+        if metric is not None:
+            (metric.labels(**labels) if labels else metric).observe(seconds)
+
+    def count_usage(self, operation: str, usage: Optional[dict]) -> None:
+        """Counts the prompt and completion tokens of an API `usage` block."""
+        for kind in ("prompt", "completion"):
+            self.count("llm_tokens_total", (usage or {}).get(f"{kind}_tokens") or 0, operation=operation, kind=kind)
+
+    def span(self, name: str, histogram: Optional[str] = None, **labels):
+        """Async context manager timing a block as a span (and into `histogram`, with `labels` and the outcome)."""
+        return _Span(self, name, histogram, labels) if self.enabled else _NOOP_SPAN
+
+    def _start(self, name: str, labels: dict):
+        if self._tracer is None:
+            return None, None
+        span = self._tracer.start_span(name, attributes={f"ltm.{key}": str(value) for key, value in labels.items()})
+        scope = trace.use_span(span, end_on_exit=False)
+        scope.__enter__()
+        return span, scope
+
+    def _finish(self, span, scope, histogram: Optional[str], labels: dict, start: float, error: Optional[BaseException] = None) -> None:
+        if histogram is not None:
+            self.observe(histogram, time.perf_counter() - start, **labels, outcome="error" if error else "ok")
+        if span is None:
+            return
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+        if scope is not None:
+            scope.__exit__(None, None, None)
+        span.end()
+
+    async def _call(self, name: str, histogram: Optional[str], labels: dict, fn, args, kwargs):
+        span, scope = self._start(name, labels)
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(span, scope, histogram, labels, start, e)
+            raise
+        if scope is not None:
+            # The span stays current only for the call; a returned stream is timed on its own.
+            scope.__exit__(None, None, None)
+        if hasattr(result, "__aiter__"):
+            return self._stream(result, span, histogram, labels, start)
+        if isinstance(result, dict) and "usage" in result:
+            self.count_usage(labels.get("operation", name), result["usage"])
+        # Handlers that log and swallow their errors report them as False.
+        self._finish(span, None, histogram, labels, start, RuntimeError(f"{name} failed") if result is False else None)
+        return result
+
+    async def _stream(self, stream, span, histogram: Optional[str], labels: dict, start: float):
+        operation = labels.get("operation", "stream")
+        first = True
+        error = None
+        try:
+            async for chunk in stream:
+                if first:
+                    first = False
+                    self.observe("llm_time_to_first_token_seconds", time.perf_counter() - start, operation=operation)
+                    if span is not None:
+                        span.add_event("first_chunk")
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    self.count_usage(operation, usage.model_dump() if hasattr(usage, "model_dump") else usage)
+                yield chunk
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(span, None, histogram, labels, start, error)
+
+    async def on_llm_request(self, request) -> None:
+        """httpx request hook: the OpenAI client numbers its retries in a header."""
+        if self.enabled and request.headers.get("x-stainless-retry-count", "0") != "0":
+            self.count("retries_total", operation="llm_request")
+
+
+TELEMETRY = Telemetry()
+
+
+def traced(name: str, histogram: Optional[str] = None, **labels):
+    """
+    Decorates a coroutine function with a span named `name` and, if given, a latency
+    observation in `histogram`. Returned streams are timed until they are exhausted.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not TELEMETRY.enabled:
+                return await fn(*args, **kwargs)
+            return await TELEMETRY._call(name, histogram, labels, fn, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def setup_telemetry(config_path: Optional[str] = None) -> Telemetry:
+    """Enables telemetry as configured in the `telemetry` section of llm_config.yaml."""
+    TELEMETRY.configure(TelemetryConfig(**(load_llm_config(config_path).get("telemetry") or {})))
+    return TELEMETRY
@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "src"), str(ROOT)]
+
+# Placeholder settings: the tool modules build their clients on import, nothing is sent.
+for _name, _value in {
+    "AZURE_OAI_KEY": "offline",
+    "AZURE_OAI_ENDPOINT": "https://offline.invalid",
+    "AZURE_OAI_API_VERSION": "2024-07-01-preview",
+    "AZURE_OAI_DEPLOYMENT_NAME": "offline",
+    "AZURE_OAI_EMBEDDING_DEPLOYMENT_NAME": "offline",
+    "OPENAI_API_KEY": "offline",
+    "TOKEN_LIMIT": "4000",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+# llm_config.yaml is looked up from the working directory.
+os.chdir(ROOT)
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from agents import agent_loop
+from agents.memory_prefetch import MemoryPrefetcher
+from utilities import chat_history
+from utilities.chat_history import ChatHistory
+
+
+class WhitespaceEncoding:
+    def encode(self, text):
+        return text.split()
+
+
+class ScriptedClient:
+    """Streams a plain-text reply echoing the latest user message."""
+
+    async def chat_completion(self, messages, **kwargs):
+        text = "re " + [msg for msg in messages if msg["role"] == "user"][-1]["content"]
+
+        async def stream():
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+
+        return stream()
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(chat_history, "get_encoder", lambda model="gpt-4o": WhitespaceEncoding())
+    memories = {
+        "where do I live": [{"id": "m1", "memory": "The user lives in Leeds", "category": "facts"}],
+        "what do I drink": [{"id": "m2", "memory": "The user drinks oat milk", "category": "preferences"}],
+    }
+
+    async def fetch(text):
+        return memories.get(text, [])
+
+    monkeypatch.setattr(agent_loop.MEMORY_PREFETCHER, "fetch", fetch)
+
+
+def prefetched(history):
+    return [msg["content"] for msg in history if MemoryPrefetcher.is_context(msg)]
+
+
+def test_prefetched_memories_replace_the_previous_turns():
+    history = ChatHistory([{"role": "system", "content": "be helpful"}])
+    client = ScriptedClient()
+
+    async def run():
+        replies = [await agent_loop.run_agent_turn(history, client, "where do I live")]
+        first = prefetched(history)
+        replies.append(await agent_loop.run_agent_turn(history, client, "what do I drink"))
+        second = prefetched(history)
+        replies.append(await agent_loop.run_agent_turn(history, client, "thanks"))
+        return replies, first, second, prefetched(history)
+
+    replies, first, second, third = asyncio.run(run())
+    assert replies == ["re where do I live", "re what do I drink", "re thanks"]
+    assert len(first) == 1 and "Leeds" in first[0]
+    assert len(second) == 1 and "oat milk" in second[0]
+    assert third == []
+    assert [msg["role"] for msg in history] == ["system", "user", "assistant"] * 1 + ["user", "assistant"] * 2
+
+
+def test_failed_prepare_cancels_the_prefetch(monkeypatch):
+    started = []
+
+    async def fetch(text):
+        started.append(text)
+        await asyncio.sleep(10)
+        return []
+
+    monkeypatch.setattr(agent_loop.MEMORY_PREFETCHER, "fetch", fetch)
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise RuntimeError("setup failed")
+
+    async def run():
+        history = ChatHistory([{"role": "system", "content": "be helpful"}])
+        with pytest.raises(RuntimeError):
+            await agent_loop.run_agent_turn(history, ScriptedClient(), "hello", prepare=failing())
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert started == ["hello"]
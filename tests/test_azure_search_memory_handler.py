@@ -0,0 +1,65 @@
+import asyncio
+from memory_handler import azure_search_memory_handler
+from memory_handler.azure_search_memory_handler import AzureSearchMemoryHandler
+from memory_handler.memory_config import HybridConfig, MemoryConfig
+from memory_handler.tenancy import use_tenant
+
+
+class _Result:
+    succeeded = True
+
+
+class RecordingSearchClient:
+    """SearchClient stand-in that records search and merge calls."""
+
+    def __init__(self, results=None):
+        self.results = results or []
+        self.searches = []
+        self.merged = []
+
+    async def search(self, **kwargs):
+        self.searches.append(kwargs)
+
+        async def iterate():
+            for result in self.results:
+                yield result
+
+        return iterate()
+
+    async def merge_or_upload_documents(self, documents):
+        self.merged.append(documents)
+        return [_Result() for _ in documents]
+
+
+def handler(client: RecordingSearchClient) -> AzureSearchMemoryHandler:
+    handler = AzureSearchMemoryHandler()
+    handler.index_name = "test"
+    handler.search_client = client
+    return handler
+
+
+def test_vector_search_escapes_category_in_filter():
+    client = RecordingSearchClient()
+    use_tenant("alice")
+    asyncio.run(handler(client).vector_search([0.0] * 4, category="x' or tenant eq 'bob"))
+    assert client.searches[0]["filter"] == "(tenant eq 'alice') and (category eq 'x'' or tenant eq ''bob')"
+
+
+def test_backfill_assigns_default_tenant_in_batches():
+    client = RecordingSearchClient([{"id": f"doc{i}"} for i in range(5)])
+    assigned = asyncio.run(handler(client).backfill_tenant(batch_size=2))
+    assert assigned == 5
+    assert client.searches[0]["filter"] == "tenant eq null"
+    assert [len(batch) for batch in client.merged] == [2, 2, 1]
+    assert {doc["tenant"] for batch in client.merged for doc in batch} == {"default"}
+
+
+def test_zero_weights_fall_back_to_a_single_ranking(monkeypatch):
+    client = RecordingSearchClient()
+    for vector_weight, lexical_weight in ((1.0, 0.0), (0.0, 1.0)):
+        config = MemoryConfig(hybrid=HybridConfig(enabled=True, vector_weight=vector_weight, lexical_weight=lexical_weight))
+        monkeypatch.setattr(azure_search_memory_handler, "load_memory_config", lambda: config)
+        asyncio.run(handler(client).vector_search([0.0] * 4, search_text="oat milk"))
+    vector_only, text_only = client.searches
+    assert vector_only["search_text"] is None and len(vector_only["vector_queries"]) == 1
+    assert text_only["search_text"] == "oat milk" and text_only["vector_queries"] is None
@@ -0,0 +1,99 @@
+import asyncio
+from memory_handler.bm25_index import BM25Index
+from memory_handler.local_memory_handler import LocalMemoryHandler
+from memory_handler.memory_config import HybridConfig, LocalMemoryConfig
+from providers.vector_db_provider import MemoryDocument
+
+
+def index():
+    bm25 = BM25Index()
+    bm25.add_many([
+        ("a", "The user drinks oat milk flat whites", "preferences"),
+        ("b", "The user's licence plate is KX21 ABC", "facts"),
+        ("c", "The user likes long walks and oat cookies", "preferences"),
+    ])
+    return bm25
+
+
+def test_rare_terms_rank_their_document_first():
+    hits = index().search("kx21", top_k=3)
+    assert [doc_id for doc_id, _ in hits] == ["b"]
+
+
+def test_category_filter_and_ranking():
+    hits = index().search("oat milk", top_k=3, category="preferences")
+    assert [doc_id for doc_id, _ in hits] == ["a", "c"]
+    assert hits[0][1] > hits[1][1]
+    assert index().search("oat", category="unknown") == []
+
+
+def test_removed_and_replaced_documents_survive_compaction():
+    bm25 = index()
+    assert bm25.remove("a")
+    bm25.add("c", "The user owns a grey cat", "preferences")
+    assert "a" not in bm25 and len(bm25) == 2
+    assert bm25.search("oat") == []
+    assert [doc_id for doc_id, _ in bm25.search("grey cat")] == ["c"]
+
+
+def test_lexical_hits_keep_their_own_scores_when_ids_are_missing(tmp_path):
+    config = LocalMemoryConfig(storage="segments", data_dir=str(tmp_path))
+    docs = [
+        MemoryDocument(id=doc_id, memory=text, category="preferences", embeddings=[1.0, 0.0], time=None)
+        for doc_id, text in (("a", "oat milk flat white"), ("c", "oat cookies"))
+    ]
+
+    async def run():
+        handler = LocalMemoryHandler("lexical", config, hybrid=HybridConfig(enabled=True))
+        await handler.create_index(dims=2)
+        await handler.add_documents(docs)
+        await handler._load_lexical()
+        # Indexed text whose document is no longer stored, ranked first.
+        handler._lexical.add("ghost", "oat milk oat milk", "preferences")
+        scores = dict(handler._lexical.search("oat milk", 5, "preferences"))
+        hits = handler._lexical_search("oat milk", 5, "preferences")
+        await handler.close()
+        return scores, hits
+
+    scores, hits = asyncio.run(run())
+    assert next(iter(scores)) == "ghost"
+    assert [(hit["id"], hit["memory"]) for hit in hits] == [("a", "oat milk flat white"), ("c", "oat cookies")]
+    assert [hit["bm25_score"] for hit in hits] == [scores["a"], scores["c"]]
+
+
+def test_index_over_segments_is_built_on_first_text_search(tmp_path, monkeypatch):
+    config = LocalMemoryConfig(storage="segments", data_dir=str(tmp_path))
+    hybrid = HybridConfig(enabled=True)
+    docs = [
+        MemoryDocument(id=doc_id, memory=text, category="facts", embeddings=[1.0, 0.0], time=None)
+        for doc_id, text in (("a", "licence plate KX21 ABC"), ("b", "lives in Leeds"))
+    ]
+
+    async def write():
+        handler = LocalMemoryHandler("lazy", config, hybrid=hybrid)
+        await handler.create_index(dims=2)
+        await handler.add_documents(docs)
+        await handler.close()
+
+    async def reopen():
+        handler = LocalMemoryHandler("lazy", config, hybrid=hybrid)
+        await handler.create_index(dims=2)
+        assert handler._lexical is None
+        # Writes made while the index is being built are replayed onto it.
+        read = handler._read_lexical
+
+        def read_during_writes():
+            index = read()
+            handler._index_lexical([("a", None, "facts"), ("c", "parks a KX21 van", "facts")])
+            return index
+
+        monkeypatch.setattr(handler, "_read_lexical", read_during_writes)
+        hits = await handler.vector_search([0.0, 1.0], top_k=2, search_text="kx21")
+        indexed = sorted(doc_id for doc_id, _ in handler._lexical.search("kx21 leeds", 5))
+        await handler.close()
+        return hits, indexed
+
+    asyncio.run(write())
+    hits, indexed = asyncio.run(reopen())
+    assert indexed == ["b", "c"]
+    assert {hit["id"] for hit in hits} == {"a", "b"}
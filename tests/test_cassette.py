@@ -0,0 +1,51 @@
+import asyncio
+import datetime
+import json
+from uuid import uuid1
+import httpx
+from llm_handler.cassette import Cassette, CassetteConfig, CassetteTransport
+
+BASE_URL = "https://offline.invalid/openai/deployments/gpt-4o"
+
+
+def upstream_transport():
+    """Upstream model stand-in; it answers with the number of the request it got."""
+    served = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        served.append(request.url.path)
+        if request.url.path.endswith("/embeddings"):
+            return httpx.Response(200, json={"data": [{"index": 0, "embedding": [0.1, 0.2]}]})
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"reply {len(served)}"}}]})
+
+    return httpx.MockTransport(handle), served
+
+
+async def add_memory_run(transport: httpx.AsyncBaseTransport) -> list:
+    """Stores a memory the way add_memory does, then sends a turn that echoes it back."""
+    doc_id = str(uuid1()).split("-")[0]
+    found = [{"id": doc_id, "memory": "likes tea", "category": "preferences", "time": datetime.datetime.now().isoformat()}]
+    messages = [
+        {"role": "system", "content": f"Memories:\n- [preferences] likes tea (id: {doc_id})"},
+        {"role": "user", "content": "what do I drink?"},
+        {"role": "assistant", "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": "search_memory", "arguments": "{}"}}]},
+        {"role": "tool", "tool_call_id": "call_1", "content": json.dumps(found)},
+    ]
+    async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as client:
+        replies = [(await client.post("/embeddings", json={"input": ["likes tea"], "model": "embed"})).json()]
+        replies.append((await client.post("/chat/completions", json={"messages": messages, "model": "gpt-4o"})).json())
+    return replies
+
+
+def test_replay_matches_a_run_that_stores_memories_under_new_ids(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    upstream, served = upstream_transport()
+    recorder = Cassette(CassetteConfig(mode="record", path=path))
+    recorded = asyncio.run(add_memory_run(CassetteTransport(recorder, upstream)))
+    recorder.close()
+
+    player = Cassette(CassetteConfig(mode="replay", path=path, speed=0))
+    replayed = asyncio.run(add_memory_run(CassetteTransport(player, upstream)))
+    assert replayed == recorded
+    assert player.misses == 0
+    assert len(served) == 2
@@ -0,0 +1,107 @@
+import pytest
+from utilities import chat_history
+from utilities.chat_history import ChatHistory
+
+
+class WhitespaceEncoding:
+    """Offline stand-in for a tiktoken encoding: one token per word."""
+
+    def encode(self, text):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def offline_encoder(monkeypatch):
+    monkeypatch.setattr(chat_history, "get_encoder", lambda model="gpt-4o": WhitespaceEncoding())
+
+
+def turn(text):
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": f"re {text}"}]
+
+
+def session():
+    history = ChatHistory([{"role": "system", "content": "be helpful"}])
+    history.extend(turn("first"))
+    return history
+
+
+def test_ledger_counts_tokens_per_role():
+    history = session()
+    history.append({"role": "user", "content": "two words"})
+    assert history.role_tokens == {"system": 0, "user": 3, "assistant": 2}
+    del history[1:3]
+    assert history.tokens == 2
+
+
+def test_commit_out_of_order_keeps_watermark_before_failed_batch():
+    history = session()
+    a = history.claim()
+    history.extend(turn("second"))
+    b = history.claim()
+    b.commit(["second"])
+    a.release()
+    # A's messages are not stored, so nothing past them may be compacted away.
+    assert history.state.watermark == 0
+    retry = history.claim()
+    assert [msg["content"] for msg in retry.messages] == ["first", "re first"]
+    retry.commit(["first"])
+    assert history.state.watermark == history.state.next_seq
+    assert history.pending_tokens == 0
+
+
+def test_release_does_not_hand_back_other_in_flight_batches():
+    history = session()
+    a = history.claim()
+    history.extend(turn("second"))
+    b = history.claim()
+    a.release()
+    again = history.claim()
+    assert [msg["content"] for msg in again.messages] == ["first", "re first"]
+    assert history.pending_tokens == 0
+    b.commit()
+    again.commit()
+    assert history.claim().messages == []
+
+
+def test_pending_tokens_skip_claimed_messages():
+    history = session()
+    batch = history.claim()
+    history.extend(turn("second"))
+    assert history.pending_tokens == 3
+    batch.release()
+    assert history.pending_tokens == 6
+
+
+def test_copy_shares_consolidation_state():
+    history = session()
+    history.copy().claim().commit(["first"])
+    assert history.state.memories == ["first"]
+    assert history.pending_tokens == 0
+
+
+def recount(history):
+    return sum(
+        chat_history.count_message_tokens(msg)
+        for i, msg in enumerate(history)
+        if not history.state.covered(history.seq(i))
+    )
+
+
+def test_pending_total_follows_claims_and_removals():
+    history = session()
+    snapshot = history.copy()
+    history.extend(turn("second"))
+    batch = snapshot.claim()
+    assert (history.pending_tokens, snapshot.pending_tokens) == (recount(history), recount(snapshot)) == (3, 0)
+    history.pop(1)
+    del history[-1]
+    history.insert(1, {"role": "user", "content": "inserted here"})
+    history[-1] = {"role": "user", "content": "one two three four"}
+    assert history.pending_tokens == recount(history) == 6
+    batch.release()
+    assert history.pending_tokens == recount(history) == 8
+    assert snapshot.pending_tokens == recount(snapshot) == 3
+    history.claim().commit()
+    assert history.pending_tokens == snapshot.pending_tokens == 0
+    history.clear()
+    assert history.pending_tokens == 0
@@ -0,0 +1,65 @@
+import pytest
+from agents import context_compaction
+from agents.context_compaction import SUMMARY_HEADER, ContextCompactor
+from utilities import chat_history
+from utilities.chat_history import ChatHistory
+
+
+class WhitespaceEncoding:
+    def encode(self, text):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def offline_encoder(monkeypatch):
+    encoder = lambda model="gpt-4o": WhitespaceEncoding()
+    monkeypatch.setattr(chat_history, "get_encoder", encoder)
+    monkeypatch.setattr(context_compaction, "get_encoder", encoder)
+
+
+def turns(*names):
+    return [msg for name in names for msg in ({"role": "user", "content": name}, {"role": "assistant", "content": f"re {name}"})]
+
+
+def contents(history):
+    return [msg["content"].splitlines()[0] if msg["role"] == "system" else msg["content"] for msg in history]
+
+
+def test_only_stored_turns_beyond_the_kept_ones_are_dropped():
+    history = ChatHistory([{"role": "system", "content": "be helpful"}, *turns("t1", "t2", "t3")])
+    history.claim().commit(["likes tea", "lives in Leeds"])
+    history.extend(turns("t4", "t5", "t6"))
+
+    compactor = ContextCompactor(enabled=True, keep_turns=2, summary_tokens=100)
+    # t4 is past the watermark, so compaction stops before it even though only t5-t6 are kept.
+    assert compactor.compact(history) == 6
+    assert contents(history) == ["be helpful", SUMMARY_HEADER, "t4", "re t4", "t5", "re t5", "t6", "re t6"]
+    assert history[1]["content"].splitlines()[1:] == ["- likes tea", "- lives in Leeds"]
+    assert history.pending_tokens == chat_history.count_message_tokens(history[1]) + sum(
+        chat_history.count_message_tokens(msg) for msg in history[2:]
+    )
+
+
+def test_summary_is_replaced_and_capped():
+    history = ChatHistory([{"role": "system", "content": "be helpful"}, *turns("t1", "t2")])
+    history.claim().commit(["old memory"])
+    history.extend(turns("t3"))
+    compactor = ContextCompactor(enabled=True, keep_turns=1, summary_tokens=20)
+    compactor.compact(history)
+    history.claim().commit(["new memory number one", "new memory number two"])
+    history.extend(turns("t4"))
+
+    assert compactor.compact(history) == 2
+    summaries = [msg for msg in history if msg["content"].startswith(SUMMARY_HEADER)]
+    assert len(summaries) == 1 and history[1] is summaries[0]
+    # Only the newest memories fit under the cap; the rest stay in the memory store.
+    assert summaries[0]["content"].splitlines()[1:] == ["- new memory number two"]
+    assert history.state.memories == ["new memory number two"]
+    assert contents(history)[2:] == ["t4", "re t4"]
+
+
+def test_disabled_compactor_leaves_history_alone():
+    history = ChatHistory([{"role": "system", "content": "be helpful"}, *turns("t1", "t2", "t3")])
+    history.claim().commit()
+    assert ContextCompactor(enabled=False, keep_turns=1).compact(history) == 0
+    assert len(history) == 7
@@ -0,0 +1,67 @@
+import asyncio
+from llm_handler.embedding_batcher import EmbeddingBatchConfig, EmbeddingBatcher
+
+
+class RecordingEmbedder:
+    """Embeds a text as [len(text)] and records every upstream batch."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_requests_share_one_deduplicated_call():
+    embedder = RecordingEmbedder()
+
+    async def run():
+        batcher = EmbeddingBatcher(embedder, EmbeddingBatchConfig(max_wait_ms=20))
+        results = await asyncio.gather(batcher.embed(["a", "bb"]), batcher.embed(["bb", "ccc"]))
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert embedder.batches == [["a", "bb", "ccc"]]
+    assert results == [[[1.0], [2.0]], [[2.0], [3.0]]]
+    assert (batcher.requests, batcher.batches) == (2, 1)
+
+
+def test_full_batch_is_sent_without_waiting():
+    embedder = RecordingEmbedder()
+
+    async def run():
+        batcher = EmbeddingBatcher(embedder, EmbeddingBatchConfig(max_wait_ms=10000, max_batch_size=2))
+        return await asyncio.wait_for(batcher.embed(["a", "b", "c", "d"]), timeout=1.0)
+
+    assert asyncio.run(run()) == [[1.0]] * 4
+    assert embedder.batches == [["a", "b"], ["c", "d"]]
+
+
+def test_token_limit_starts_a_new_batch():
+    embedder = RecordingEmbedder()
+    # Every text is estimated at 3 tokens, so two of them exceed the limit of 5.
+    config = EmbeddingBatchConfig(max_wait_ms=5, max_batch_tokens=5)
+
+    async def run():
+        batcher = EmbeddingBatcher(embedder, config)
+        return await batcher.embed(["aaaaaaaa", "bbbbbbbb"])
+
+    assert asyncio.run(run()) == [[8.0], [8.0]]
+    assert embedder.batches == [["aaaaaaaa"], ["bbbbbbbb"]]
+
+
+def test_upstream_error_reaches_every_waiting_caller():
+    embedder = RecordingEmbedder(fail=True)
+
+    async def run():
+        batcher = EmbeddingBatcher(embedder, EmbeddingBatchConfig(max_wait_ms=5))
+        return await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(embedder.batches) == 1
+    assert [str(result) for result in results] == ["upstream down", "upstream down"]
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from llm_handler.embedding_cache import EmbeddingCache, EmbeddingCacheConfig
+
+
+def cache(tmp_path, **kwargs):
+    return EmbeddingCache(EmbeddingCacheConfig(enabled=True, path=str(tmp_path / "cache.sqlite"), **kwargs))
+
+
+def test_sqlite_runs_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+    load, store = EmbeddingCache._load, EmbeddingCache._store
+
+    def recorded(method):
+        def wrapper(self, *args):
+            threads.append(threading.current_thread())
+            return method(self, *args)
+        return wrapper
+
+    monkeypatch.setattr(EmbeddingCache, "_load", recorded(load))
+    monkeypatch.setattr(EmbeddingCache, "_store", recorded(store))
+    first = cache(tmp_path)
+
+    async def run():
+        await first.aput_many("model", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+        # Both texts are in the LRU, so this lookup never touches SQLite.
+        cached = await first.aget_many("model", ["a", "b"])
+        # A fresh cache has to read them back from disk.
+        from_disk = await cache(tmp_path).aget_many("model", ["b", "c"])
+        return cached, from_disk
+
+    cached, from_disk = asyncio.run(run())
+    assert cached == [[1.0, 0.0], [0.0, 1.0]]
+    assert from_disk == [[0.0, 1.0], None]
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_stats_split_memory_and_disk_hits(tmp_path):
+    cache(tmp_path).put_many("model", ["a"], [[1.0]])
+    reopened = cache(tmp_path)
+    assert asyncio.run(reopened.aget_many("model", ["a", "a", "z"])) == [[1.0], [1.0], None]
+    assert reopened.get_many("model", ["a"]) == [[1.0]]
+    stats = reopened.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (3, 1, 1)
+    assert stats["memory_entries"] == 1 and stats["disk_entries"] == 1
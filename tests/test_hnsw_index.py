@@ -0,0 +1,112 @@
+import asyncio
+import numpy as np
+from memory_handler.hnsw_index import HNSWIndex
+from memory_handler.local_memory_handler import LocalMemoryHandler, normalise
+from memory_handler.memory_config import HnswConfig, HybridConfig, LocalMemoryConfig
+from memory_handler.quantization import recall_at_k
+from providers.vector_db_provider import MemoryDocument
+
+DIMS = 32
+
+
+def vectors(n, seed=0):
+    return normalise(np.random.default_rng(seed).standard_normal((n, DIMS)))
+
+
+def exact_top_k(data, queries, k):
+    return [list(np.argsort(-(data @ query))[:k].astype(str)) for query in queries]
+
+
+def graph(data, **kwargs):
+    index = HNSWIndex(DIMS, m=8, ef_construction=100, ef_search=100, capacity=len(data), **kwargs)
+    index.add_items(data, [str(i) for i in range(len(data))])
+    return index
+
+
+def test_recall_against_exact_search():
+    data, queries = vectors(1000), vectors(50, seed=1)
+    index = graph(data)
+    found = [index.search(query, k=10)[0] for query in queries]
+    assert recall_at_k(found, exact_top_k(data, queries, 10)) >= 0.9
+
+
+def test_deleted_labels_are_not_returned():
+    data = vectors(200)
+    index = graph(data)
+    assert index.mark_deleted("0")
+    labels, _ = index.search(data[0], k=5)
+    assert "0" not in labels
+    assert len(index) == 199 and index.deleted_count == 1
+
+
+def test_save_load_round_trip(tmp_path):
+    data, queries = vectors(300), vectors(10, seed=1)
+    index = graph(data)
+    index.mark_deleted("7")
+    path = str(tmp_path / "graph.npz")
+    index.save(path)
+    loaded = HNSWIndex.load(path)
+    assert sorted(loaded.labels()) == sorted(index.labels())
+    for query in queries:
+        assert loaded.search(query, k=5) == index.search(query, k=5)
+
+
+def documents(data, category="facts"):
+    return [
+        MemoryDocument(id=f"doc{i}", memory=f"memory {i}", category=category, embeddings=vector.tolist(), time=None)
+        for i, vector in enumerate(data)
+    ]
+
+
+def config(tmp_path, min_rows=50):
+    return LocalMemoryConfig(
+        index="hnsw",
+        storage="segments",
+        data_dir=str(tmp_path),
+        hnsw=HnswConfig(m=8, ef_construction=100, ef_search=100, min_rows=min_rows),
+    )
+
+
+def test_graph_is_built_off_the_loop_and_persisted(tmp_path):
+    data, queries = vectors(200), vectors(10, seed=1)
+
+    async def run():
+        handler = LocalMemoryHandler("graphs", config(tmp_path), hybrid=HybridConfig())
+        await handler.create_index(dims=DIMS)
+        await handler.add_documents(documents(data))
+        # The graph is not ready yet: the first search scans flat and starts building it.
+        flat = await handler.batch_vector_search(queries, top_k=5)
+        assert handler._graph_tasks
+        await handler.build_graphs()
+        assert "facts" in handler._graphs
+        approximate = await handler.batch_vector_search(queries, top_k=5)
+        await handler.close()
+        return flat, approximate
+
+    flat, approximate = asyncio.run(run())
+    assert (tmp_path / "graphs").is_dir()
+    ids = lambda results: [[doc["id"] for doc in docs] for docs in results]
+    assert recall_at_k(ids(approximate), ids(flat)) >= 0.9
+
+    async def reopen():
+        handler = LocalMemoryHandler("graphs", config(tmp_path), hybrid=HybridConfig())
+        await handler.create_index(dims=DIMS)
+        await handler.build_graphs()
+        graph = handler._graphs["facts"]
+        await handler.close()
+        return graph
+
+    assert len(asyncio.run(reopen())) == len(data)
+
+
+def test_small_categories_are_scanned_flat(tmp_path):
+    async def run():
+        handler = LocalMemoryHandler("flat", config(tmp_path, min_rows=1000), hybrid=HybridConfig())
+        await handler.create_index(dims=DIMS)
+        await handler.add_documents(documents(vectors(20)))
+        await handler.batch_vector_search(vectors(1, seed=1), top_k=5)
+        tasks = dict(handler._graph_tasks)
+        await handler.close()
+        return tasks
+
+    assert asyncio.run(run()) == {}
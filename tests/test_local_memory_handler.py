@@ -0,0 +1,27 @@
+import asyncio
+from memory_handler.local_memory_handler import LocalMemoryHandler, UNCATEGORISED
+from memory_handler.memory_config import HybridConfig, LocalMemoryConfig
+from providers.vector_db_provider import MemoryDocument
+
+
+def doc(doc_id, category, vector):
+    return MemoryDocument(id=doc_id, memory=doc_id, category=category, embeddings=vector, time=None)
+
+
+def test_moving_an_uncategorised_document_compacts_and_versions_its_partition():
+    async def run():
+        handler = LocalMemoryHandler("move", LocalMemoryConfig(compaction_ratio=0.5), hybrid=HybridConfig())
+        await handler.create_index(dims=2)
+        await handler.add_documents([doc("a", None, [1.0, 0.0]), doc("b", None, [0.0, 1.0])])
+        version = handler._versions[UNCATEGORISED]
+        await handler.add_documents([doc("a", "facts", [1.0, 0.0])])
+        partition = handler._partitions[UNCATEGORISED]
+        found = await handler.batch_vector_search([[1.0, 0.0]], top_k=2, category=UNCATEGORISED)
+        state = (handler._versions[UNCATEGORISED] - version, partition.size, partition.tombstones)
+        await handler.close()
+        return state, found
+
+    (bumped, size, tombstones), found = asyncio.run(run())
+    # The move tombstoned half the partition, which the 0.5 ratio compacts right away.
+    assert (bumped, size, tombstones) == (1, 1, 0)
+    assert [hit["id"] for hit in found[0]] == ["b"]
@@ -0,0 +1,32 @@
+import asyncio
+from memory_handler.memory_config import DedupConfig
+from memory_handler.memory_dedup import deduplicate_documents
+from providers.vector_db_provider import MemoryDocument
+
+
+class RecordingHandler:
+    """Answers every search with one stored memory identical to the query."""
+
+    def __init__(self):
+        self.categories = []
+
+    async def batch_vector_search(self, queries, top_k=5, category=None):
+        self.categories.append(category)
+        return [[{"id": "stored", "score": 1.0}] for _ in queries]
+
+
+def doc(doc_id, vector, category):
+    return MemoryDocument(id=doc_id, memory=doc_id, category=category, embeddings=vector, time=None)
+
+
+def test_uncategorised_segments_are_not_matched_across_categories():
+    handler = RecordingHandler()
+    docs = [
+        doc("a", [1.0, 0.0], None),
+        doc("b", [1.0, 0.0], None),
+        doc("c", [0.0, 1.0], "facts"),
+    ]
+    kept = asyncio.run(deduplicate_documents(handler, docs, DedupConfig()))
+    assert handler.categories == ["facts"]
+    # "b" repeats "a" within the batch; "c" is merged into the stored memory of its category.
+    assert [d.id for d in kept] == ["a", "stored"]
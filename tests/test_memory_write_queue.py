@@ -0,0 +1,80 @@
+import asyncio
+from memory_handler import memory_write_queue
+from memory_handler.memory_config import WriteBehindConfig
+from memory_handler.memory_write_queue import MemoryWriteQueue
+
+
+class RecordingTelemetry:
+    """Stands in for the TELEMETRY singleton, recording counters and observations."""
+
+    def __init__(self):
+        self.counts = []
+        self.observed = []
+
+    def gauge(self, name, doc, fn):
+        pass
+
+    def count(self, name, value=1, **labels):
+        self.counts.append((name, labels.get("outcome") or labels.get("operation")))
+
+    def observe(self, name, seconds, **labels):
+        self.observed.append((name, labels["outcome"]))
+
+
+def test_flush_retry_and_failure_reach_metrics_and_telemetry(monkeypatch):
+    telemetry = RecordingTelemetry()
+    monkeypatch.setattr(memory_write_queue, "TELEMETRY", telemetry)
+    attempts = {}
+
+    async def process(payload):
+        attempts[payload] = attempts.get(payload, 0) + 1
+        if payload == "flaky":
+            return attempts[payload] > 1
+        if payload == "broken":
+            raise RuntimeError("store down")
+        return True
+
+    config = WriteBehindConfig(enabled=True, workers=2, max_retries=2, retry_backoff=0.0)
+    queue = MemoryWriteQueue(process, config)
+
+    async def run():
+        for payload in ("ok", "flaky", "broken"):
+            assert await queue.enqueue(payload)
+        await queue.drain()
+
+    asyncio.run(run())
+    assert attempts == {"ok": 1, "flaky": 2, "broken": 3}
+    metrics = queue.metrics()
+    assert (metrics["processed"], metrics["failed"], metrics["retried"], metrics["depth"]) == (2, 1, 3, 0)
+    assert metrics["max_lag_seconds"] >= metrics["last_lag_seconds"] > 0
+    assert sorted(outcome for name, outcome in telemetry.counts if name == "memory_writes_total") == ["failed", "stored", "stored"]
+    assert telemetry.counts.count(("retries_total", "memory_write")) == 3
+    assert sorted(telemetry.observed) == [("memory_write_lag_seconds", "failed"), ("memory_write_lag_seconds", "stored"), ("memory_write_lag_seconds", "stored")]
+
+
+def test_full_queue_rejects_and_counts(monkeypatch):
+    telemetry = RecordingTelemetry()
+    monkeypatch.setattr(memory_write_queue, "TELEMETRY", telemetry)
+    release = None
+
+    async def process(payload):
+        await release.wait()
+        return True
+
+    config = WriteBehindConfig(enabled=True, workers=1, max_queue=1, enqueue_timeout=0.01)
+    queue = MemoryWriteQueue(process, config)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        assert await queue.enqueue("first")
+        await asyncio.sleep(0)  # the worker takes the first job
+        assert await queue.enqueue("second")
+        accepted = await queue.enqueue("third")
+        release.set()
+        await queue.drain()
+        return accepted
+
+    assert asyncio.run(run()) is False
+    assert queue.metrics()["rejected"] == 1 and queue.metrics()["processed"] == 2
+    assert ("memory_writes_total", "rejected") in telemetry.counts
@@ -0,0 +1,45 @@
+import contextvars
+from memory_handler.memory_config import RetrievalCacheConfig
+from memory_handler.retrieval_cache import RetrievalCache, invalidate_retrieval_caches
+from memory_handler.tenancy import use_tenant
+
+
+def as_tenant(tenant, fn, *args):
+    def run():
+        use_tenant(tenant)
+        return fn(*args)
+    return contextvars.copy_context().run(run)
+
+
+def test_writes_drop_their_category_and_unfiltered_searches_of_their_tenant():
+    cache = RetrievalCache(RetrievalCacheConfig(enabled=True))
+    for category in ("facts", "preferences", None):
+        as_tenant("alice", cache.put, category, "Where do I live", [{"id": category}])
+    as_tenant("bob", cache.put, "facts", "where do I live", [{"id": "bob"}])
+
+    invalidate_retrieval_caches(["facts"], tenant="alice")
+
+    assert as_tenant("alice", cache.get, "facts", "where do I live") is None
+    assert as_tenant("alice", cache.get, None, "where do I live") is None
+    # Query text is matched case and whitespace insensitively.
+    assert as_tenant("alice", cache.get, "preferences", "  where DO i live ") == [{"id": "preferences"}]
+    assert as_tenant("bob", cache.get, "facts", "where do I live") == [{"id": "bob"}]
+    assert cache.stats()["invalidations"] == 2
+
+    invalidate_retrieval_caches()
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_expire_and_are_evicted_least_recently_used():
+    cache = RetrievalCache(RetrievalCacheConfig(enabled=True, max_entries=2))
+    cache.put("facts", "a", [1])
+    cache.put("facts", "b", [2])
+    assert cache.get("facts", "a") == [1]
+    cache.put("facts", "c", [3])
+    assert cache.get("facts", "b") is None
+    assert cache.get("facts", "a") == [1]
+
+    expired = RetrievalCache(RetrievalCacheConfig(enabled=True, ttl_seconds=-1))
+    expired.put("facts", "a", [1])
+    assert expired.get("facts", "a") is None
+    assert expired.stats()["entries"] == 0
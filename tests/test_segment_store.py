@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import numpy as np
+from memory_handler.local_memory_handler import LocalMemoryHandler, normalise
+from memory_handler.memory_config import HybridConfig, LocalMemoryConfig
+from memory_handler.segment_store import Segment, SegmentStore
+from providers.vector_db_provider import MemoryDocument
+
+DIMS = 8
+
+
+def documents(n, start=0, category="facts"):
+    return [MemoryDocument(id=f"doc{i}", memory=f"memory {i}", category=category, embeddings=None, time=None) for i in range(start, start + n)]
+
+
+def store(path, segment_rows=4):
+    store = SegmentStore(str(path), segment_rows=segment_rows)
+    if store.dims is None:
+        store.set_dims(DIMS)
+    return store
+
+
+def test_round_trip_across_reopen(tmp_path):
+    vectors = normalise(np.random.default_rng(0).standard_normal((10, DIMS)))
+    first = store(tmp_path)
+    first.append(documents(10), vectors, ["facts"] * 10)
+    first.delete(["doc3"])
+    first.close()
+
+    reopened = store(tmp_path)
+    assert reopened.dims == DIMS
+    assert sorted(doc["id"] for doc in reopened.documents()) == sorted(f"doc{i}" for i in range(10) if i != 3)
+    ids, found = reopened.vectors(["doc0", "doc9", "doc3"])
+    assert ids == ["doc0", "doc9"]
+    np.testing.assert_array_equal(found, vectors[[0, 9]])
+    reopened.close()
+
+
+def test_compaction_keeps_live_rows_searchable(tmp_path):
+    vectors = normalise(np.random.default_rng(0).standard_normal((10, DIMS)))
+    segments = store(tmp_path)
+    segments.append(documents(10), vectors, ["facts"] * 10)
+    assert segments.delete(["doc1", "doc5"]) == {"facts"}
+    segments.compact(ratio=0.0)
+
+    units = segments.segments("facts")
+    assert sum(unit.live for unit in units) == 8
+    best = {}
+    for unit in units:
+        scores = unit.scores(vectors[[0]])[0]
+        for row in np.flatnonzero(np.isfinite(scores)):
+            best[unit.document(int(row))["id"]] = scores[row]
+    assert set(best) == {f"doc{i}" for i in range(10) if i not in (1, 5)}
+    assert np.isclose(best["doc0"], 1.0)
+    segments.close()
+
+
+def test_append_replaces_existing_ids(tmp_path):
+    segments = store(tmp_path)
+    segments.append(documents(2), np.eye(DIMS, dtype=np.float32)[:2], ["facts"] * 2)
+    replaced = segments.append(documents(1, category="other"), np.eye(DIMS, dtype=np.float32)[[5]], ["other"])
+    assert replaced == {"facts"}
+    assert [doc["category"] for doc in segments.documents(["doc0"])] == ["other"]
+    assert segments.ids("facts") == ["doc1"]
+    segments.close()
+
+
+def test_search_during_compaction_sees_every_live_row(tmp_path, monkeypatch):
+    vectors = normalise(np.random.default_rng(0).standard_normal((12, DIMS)))
+    docs = [doc.model_copy(update={"embeddings": vector.tolist()}) for doc, vector in zip(documents(12), vectors)]
+    config = LocalMemoryConfig(storage="segments", data_dir=str(tmp_path), segment_rows=4)
+    compaction = []
+    scores = Segment.scores
+
+    def scores_racing_compaction(segment, queries):
+        # The first segment scored starts a compaction and gives it time to swap segments out.
+        if not compaction:
+            compaction.append(threading.Thread(target=segment.store.compact, args=(0.0,)))
+            compaction[0].start()
+            time.sleep(0.2)
+        return scores(segment, queries)
+
+    async def run():
+        handler = LocalMemoryHandler("race", config, hybrid=HybridConfig())
+        await handler.create_index(dims=DIMS)
+        await handler.add_documents(docs)
+        await handler.delete_document(["doc0"])
+        monkeypatch.setattr(Segment, "scores", scores_racing_compaction)
+        found = await handler.batch_vector_search(vectors[1:2], top_k=11)
+        compaction[0].join()
+        after = await handler.batch_vector_search(vectors[1:2], top_k=11)
+        await handler.close()
+        return found, after
+
+    found, after = asyncio.run(run())
+    assert sorted(doc["id"] for doc in found[0]) == sorted(f"doc{i}" for i in range(1, 12))
+    assert [doc["id"] for doc in after[0]] == [doc["id"] for doc in found[0]]
@@ -0,0 +1,59 @@
+import asyncio
+from utilities.stream_buffer import StreamBuffer
+
+
+class RecordingSink:
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, text):
+        self.frames.append(text)
+
+
+def test_first_token_is_sent_at_once_and_the_rest_coalesced():
+    sink = RecordingSink()
+
+    async def run():
+        buffer = StreamBuffer(sink, flush_ms=30, flush_chars=1000)
+        await buffer.write("Hel")
+        first = list(sink.frames)
+        for token in ("lo", ", ", "wor", "ld"):
+            await buffer.write(token)
+        pending = list(sink.frames)
+        # Deltas stop arriving: the timer still sends them once the interval is up.
+        await asyncio.sleep(0.06)
+        return buffer, first, pending
+
+    buffer, first, pending = asyncio.run(run())
+    assert first == pending == ["Hel"]
+    assert sink.frames == ["Hel", "lo, world"]
+    assert (buffer.tokens, buffer.frames) == (5, 2)
+
+
+def test_character_threshold_and_final_flush():
+    sink = RecordingSink()
+
+    async def run():
+        buffer = StreamBuffer(sink, flush_ms=10000, flush_chars=4)
+        for token in ("a", "bb", "cc", "d"):
+            await buffer.write(token)
+        # "bb" + "cc" reach 4 characters; "d" waits for the end of the stream.
+        before = list(sink.frames)
+        await buffer.flush()
+        await buffer.flush()
+        return before
+
+    assert asyncio.run(run()) == ["a", "bbcc"]
+    assert sink.frames == ["a", "bbcc", "d"]
+
+
+def test_zero_interval_forwards_every_delta():
+    sink = RecordingSink()
+
+    async def run():
+        buffer = StreamBuffer(sink, flush_ms=0)
+        for token in ("a", "b", "c"):
+            await buffer.write(token)
+
+    asyncio.run(run())
+    assert sink.frames == ["a", "b", "c"]
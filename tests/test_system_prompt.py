@@ -0,0 +1,11 @@
+import pytest
+from agents.tools.search_memory import search_memory_tool_definition
+from prompts.system_prompt import build_system_message
+
+
+@pytest.mark.parametrize("mode", ["tool", "host", "hybrid"])
+def test_prompt_describes_the_search_memory_schema(mode):
+    prompt = build_system_message(mode)
+    query = search_memory_tool_definition["parameters"]["properties"]["queries"]["items"]["properties"]
+    for name in ["queries", *query]:
+        assert f"`{name}`" in prompt
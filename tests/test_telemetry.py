@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from utilities import telemetry
+from utilities.telemetry import Telemetry, traced
+
+
+class RecordingMetric:
+    """Stands in for a prometheus_client metric, recording (labels, value) pairs."""
+
+    def __init__(self):
+        self.values = []
+        self._labels = {}
+
+    def labels(self, **labels):
+        child = RecordingMetric()
+        child.values = self.values
+        child._labels = labels
+        return child
+
+    def inc(self, value=1):
+        self.values.append((self._labels, value))
+
+    def observe(self, value):
+        self.values.append((self._labels, value))
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    """An enabled Telemetry without tracing whose metrics are recorded."""
+    instance = Telemetry()
+    instance.enabled = True
+    instance._metrics = {name: RecordingMetric() for name in telemetry._METRICS}
+    monkeypatch.setattr(telemetry, "TELEMETRY", instance)
+    return instance
+
+
+def outcomes(instance, name):
+    return [labels["outcome"] for labels, _ in instance._metrics[name].values]
+
+
+def test_traced_calls_record_their_outcome(recording):
+    @traced("store.add", "memory_store_seconds", backend="local", operation="add")
+    async def add(result):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def run():
+        assert await add(True) is True
+        assert await add(False) is False
+        with pytest.raises(ValueError):
+            await add(ValueError("boom"))
+
+    asyncio.run(run())
+    assert outcomes(recording, "memory_store_seconds") == ["ok", "error", "error"]
+    assert all(labels["backend"] == "local" for labels, _ in recording._metrics["memory_store_seconds"].values)
+
+
+def test_streams_are_timed_until_exhausted(recording):
+    class Chunk:
+        def __init__(self, usage=None):
+            self.usage = usage
+
+    @traced("llm.chat", "llm_request_seconds", operation="chat")
+    async def chat():
+        async def stream():
+            yield Chunk()
+            yield Chunk({"prompt_tokens": 7, "completion_tokens": 3})
+        return stream()
+
+    async def run():
+        stream = await chat()
+        assert recording._metrics["llm_request_seconds"].values == []
+        return [chunk async for chunk in stream]
+
+    assert len(asyncio.run(run())) == 2
+    assert outcomes(recording, "llm_request_seconds") == ["ok"]
+    assert len(recording._metrics["llm_time_to_first_token_seconds"].values) == 1
+    assert [(labels["kind"], value) for labels, value in recording._metrics["llm_tokens_total"].values] == [("prompt", 7), ("completion", 3)]
+
+
+def test_disabled_telemetry_records_nothing(monkeypatch):
+    instance = Telemetry()
+    instance._metrics = {"retries_total": RecordingMetric()}
+    monkeypatch.setattr(telemetry, "TELEMETRY", instance)
+
+    @traced("noop", "tool_seconds")
+    async def noop():
+        return 1
+
+    instance.count("retries_total", operation="llm_request")
+    assert asyncio.run(noop()) == 1
+    assert instance._metrics["retries_total"].values == []
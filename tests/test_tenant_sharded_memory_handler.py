@@ -0,0 +1,59 @@
+import asyncio
+from memory_handler.local_memory_handler import LocalMemoryHandler
+from memory_handler.memory_config import LocalMemoryConfig
+from memory_handler.tenancy import use_tenant
+from memory_handler.tenant_sharded_memory_handler import TenantShardedMemoryHandler
+from providers.vector_db_provider import MemoryDocument
+
+
+def doc(tenant):
+    return MemoryDocument(id=f"{tenant}-1", memory=f"memory of {tenant}", category="facts", embeddings=[1.0, 0.0], time=None)
+
+
+async def as_tenant(tenant, fn):
+    use_tenant(tenant)
+    return await fn()
+
+
+def test_pinned_shard_survives_eviction_while_idle_ones_are_closed(tmp_path, monkeypatch):
+    # One 2-dim vector takes 8 bytes: two shards fit the budget, a third does not.
+    config = LocalMemoryConfig(storage="segments", data_dir=str(tmp_path), shard_budget_mb=20 / 2**20)
+    closed = []
+    close = LocalMemoryHandler.close
+    search = LocalMemoryHandler.batch_vector_search
+
+    async def recording_close(shard):
+        closed.append(shard.tenant)
+        await close(shard)
+
+    async def run():
+        gate, searching = asyncio.Event(), asyncio.Event()
+
+        async def gated_search(shard, *args, **kwargs):
+            if shard.tenant == "alice":
+                searching.set()
+                await gate.wait()
+            return await search(shard, *args, **kwargs)
+
+        monkeypatch.setattr(LocalMemoryHandler, "close", recording_close)
+        monkeypatch.setattr(LocalMemoryHandler, "batch_vector_search", gated_search)
+        handler = TenantShardedMemoryHandler("shards", config, dims=2)
+        await as_tenant("alice", lambda: handler.add_documents([doc("alice")]))
+        # Alice's search holds her shard, which is the least recently used one.
+        alice = asyncio.create_task(as_tenant("alice", lambda: handler.batch_vector_search([[1.0, 0.0]], top_k=1)))
+        await searching.wait()
+        for tenant in ("bob", "carol"):
+            await as_tenant(tenant, lambda tenant=tenant: handler.add_documents([doc(tenant)]))
+        during = (list(handler._shards), list(closed), handler.evictions)
+        gate.set()
+        found = await alice
+        # A closed shard reopens from its segment files.
+        bob = await as_tenant("bob", lambda: handler.batch_vector_search([[1.0, 0.0]], top_k=1))
+        await handler.close()
+        return during, found, bob
+
+    (open_shards, closed_during, evictions), found, bob = asyncio.run(run())
+    assert open_shards == ["alice", "carol"]
+    assert closed_during == ["bob"] and evictions == 1
+    assert [hit["id"] for hit in found[0]] == ["alice-1"]
+    assert [hit["id"] for hit in bob[0]] == ["bob-1"]
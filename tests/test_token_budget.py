@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from agents.token_budget import TokenBudgetPolicy
+from utilities import chat_history
+from utilities.chat_history import ChatHistory
+
+TOOLS = [{"type": "function", "function": {"name": name}} for name in ("add_memory", "check_token_count", "search_memory")]
+
+
+class WhitespaceEncoding:
+    def encode(self, text):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def offline_encoder(monkeypatch):
+    monkeypatch.setattr(chat_history, "get_encoder", lambda model="gpt-4o": WhitespaceEncoding())
+
+
+def history(words):
+    return ChatHistory([{"role": "system", "content": "be helpful"}, {"role": "user", "content": " ".join(["word"] * words)}])
+
+
+def enforce(policy, messages):
+    calls = []
+
+    async def runner(name, tool_fn, args):
+        calls.append((name, args["chat_history"]))
+        return {"stored": True}
+
+    return asyncio.run(policy.enforce(messages, runner=runner)), calls
+
+
+def test_modes_decide_whether_check_token_count_is_offered():
+    offered = {mode: [t["function"]["name"] for t in TokenBudgetPolicy(mode, 10).tools(TOOLS)] for mode in ("tool", "host", "hybrid")}
+    assert offered["tool"] == offered["hybrid"] == ["add_memory", "check_token_count", "search_memory"]
+    assert offered["host"] == ["add_memory", "search_memory"]
+    with pytest.raises(ValueError):
+        TokenBudgetPolicy("model", 10)
+
+
+@pytest.mark.parametrize("mode", ["host", "hybrid"])
+def test_host_modes_consolidate_only_past_the_limit(mode):
+    policy = TokenBudgetPolicy(mode, limit=10)
+    assert enforce(policy, history(10)) == (None, [])
+
+    messages = history(11)
+    result, calls = enforce(policy, messages)
+    assert result == {"stored": True}
+    assert [name for name, _ in calls] == ["add_memory"]
+    # add_memory gets a snapshot, not the live history.
+    assert calls[0][1] == messages and calls[0][1] is not messages
+
+
+def test_tool_mode_leaves_the_budget_to_the_model():
+    assert enforce(TokenBudgetPolicy("tool", limit=10), history(50)) == (None, [])
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from agents.tool_scheduler import run_tool_calls
+
+
+def call(call_id, name, **args):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+
+
+def test_results_keep_call_order_and_history_tools_share_a_snapshot():
+    running, peak, seen = 0, 0, []
+    history = [{"role": "user", "content": "hi"}]
+
+    async def slow(delay):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        return {"slept": delay}
+
+    async def check_token_count(chat_history):
+        seen.append(chat_history)
+        # Later messages of the live history must not reach the snapshot.
+        history.append({"role": "assistant", "content": "late"})
+        return {"messages": len(chat_history)}
+
+    tools = {"slow": slow, "check_token_count": check_token_count}
+    calls = [
+        call("1", "slow", delay=0.05),
+        call("2", "check_token_count"),
+        call("3", "slow", delay=0.01),
+        call("4", "missing"),
+        call("5", "check_token_count"),
+    ]
+    messages = asyncio.run(run_tool_calls(calls, history, tools, max_concurrency=2))
+
+    assert [msg["tool_call_id"] for msg in messages] == ["1", "2", "3", "4", "5"]
+    assert [json.loads(msg["content"]) for msg in messages] == [
+        {"slept": 0.05},
+        {"messages": 1},
+        {"slept": 0.01},
+        {"error": "Unknown tool: missing"},
+        {"messages": 1},
+    ]
+    assert peak == 2
+    assert seen[0] is seen[1] and seen[0] is not history